@@ -0,0 +1,91 @@
+from typing import Any, Dict, List
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from app.db import meta_index
+from app.db.models import MetaIndex as MetaIndexModel
+from app.db.pool import get_pool_stats
+from app.db.session import SessionRunner, get_db_runner
+from app.schemas.prompt import MetaIndex, MetaIndexCreate
+
+router = APIRouter()
+
+
+@router.get("/db/pool", response_model=Dict[str, Dict[str, Any]])
+def read_pool_stats():
+    """
+    Report connection pool usage for each application engine.
+
+    Returns:
+        Checkout/checkin counts, pool timeouts and the total, average and
+        longest time spent waiting for a connection, keyed by engine
+        ("sync", and "async" when DB_ASYNC is enabled)
+    """
+    return get_pool_stats()
+
+
+def _meta_index(declared: MetaIndexModel) -> MetaIndex:
+    return MetaIndex(
+        path=declared.path,
+        index_name=meta_index.index_name(meta_index.parse_path(declared.path)),
+        created_at=declared.created_at
+    )
+
+
+def _list_meta_indexes(db: Session) -> List[MetaIndex]:
+    return [_meta_index(declared) for declared in db.query(MetaIndexModel).order_by(MetaIndexModel.path)]
+
+
+@router.get("/meta-indexes", response_model=List[MetaIndex])
+async def read_meta_indexes(db: SessionRunner = Depends(get_db_runner)):
+    """
+    List the metadata paths that have an expression index.
+    """
+    return await db.run(_list_meta_indexes)
+
+
+@router.post("/meta-indexes", response_model=MetaIndex, status_code=status.HTTP_201_CREATED)
+async def create_meta_index(request: MetaIndexCreate, db: SessionRunner = Depends(get_db_runner)):
+    """
+    Declare an indexed metadata path, so `meta.<path>=<value>` filters on
+    the prompt listing use an index instead of scanning every prompt.
+    """
+    return await db.run(_create_meta_index, request.path)
+
+
+def _create_meta_index(db: Session, path: str) -> MetaIndex:
+    if not meta_index.is_supported(db):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Metadata indexes are not available for this database"
+        )
+    try:
+        declared = meta_index.declare_index(db, path)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if declared is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This metadata path is already indexed"
+        )
+    db.commit()
+    db.refresh(declared)
+    return _meta_index(declared)
+
+
+@router.delete("/meta-indexes/{path}")
+async def delete_meta_index(path: str, db: SessionRunner = Depends(get_db_runner)):
+    """
+    Drop the index of a metadata path. Filters on it keep working, unindexed.
+    """
+    return await db.run(_delete_meta_index, path)
+
+
+def _delete_meta_index(db: Session, path: str) -> Dict[str, str]:
+    try:
+        dropped = meta_index.drop_index(db, path)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not dropped:
+        raise HTTPException(status_code=404, detail="Metadata index not found")
+    db.commit()
+    return {"message": "Metadata index dropped successfully"}
@@ -0,0 +1,549 @@
+"""
+Batch playground jobs: one prompt run for every variable set against every
+model, in the background.
+
+Jobs and their results are stored in the database. Model calls from all
+jobs share one semaphore (PLAYGROUND_JOB_CONCURRENCY), results are written
+in batches as they arrive, and unfinished jobs are picked up again on
+startup, skipping the (row, model) pairs that already have a result.
+
+A job is run by the process that claimed it. The owner refreshes the
+job's heartbeat while it runs and releases it on shutdown. Every worker
+process may resume jobs, since claiming is a conditional UPDATE that only
+one of them can win, and only for jobs with no live owner: released ones,
+and ones whose heartbeat is older than PLAYGROUND_JOB_STALE_AFTER. A job
+cancelled through another process is noticed by its owner on the next
+heartbeat, which then stops it.
+"""
+import asyncio
+import datetime
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core import openrouter, playground
+from app.core.config import settings
+from app.core.templating import render_prompt
+from app.db.models import PlaygroundJob as PlaygroundJobModel, PlaygroundJobResult as PlaygroundJobResultModel
+from app.db.session import SessionRunner, get_db_runner
+from app.schemas.prompt import (
+    PlaygroundJobCreate, PlaygroundJobResult, PlaygroundJobStatus, PlaygroundRequest
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+# Seconds between checks for new results when following a running job
+RESULTS_POLL_INTERVAL = 0.5
+
+# Identifies this process as the owner of the jobs it runs
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Background tasks of the jobs running in this process, by job id
+_tasks: Dict[int, asyncio.Task] = {}
+# Semaphores are tied to an event loop, so keep the loop it was made for
+_semaphore: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = None
+
+
+def _job_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore[0] is not loop:
+        _semaphore = (loop, asyncio.Semaphore(settings.PLAYGROUND_JOB_CONCURRENCY))
+    return _semaphore[1]
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _claim(session_factory, job_id: int) -> bool:
+    """
+    Take ownership of an unfinished job that no live process holds. Returns
+    False if another process owns it or got to it first.
+    """
+    stale = _now() - datetime.timedelta(seconds=settings.PLAYGROUND_JOB_STALE_AFTER)
+    with session_factory() as db:
+        result = db.execute(
+            update(PlaygroundJobModel)
+            .where(
+                PlaygroundJobModel.id == job_id,
+                PlaygroundJobModel.status.in_(("pending", "running")),
+                or_(
+                    PlaygroundJobModel.owner.is_(None),
+                    PlaygroundJobModel.heartbeat_at.is_(None),
+                    PlaygroundJobModel.heartbeat_at < stale
+                )
+            )
+            .values(owner=OWNER, heartbeat_at=_now())
+        )
+        db.commit()
+        return result.rowcount == 1
+
+
+def _touch(session_factory, job_id: int, release: bool = False) -> bool:
+    """
+    Refresh the heartbeat of a job this process owns, or release it.
+    Returns False if the job has been cancelled, finished or taken over by
+    another process in the meantime.
+    """
+    with session_factory() as db:
+        result = db.execute(
+            update(PlaygroundJobModel)
+            .where(
+                PlaygroundJobModel.id == job_id,
+                PlaygroundJobModel.owner == OWNER,
+                PlaygroundJobModel.status.not_in(FINISHED_STATUSES)
+            )
+            .values(heartbeat_at=None if release else _now(), owner=None if release else OWNER)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+
+async def _heartbeat(session_factory, job_id: int, run: asyncio.Task) -> None:
+    """
+    Keep a running job's heartbeat fresh, and stop the run as soon as the
+    job is no longer ours to run, e.g. when another process cancelled it.
+    """
+    while True:
+        await asyncio.sleep(settings.PLAYGROUND_JOB_STALE_AFTER / 3)
+        try:
+            owned = await run_in_threadpool(_touch, session_factory, job_id)
+        except Exception:
+            # Try again on the next beat; the job only goes stale if every beat fails
+            logger.exception("Could not refresh the heartbeat of playground job %s", job_id)
+            continue
+        if not owned:
+            logger.info("Playground job %s was cancelled or taken over, stopping", job_id)
+            run.cancel()
+            return
+
+
+def _set_status(session_factory, job_id: int, job_status: str, error: Optional[str] = None) -> None:
+    """
+    Record how a job this process owns ended, unless it has been cancelled
+    or taken over meanwhile.
+    """
+    values = {"status": job_status, "error": error}
+    if job_status in FINISHED_STATUSES:
+        values["finished_at"] = func.now()
+    with session_factory() as db:
+        db.execute(
+            update(PlaygroundJobModel)
+            .where(
+                PlaygroundJobModel.id == job_id,
+                PlaygroundJobModel.owner == OWNER,
+                PlaygroundJobModel.status.not_in(FINISHED_STATUSES)
+            )
+            .values(**values)
+        )
+        db.commit()
+
+
+def _start_job(session_factory, job_id: int) -> Dict[str, Any]:
+    """
+    Mark a job running and load what is needed to run its remaining items.
+    """
+    with session_factory() as db:
+        job = db.get(PlaygroundJobModel, job_id)
+        request = PlaygroundRequest(prompt_id=job.prompt_id, version=job.version, models=job.models)
+        _, prompt_version, prompt_text = playground.load_prompt(db, request)
+        done = set(db.execute(
+            select(PlaygroundJobResultModel.row_index, PlaygroundJobResultModel.model)
+            .where(PlaygroundJobResultModel.job_id == job_id)
+        ).all())
+        # Conditional, so that a cancel landing meanwhile is not overwritten
+        db.execute(
+            update(PlaygroundJobModel)
+            .where(PlaygroundJobModel.id == job_id, PlaygroundJobModel.status == "pending")
+            .values(status="running")
+        )
+        db.commit()
+        return {
+            "prompt_id": job.prompt_id,
+            "version": prompt_version,
+            "text": prompt_text,
+            "models": job.models,
+            "variable_sets": job.variable_sets,
+            "system_message": job.system_message,
+            "parameters": job.parameters,
+            "use_cache": job.use_cache,
+            "done": done
+        }
+
+
+def _insert_results(session_factory, job_id: int, results: List[Dict[str, Any]]) -> None:
+    with session_factory() as db:
+        db.execute(
+            insert(PlaygroundJobResultModel),
+            [{"job_id": job_id, **result} for result in results]
+        )
+        db.commit()
+
+
+async def _run_item(
+    client: httpx.AsyncClient,
+    queue: asyncio.Queue,
+    job: Dict[str, Any],
+    row_index: int,
+    model: str
+) -> None:
+    variables = job["variable_sets"][row_index]
+    result = {"row_index": row_index, "model": model}
+    try:
+        prompt_text = render_prompt(job["prompt_id"], job["version"], job["text"], variables or {})
+    except Exception as e:
+        await queue.put({**result, "error": f"Error processing variables: {str(e)}"})
+        return
+
+    request = PlaygroundRequest(
+        prompt_id=job["prompt_id"],
+        version=job["version"],
+        models=[model],
+        variables=variables,
+        system_message=job["system_message"],
+        parameters=job["parameters"],
+        use_cache=job["use_cache"]
+    )
+    outcome = await playground.run_model(
+        client, _job_semaphore(), model, prompt_text, request, job["version"]
+    )
+    if "error" in outcome:
+        await queue.put({**result, "error": outcome["error"]})
+    else:
+        await queue.put({
+            **result,
+            "response": outcome["response"],
+            "usage": outcome["metadata"]["usage"],
+            "cache_hit": outcome["metadata"]["cache_hit"]
+        })
+
+
+async def _write_results(session_factory, job_id: int, queue: asyncio.Queue) -> None:
+    """
+    Write results as they arrive, batching whatever has queued up meanwhile.
+    A None on the queue marks the end.
+    """
+    finished = False
+    while not finished:
+        batch = [await queue.get()]
+        while not queue.empty():
+            batch.append(queue.get_nowait())
+        if batch[-1] is None:
+            finished = True
+            batch.pop()
+        if batch:
+            await run_in_threadpool(_insert_results, session_factory, job_id, batch)
+
+
+async def _run_items(session_factory, job_id: int, job: Dict[str, Any]) -> None:
+    """
+    Run the job's remaining items on PLAYGROUND_JOB_CONCURRENCY workers and
+    write their results.
+
+    If the writer fails, the workers are cancelled straight away rather
+    than left to finish (and pay for) their upstream calls.
+    """
+    items = iter([
+        (row_index, model)
+        for row_index in range(len(job["variable_sets"]))
+        for model in job["models"]
+        if (row_index, model) not in job["done"]
+    ])
+    queue: asyncio.Queue = asyncio.Queue()
+    client = openrouter.get_client()
+    stopped = False
+
+    async def work() -> None:
+        for row_index, model in items:
+            # Before Python 3.12, asyncio.wait_for can swallow a cancel that
+            # races the model call finishing, so don't rely on it alone
+            if stopped:
+                return
+            await _run_item(client, queue, job, row_index, model)
+
+    writer = asyncio.create_task(_write_results(session_factory, job_id, queue))
+    workers = {asyncio.create_task(work()) for _ in range(settings.PLAYGROUND_JOB_CONCURRENCY)}
+    try:
+        while workers:
+            done, _ = await asyncio.wait(workers | {writer}, return_when=asyncio.FIRST_COMPLETED)
+            if writer in done:
+                writer.result()
+                raise RuntimeError("The result writer stopped before the job finished")
+            for task in done:
+                task.result()
+            workers -= done
+        await queue.put(None)
+        await writer
+    finally:
+        stopped = True
+        for task in (writer, *workers):
+            task.cancel()
+        await asyncio.gather(writer, *workers, return_exceptions=True)
+
+
+async def _run_job(session_factory, job_id: int) -> None:
+    """
+    Run a job this process has claimed to the end. Any error marks it
+    `failed` with the error text; cancellation, here or by another process
+    through the database, releases the job and leaves its status to the
+    canceller.
+    """
+    heartbeat = asyncio.create_task(_heartbeat(session_factory, job_id, asyncio.current_task()))
+    try:
+        job = await run_in_threadpool(_start_job, session_factory, job_id)
+        await _run_items(session_factory, job_id, job)
+    except asyncio.CancelledError:
+        # Let the next process to start resume it straight away
+        await run_in_threadpool(_touch, session_factory, job_id, True)
+        raise
+    except Exception as e:
+        logger.exception("Playground job %s failed", job_id)
+        error = e.detail if isinstance(e, HTTPException) else f"{type(e).__name__}: {e}"
+        await run_in_threadpool(_set_status, session_factory, job_id, "failed", error)
+        return
+    finally:
+        heartbeat.cancel()
+    await run_in_threadpool(_set_status, session_factory, job_id, "completed")
+
+
+def _launch(session_factory, job_id: int) -> None:
+    task = asyncio.create_task(_run_job(session_factory, job_id))
+    _tasks[job_id] = task
+
+    def finished(task: asyncio.Task) -> None:
+        _tasks.pop(job_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Playground job %s failed", job_id, exc_info=task.exception())
+
+    task.add_done_callback(finished)
+
+
+async def resume_jobs(bind) -> None:
+    """
+    Restart jobs left pending or running by a previous process, claiming
+    each one first so that no other process runs it too.
+    """
+    session_factory = sessionmaker(bind=bind, autoflush=False)
+
+    def unfinished():
+        with session_factory() as db:
+            return list(db.scalars(
+                select(PlaygroundJobModel.id)
+                .where(PlaygroundJobModel.status.in_(("pending", "running")))
+                .order_by(PlaygroundJobModel.id)
+            ))
+
+    for job_id in await run_in_threadpool(unfinished):
+        if await run_in_threadpool(_claim, session_factory, job_id):
+            _launch(session_factory, job_id)
+
+
+async def stop_jobs() -> None:
+    """
+    Cancel the jobs running in this process; they stay `running` in the
+    database, released, and are resumed on the next start.
+    """
+    tasks = list(_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _job_status(db: Session, job_id: int) -> PlaygroundJobStatus:
+    job = db.get(PlaygroundJobModel, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    counts = dict(db.execute(
+        select(PlaygroundJobResultModel.error.is_(None), func.count())
+        .where(PlaygroundJobResultModel.job_id == job_id)
+        .group_by(PlaygroundJobResultModel.error.is_(None))
+    ).all())
+    return PlaygroundJobStatus(
+        id=job.id,
+        prompt_id=job.prompt_id,
+        version=job.version,
+        models=job.models,
+        status=job.status,
+        error=job.error,
+        total=len(job.variable_sets) * len(job.models),
+        completed=counts.get(True, 0),
+        failed=counts.get(False, 0),
+        created_at=job.created_at,
+        finished_at=job.finished_at
+    )
+
+
+@router.post("/", response_model=PlaygroundJobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def create_playground_job(job: PlaygroundJobCreate, db: SessionRunner = Depends(get_db_runner)):
+    """
+    Submit a batch job and start running it in the background.
+
+    Poll `GET /playground/jobs/{job_id}` for progress and read results from
+    `GET /playground/jobs/{job_id}/results`.
+    """
+    if not job.models or not job.variable_sets:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A job needs at least one model and one variable set"
+        )
+    if len(job.models) * len(job.variable_sets) > settings.PLAYGROUND_JOB_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A job can run at most {settings.PLAYGROUND_JOB_MAX_ITEMS} variable set and model pairs"
+        )
+
+    def create(db: Session) -> PlaygroundJobStatus:
+        request = PlaygroundRequest(prompt_id=job.prompt_id, version=job.version, models=job.models)
+        _, prompt_version, _ = playground.load_prompt(db, request)
+        db_job = PlaygroundJobModel(
+            prompt_id=job.prompt_id,
+            version=prompt_version,
+            models=list(dict.fromkeys(job.models)),
+            variable_sets=job.variable_sets,
+            system_message=job.system_message,
+            parameters=playground.sampling_parameters(job.parameters),
+            use_cache=job.use_cache,
+            status="pending",
+            owner=OWNER,
+            heartbeat_at=_now()
+        )
+        db.add(db_job)
+        db.commit()
+        return _job_status(db, db_job.id)
+
+    created = await db.run(create)
+    _launch(sessionmaker(bind=db.sync_bind(), autoflush=False), created.id)
+    return created
+
+
+@router.get("/{job_id}", response_model=PlaygroundJobStatus)
+async def read_playground_job(job_id: int, db: SessionRunner = Depends(get_db_runner)):
+    """
+    Report a job's status and how many of its items have finished.
+    """
+    return await db.run(_job_status, job_id)
+
+
+@router.delete("/{job_id}", response_model=PlaygroundJobStatus)
+async def cancel_playground_job(job_id: int, db: SessionRunner = Depends(get_db_runner)):
+    """
+    Stop a job. Results written so far are kept. A job running in another
+    process stops there on its next heartbeat.
+    """
+    task = _tasks.get(job_id)
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    def cancel(db: Session) -> PlaygroundJobStatus:
+        job = db.get(PlaygroundJobModel, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job.status not in FINISHED_STATUSES:
+            job.status = "cancelled"
+            job.finished_at = func.now()
+            db.commit()
+        return _job_status(db, job_id)
+
+    return await db.run(cancel)
+
+
+@router.get("/{job_id}/results")
+async def read_playground_job_results(
+    job_id: int,
+    follow: bool = Query(False, description="Keep the stream open until the job finishes"),
+    db: SessionRunner = Depends(get_db_runner)
+):
+    """
+    Stream a job's results as NDJSON, one `PlaygroundJobResult` per line, in
+    the order they were written.
+
+    With `follow`, the stream also ends if the job is left unfinished with
+    no live owner and no process takes it over within
+    PLAYGROUND_JOB_STALE_AFTER; its status then tells why.
+    """
+    variable_sets = await db.run(_job_variable_sets, job_id)
+    return StreamingResponse(
+        _result_lines(db.sync_bind(), job_id, variable_sets, follow),
+        media_type="application/x-ndjson"
+    )
+
+
+def _job_variable_sets(db: Session, job_id: int) -> List[Dict[str, Any]]:
+    variable_sets = db.scalar(select(PlaygroundJobModel.variable_sets).where(PlaygroundJobModel.id == job_id))
+    if variable_sets is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return variable_sets
+
+
+async def _result_lines(bind, job_id: int, variable_sets: List[Dict[str, Any]], follow: bool):
+    # The request session may be closed before the body has been streamed,
+    # so each page is read with its own session.
+    def page(after_id: int):
+        stale = _now() - datetime.timedelta(seconds=settings.PLAYGROUND_JOB_STALE_AFTER)
+        with Session(bind=bind) as session:
+            job_status, owned = session.execute(
+                select(
+                    PlaygroundJobModel.status,
+                    and_(PlaygroundJobModel.owner.is_not(None), PlaygroundJobModel.heartbeat_at >= stale)
+                ).where(PlaygroundJobModel.id == job_id)
+            ).one()
+            rows = session.scalars(
+                select(PlaygroundJobResultModel)
+                .where(PlaygroundJobResultModel.job_id == job_id, PlaygroundJobResultModel.id > after_id)
+                .order_by(PlaygroundJobResultModel.id)
+                .limit(settings.EXPORT_BATCH_SIZE)
+            ).all()
+            return job_status in FINISHED_STATUSES, bool(owned), [
+                (
+                    row.id,
+                    PlaygroundJobResult(
+                        row_index=row.row_index,
+                        model=row.model,
+                        variables=variable_sets[row.row_index],
+                        response=row.response,
+                        error=row.error,
+                        usage=row.usage,
+                        cache_hit=bool(row.cache_hit)
+                    )
+                )
+                for row in rows
+            ]
+
+    after_id = 0
+    orphaned_since: Optional[float] = None
+    while True:
+        finished, owned, rows = await run_in_threadpool(page, after_id)
+        for after_id, result in rows:
+            yield result.model_dump_json() + "\n"
+        if rows:
+            orphaned_since = None
+            continue
+        # The status was read before the page, so nothing is missed once it says finished
+        if finished or not follow:
+            break
+        # A job whose owner died only moves again once another process
+        # takes it over; give that as long as a takeover may take, then
+        # end the stream instead of waiting forever
+        if owned:
+            orphaned_since = None
+        elif orphaned_since is None:
+            orphaned_since = time.monotonic()
+        elif time.monotonic() - orphaned_since > settings.PLAYGROUND_JOB_STALE_AFTER:
+            logger.info("Playground job %s has no live owner, ending its results stream", job_id)
+            break
+        await asyncio.sleep(RESULTS_POLL_INTERVAL)
@@ -1,23 +1,294 @@
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from typing import List, Literal, Optional, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, lazyload, load_only, selectinload
+from app.db import meta_index, search as search_index, versioning
+from app.db.session import SessionRunner, get_db, get_db_runner
 from app.schemas.prompt import (
-    Prompt, PromptCreate, PromptUpdate, Tag, PromptVersion,
+    BulkPromptResult, ImportLineError, ImportSummary, Prompt, PromptCreate, PromptDiff, PromptExport,
+    PromptUpdate, PromptSummary, PromptVersionExport, PromptVersionSummary, Tag, PromptVersion,
     PlaygroundRequest, PlaygroundResponse
 )
-from app.db.models import Prompt as PromptModel, Tag as TagModel, PromptVersion as PromptVersionModel
-from sqlalchemy import or_, text
+from app.db.models import (
+    Prompt as PromptModel, Tag as TagModel, PromptVersion as PromptVersionModel, prompt_tags
+)
+from sqlalchemy import func, insert, or_, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from app.core import openrouter, playground
 from app.core.config import settings
-from app.scripts.seed_prompts_api import seed_prompts_api
-import httpx
+from app.core.diffing import diff_cache, unified_diff, word_diff
+from app.core.cache import TAG_COUNTS_KEY, get_prompt_cache, get_tag_cache, prompt_generations, tag_generations
+from app.core.http_cache import compute_etag, etag_matches
+from app.core.pagination import NEXT_CURSOR_HEADER, NEXT_CURSOR_RESPONSES, decode_cursor, encode_cursor
+from app.core.templating import render_prompt
+import asyncio
 import json
 
 router = APIRouter()
 
+# Columns returned by the prompt listing when `fields` is not given
+SUMMARY_FIELDS = ("name", "text", "description", "version", "meta", "created_at", "updated_at")
+# Relationships the prompt listing can eager-load through `include`
+SUMMARY_INCLUDES = {"tags": PromptModel.tags, "versions": PromptModel.versions}
+# Version columns returned by the version history in summary mode
+VERSION_SUMMARY_FIELDS = ("id", "prompt_id", "version", "description", "meta", "content_hash", "created_at")
+
+
+def _parse_csv_param(value: Optional[str], allowed, param: str) -> List[str]:
+    if not value:
+        return []
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown {param}: {', '.join(unknown)}"
+        )
+    return names
+
+
+def _cursor_position(position: Dict[str, Any], key: str) -> int:
+    value = position.get(key)
+    if not isinstance(value, int):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return value
+
+
+def _resolve_tags(db: Session, names) -> Dict[str, TagModel]:
+    """
+    Look up tags by name in one query, inserting any that don't exist yet.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    tags = {tag.name: tag for tag in db.query(TagModel).filter(TagModel.name.in_(names))}
+    missing = names - tags.keys()
+    if missing:
+        db.execute(insert(TagModel), [{"name": name} for name in sorted(missing)])
+        tags.update(
+            (tag.name, tag) for tag in db.query(TagModel).filter(TagModel.name.in_(missing))
+        )
+    return tags
+
+
+def _apply_prompt_update(
+    db: Session,
+    db_prompt: PromptModel,
+    prompt: PromptUpdate,
+    tags: Optional[Dict[str, TagModel]] = None
+) -> bool:
+    """
+    Apply an update to a prompt and record it as a new version.
+
+    A new version is only recorded when the text, description or meta
+    change (or an explicit new version number is given); renames and tag
+    edits alone are applied in place, and an update that changes nothing
+    writes nothing. Returns whether anything changed.
+
+    `tags` may hold already resolved tags to avoid a lookup per prompt.
+    """
+    changes = prompt.model_dump(exclude_unset=True)
+    changed = False
+    
+    if "name" in changes and changes["name"] != db_prompt.name:
+        db_prompt.name = changes["name"]
+        changed = True
+    
+    # Handle tags
+    if prompt.tags is not None:
+        tag_names = list(dict.fromkeys(prompt.tags))
+        if tag_names != [tag.name for tag in db_prompt.tags]:
+            if tags is None:
+                tags = _resolve_tags(db, tag_names)
+            db_prompt.tags = [tags[tag_name] for tag_name in tag_names]
+            changed = True
+    
+    content = {
+        field: changes.get(field, getattr(db_prompt, field))
+        for field in ("text", "description", "meta")
+    }
+    content_hash = versioning.content_hash(**content)
+    if (
+        content_hash == versioning.content_hash(db_prompt.text, db_prompt.description, db_prompt.meta)
+        and (prompt.version is None or prompt.version == db_prompt.version)
+    ):
+        return changed
+    
+    # Handle version
+    if prompt.version is not None:
+        try:
+            version = int(prompt.version)
+            if version <= 0:
+                version = 1
+        except (ValueError, TypeError):
+            version = db_prompt.version + 1
+    else:
+        version = db_prompt.version + 1
+    
+    # Update prompt fields
+    for field, value in content.items():
+        setattr(db_prompt, field, value)
+    
+    # Update version
+    db_prompt.version = version
+    
+    # Create new version record
+    versioning.add_version(
+        db,
+        db_prompt.id,
+        version,
+        db_prompt.text,
+        db_prompt.description,
+        db_prompt.meta
+    )
+    return True
+
+
+def _invalidate_prompts(prompt_ids) -> None:
+    """
+    Drop cached responses for prompts that were just written, and the tag
+    counts they may have changed. Call after commit.
+    """
+    cache = get_prompt_cache()
+    for prompt_id in prompt_ids:
+        # Bump first so a read that started before the write can't cache its result
+        prompt_generations.bump(prompt_id)
+        cache.delete(prompt_id)
+    tag_generations.bump(TAG_COUNTS_KEY)
+    get_tag_cache().delete(TAG_COUNTS_KEY)
+
+
+def _initial_version(prompt: PromptCreate) -> int:
+    # Imported prompts keep their version number, with or without their
+    # history; new ones start at 1
+    if not isinstance(prompt, PromptExport):
+        return 1
+    if prompt.versions:
+        return prompt.version or max(version.version for version in prompt.versions)
+    return prompt.version or 1
+
+
+def _bulk_write_prompts(
+    db: Session,
+    prompts: List[PromptCreate],
+    upsert: bool = False
+) -> List[BulkPromptResult]:
+    """
+    Create (or, with `upsert`, update by name) many prompts at once.
+
+    Names and tags are resolved with one query each, and new prompts, their
+    tag links and initial versions are written with multi-row INSERTs.
+    New prompts that carry a `versions` history (see `PromptExport`) get
+    that history instead of a fresh version 1.
+    Nothing is committed; per-item problems are reported in the results.
+    """
+    results: List[Optional[BulkPromptResult]] = [None] * len(prompts)
+    existing = {
+        db_prompt.name: db_prompt
+        for db_prompt in db.query(PromptModel).filter(
+            PromptModel.name.in_({prompt.name for prompt in prompts})
+        )
+    }
+    tags = _resolve_tags(db, {name for prompt in prompts for name in prompt.tags or []})
+    
+    seen = set()
+    to_create = []
+    updated_ids = []
+    for index, prompt in enumerate(prompts):
+        if prompt.name in seen:
+            results[index] = BulkPromptResult(
+                index=index, name=prompt.name, status="error",
+                detail="Duplicate name in request"
+            )
+            continue
+        seen.add(prompt.name)
+        
+        db_prompt = existing.get(prompt.name)
+        if db_prompt is None:
+            to_create.append((index, prompt))
+        elif not upsert:
+            results[index] = BulkPromptResult(
+                index=index, name=prompt.name, status="error",
+                detail="A prompt with this name already exists"
+            )
+        else:
+            if _apply_prompt_update(
+                db,
+                db_prompt,
+                PromptUpdate(**prompt.model_dump(exclude_unset=True, exclude={"version", "versions"})),
+                tags
+            ):
+                updated_ids.append(db_prompt.id)
+            results[index] = BulkPromptResult(
+                index=index, name=prompt.name, status="updated",
+                id=db_prompt.id, version=db_prompt.version
+            )
+    
+    created_ids = []
+    if to_create:
+        # Names are unique, so map RETURNING rows back by name rather than
+        # relying on row order (which would force row-at-a-time inserts)
+        returned = db.execute(
+            insert(PromptModel).returning(PromptModel.id, PromptModel.name),
+            [
+                {
+                    "name": prompt.name,
+                    "text": prompt.text,
+                    "description": prompt.description,
+                    "version": _initial_version(prompt),
+                    "meta": prompt.meta
+                }
+                for _, prompt in to_create
+            ]
+        )
+        ids_by_name = {name: prompt_id for prompt_id, name in returned}
+        created_ids = [ids_by_name[prompt.name] for _, prompt in to_create]
+        links = [
+            {"prompt_id": prompt_id, "tag_id": tags[tag_name].id}
+            for prompt_id, (_, prompt) in zip(created_ids, to_create)
+            for tag_name in dict.fromkeys(prompt.tags or [])
+        ]
+        if links:
+            db.execute(prompt_tags.insert(), links)
+        versioning.add_histories(
+            db,
+            [
+                (
+                    prompt_id,
+                    [
+                        version.model_dump()
+                        for version in getattr(prompt, "versions", None) or [
+                            PromptVersionExport(
+                                version=_initial_version(prompt), text=prompt.text,
+                                description=prompt.description, meta=prompt.meta
+                            )
+                        ]
+                    ]
+                )
+                for prompt_id, (_, prompt) in zip(created_ids, to_create)
+            ]
+        )
+        for prompt_id, (index, prompt) in zip(created_ids, to_create):
+            results[index] = BulkPromptResult(
+                index=index, name=prompt.name, status="created",
+                id=prompt_id, version=_initial_version(prompt)
+            )
+    
+    search_index.index_prompts(db, [*created_ids, *updated_ids])
+    return results
+
 
 @router.post("/", response_model=Prompt)
-def create_prompt(prompt: PromptCreate, db: Session = Depends(get_db)):
+async def create_prompt(prompt: PromptCreate, db: SessionRunner = Depends(get_db_runner)):
+    created = await db.run(_create_prompt, prompt)
+    _invalidate_prompts([created.id])
+    return created
+
+
+def _create_prompt(db: Session, prompt: PromptCreate) -> Prompt:
     # Check for duplicate prompt name first
     existing_prompt = db.query(PromptModel).filter(PromptModel.name == prompt.name).first()
     if existing_prompt:
@@ -37,102 +308,398 @@ def create_prompt(prompt: PromptCreate, db: Session = Depends(get_db)):
     
     # Handle tags
     if prompt.tags:
-        for tag_name in prompt.tags:
-            tag = db.query(TagModel).filter(TagModel.name == tag_name).first()
-            if not tag:
-                tag = TagModel(name=tag_name)
-                db.add(tag)
-            db_prompt.tags.append(tag)
+        tags = _resolve_tags(db, prompt.tags)
+        db_prompt.tags = [tags[tag_name] for tag_name in dict.fromkeys(prompt.tags)]
     
     db.add(db_prompt)
-    db.flush()  # Ensure tag gets an id
+    db.flush()  # Ensure prompt gets an id
     
     # Create initial version
-    version = PromptVersionModel(
-        prompt_id=db_prompt.id,
-        version=1,
-        text=prompt.text,
-        description=prompt.description,
-        meta=prompt.meta
-    )
-    db.add(version)
+    versioning.add_version(db, db_prompt.id, 1, prompt.text, prompt.description, prompt.meta)
+    search_index.index_prompts(db, [db_prompt.id])
     db.commit()
     db.refresh(db_prompt)
-    return db_prompt
+    return Prompt.model_validate(db_prompt)
+
+
+@router.post("/bulk", response_model=List[BulkPromptResult])
+async def create_prompts_bulk(
+    prompts: List[PromptCreate],
+    upsert: bool = Query(False, description="Update prompts whose name already exists instead of failing them"),
+    db: SessionRunner = Depends(get_db_runner)
+):
+    """
+    Create many prompts in a single transaction.
+    
+    Returns one result per submitted prompt, in order. Prompts whose name
+    already exists (or repeats within the request) are reported as errors
+    unless `upsert` is set, in which case existing prompts get a new version.
+    """
+    if len(prompts) > settings.BULK_MAX_PROMPTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.BULK_MAX_PROMPTS} prompts can be submitted at once"
+        )
+    results = await db.run(_commit_bulk_write, prompts, upsert)
+    _invalidate_prompts(result.id for result in results if result.id is not None)
+    return results
+
 
+def _commit_bulk_write(db: Session, prompts: List[PromptCreate], upsert: bool) -> List[BulkPromptResult]:
+    results = _bulk_write_prompts(db, prompts, upsert=upsert)
+    db.commit()
+    return results
 
-@router.get("/", response_model=List[Prompt])
-def read_prompts(
+
+@router.get(
+    "/",
+    response_model=List[PromptSummary],
+    response_model_exclude_unset=True,
+    responses=NEXT_CURSOR_RESPONSES
+)
+async def read_prompts(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="`X-Next-Cursor` header of the previous page"),
     search: Optional[str] = None,
     tag: Optional[str] = None,
-    db: Session = Depends(get_db)
+    tags: Optional[str] = Query(
+        None, description="Comma-separated tag names; combined with `tag` if both are given"
+    ),
+    match: Literal["all", "any"] = Query(
+        "all", description="`all` returns prompts carrying every tag in `tags`; `any` those carrying at least one"
+    ),
+    search_mode: Literal["name", "fulltext"] = Query(
+        "name", description="`name` matches prompt names; `fulltext` ranks matches in name, text, description and tags"
+    ),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated prompt columns to return (default: all)"
+    ),
+    include: Optional[str] = Query(
+        None, description="Comma-separated relationships to embed: tags, versions"
+    ),
+    db: SessionRunner = Depends(get_db_runner)
 ):
-    query = db.query(PromptModel)
+    """
+    List prompts ordered by id.
+
+    The body is a plain list of prompts. The cursor of the next page is
+    returned in the `X-Next-Cursor` response header, not in the body, and
+    the header is left out on the last page. Pass it back as `cursor` to
+    fetch the next page with an index seek instead of an offset scan.
+    `skip` is ignored when a cursor is given.
+
+    Tags and versions are only returned when requested through `include`,
+    and are loaded with one extra query each rather than one per prompt.
+
+    With `search_mode=fulltext` results are ordered by relevance and carry a
+    `score` and an HTML-escaped `snippet` with matches wrapped in `<mark>`.
+
+    `meta.<path>=<value>` parameters filter on metadata, e.g.
+    `meta.category=support` or `meta.owner.team=growth`; repeating one
+    matches any of its values. Paths declared through
+    `POST /admin/meta-indexes` are served from an expression index.
+    """
+    columns = _parse_csv_param(fields, SUMMARY_FIELDS, "fields") or list(SUMMARY_FIELDS)
+    relationships = _parse_csv_param(include, SUMMARY_INCLUDES, "include")
+    position = decode_cursor(cursor)
+    tag_names = list(dict.fromkeys(
+        name.strip() for name in [tag or "", *(tags or "").split(",")] if name.strip()
+    ))
+    meta_filters: Dict[str, List[str]] = {}
+    for key, value in request.query_params.multi_items():
+        if key.startswith("meta."):
+            meta_filters.setdefault(key[len("meta."):], []).append(value)
     
-    if search:
-        query = query.filter(PromptModel.name.ilike(f"%{search}%"))
+    summaries, next_position = await db.run(
+        _list_prompts, skip, limit, position, search, tag_names, match, meta_filters,
+        search_mode, columns, relationships
+    )
+    if limit > 0 and len(summaries) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(next_position)
+    return summaries
+
+
+def _tagged_prompt_ids(tag_names: List[str], match: str):
+    """
+    Ids of prompts carrying all (or, with `match="any"`, any) of `tag_names`,
+    as one grouped scan of `prompt_tags` to filter on with a semi-join.
+    """
+    ids = (
+        select(prompt_tags.c.prompt_id)
+        .join(TagModel, TagModel.id == prompt_tags.c.tag_id)
+        .where(TagModel.name.in_(tag_names))
+    )
+    if match == "all" and len(tag_names) > 1:
+        ids = ids.group_by(prompt_tags.c.prompt_id).having(
+            func.count(func.distinct(prompt_tags.c.tag_id)) == len(tag_names)
+        )
+    return ids
+
+
+def _list_prompts(
+    db: Session,
+    skip: int,
+    limit: int,
+    position: Optional[Dict[str, Any]],
+    search: Optional[str],
+    tag_names: List[str],
+    match: str,
+    meta_filters: Dict[str, List[str]],
+    search_mode: str,
+    columns: List[str],
+    relationships: List[str]
+):
+    query = db.query(PromptModel).options(
+        load_only(*(getattr(PromptModel, column) for column in columns)),
+        *(selectinload(SUMMARY_INCLUDES[name]) for name in relationships)
+    )
+    
+    if tag_names:
+        query = query.filter(PromptModel.id.in_(_tagged_prompt_ids(tag_names, match)))
     
-    if tag:
-        query = query.join(PromptModel.tags).filter(TagModel.name == tag)
+    if meta_filters:
+        if not meta_index.is_supported(db):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Metadata filters are not available for this database"
+            )
+        try:
+            query = query.filter(*(
+                meta_index.meta_filter(db, path, values) for path, values in meta_filters.items()
+            ))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if search and search_mode == "fulltext":
+        if not search_index.is_supported(db):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Full-text search is not available for this database"
+            )
+        hits = search_index.match_subquery(db, search)
+        if hits is None:
+            return [], None
+        # Relevance order has no stable key to seek on, so cursors carry an offset
+        offset = _cursor_position(position, "offset") if position is not None else skip
+        rows = (
+            query.join(hits, hits.c.prompt_id == PromptModel.id)
+            .add_columns(hits.c.score, hits.c.snippet)
+            .order_by(hits.c.score.desc(), PromptModel.id)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+        next_position = {"offset": offset + len(rows)}
+    else:
+        if search:
+            query = query.filter(PromptModel.name.ilike(f"%{search}%"))
+        if position is not None:
+            after_id = _cursor_position(position, "id")
+            query = query.filter(PromptModel.id > after_id).order_by(PromptModel.id)
+        else:
+            query = query.order_by(PromptModel.id).offset(skip)
+        rows = [(prompt, None, None) for prompt in query.limit(limit).all()]
+        next_position = {"id": rows[-1][0].id} if rows else None
     
-    return query.offset(skip).limit(limit).all()
+    summaries = []
+    for prompt, score, snippet in rows:
+        data = {name: getattr(prompt, name) for name in ["id", *columns, *relationships]}
+        if score is not None:
+            data.update(score=score, snippet=search_index.render_snippet(snippet))
+        summaries.append(PromptSummary.model_validate(data, from_attributes=True))
+    return summaries, next_position
 
 
 @router.get("/models", response_model=Dict[str, Any])
-async def get_available_models():
+async def get_available_models(request: Request):
     """
     Fetch available models from OpenRouter API.
     
+    The filtered catalog is cached in-process and refreshed in the background
+    once it is older than MODELS_CACHE_TTL. Responses carry an ETag, and a
+    matching If-None-Match gets a 304.
+    
     Returns:
         Dict containing filtered list of available models with only id, name, and pricing information
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                "https://openrouter.ai/api/v1/models",
-                headers={
-                    "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                    "HTTP-Referer": settings.PROJECT_URL,
-                    "X-Title": settings.PROJECT_NAME,
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            # Filter the data array to only include id, name, and pricing
-            if "data" in data:
-                data["data"] = [
-                    {
-                        "id": model["id"],
-                        "name": model["name"],
-                        "pricing": model["pricing"],
-                        "description": model["description"],
-                        "architecture":model["architecture"],
-                        "context_length":model["context_length"],
-                    }
-                    for model in data["data"]
-                ]
-            
-            return data
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to fetch models from OpenRouter: {str(e)}"
+    try:
+        body, etag = await openrouter.model_catalog.get()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch models from OpenRouter: {str(e)}"
+        )
+    
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/export")
+def export_prompts(
+    include_versions: bool = Query(False, description="Include the full version history of each prompt"),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream the whole prompt catalog as NDJSON, one `PromptExport` per line.
+    
+    Rows are read from a server-side cursor in batches of EXPORT_BATCH_SIZE,
+    so memory use does not grow with the size of the catalog.
+    """
+    return StreamingResponse(
+        _export_lines(db.get_bind(), include_versions),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="prompts.ndjson"'}
+    )
+
+
+def _export_lines(bind, include_versions: bool):
+    # The request session may be closed before the body has been streamed,
+    # so the export owns a session on the same engine.
+    with Session(bind=bind) as session:
+        options = [selectinload(PromptModel.tags)]
+        if include_versions:
+            options.append(selectinload(PromptModel.versions))
+        prompts = session.scalars(
+            select(PromptModel)
+            .options(*options)
+            .order_by(PromptModel.id)
+            .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+        )
+        for prompt in prompts:
+            line = PromptExport(
+                name=prompt.name,
+                text=prompt.text,
+                description=prompt.description,
+                version=prompt.version,
+                meta=prompt.meta,
+                tags=[tag.name for tag in prompt.tags],
+                versions=[
+                    PromptVersionExport.model_validate(version, from_attributes=True)
+                    for version in sorted(prompt.versions, key=lambda v: v.id)
+                ] if include_versions else None
             )
+            yield line.model_dump_json(exclude_none=True) + "\n"
+
+
+@router.post("/import", response_model=ImportSummary)
+async def import_prompts(
+    request: Request,
+    upsert: bool = Query(False, description="Update prompts whose name already exists instead of failing them"),
+    db: SessionRunner = Depends(get_db_runner)
+):
+    """
+    Import an NDJSON catalog as produced by `GET /prompts/export`.
+    
+    The body is read incrementally and written in batches of
+    IMPORT_BATCH_SIZE prompts, each committed on its own. Exported version
+    histories are restored for prompts that don't exist yet.
+    """
+    summary = ImportSummary()
+    batch: List[PromptExport] = []
+    line_numbers: List[int] = []
+    
+    async def flush():
+        results = await db.run(_import_batch, batch, upsert)
+        for line_number, result in zip(line_numbers, results):
+            if result.status == "error":
+                _record_import_error(summary, line_number, result.name, result.detail)
+            elif result.status == "created":
+                summary.created += 1
+            else:
+                summary.updated += 1
+        batch.clear()
+        line_numbers.clear()
+    
+    line_number = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                batch.append(PromptExport.model_validate_json(line))
+                line_numbers.append(line_number)
+            except ValueError as e:
+                _record_import_error(summary, line_number, None, str(e))
+            if len(batch) >= settings.IMPORT_BATCH_SIZE:
+                await flush()
+    if buffer.strip():
+        line_number += 1
+        try:
+            batch.append(PromptExport.model_validate_json(buffer))
+            line_numbers.append(line_number)
+        except ValueError as e:
+            _record_import_error(summary, line_number, None, str(e))
+    if batch:
+        await flush()
+    return summary
+
+
+def _import_batch(db: Session, prompts: List[PromptExport], upsert: bool) -> List[BulkPromptResult]:
+    try:
+        results = _commit_bulk_write(db, prompts, upsert)
+        _invalidate_prompts(result.id for result in results if result.id is not None)
+    except SQLAlchemyError as e:
+        # Earlier batches stay committed; report this one as failed
+        db.rollback()
+        return [
+            BulkPromptResult(index=index, name=prompt.name, status="error", detail=str(e))
+            for index, prompt in enumerate(prompts)
+        ]
+    return results
+
+
+def _record_import_error(summary: ImportSummary, line: int, name: Optional[str], detail: str) -> None:
+    summary.failed += 1
+    summary.errors.append(ImportLineError(line=line, name=name, detail=detail))
 
 
 @router.get("/{prompt_id}", response_model=Prompt)
-def read_prompt(prompt_id: int, db: Session = Depends(get_db)):
+async def read_prompt(prompt_id: int, request: Request, db: SessionRunner = Depends(get_db_runner)):
+    """
+    Fetch a prompt through the read-through prompt cache.
+    
+    Responses carry an ETag; a matching If-None-Match gets a 304, and a
+    cached prompt is served without touching the database.
+    """
+    cache = get_prompt_cache()
+    cached = cache.get(prompt_id)
+    if cached is None:
+        generation = prompt_generations.get(prompt_id)
+        body = await db.run(_serialize_prompt, prompt_id)
+        cached = (body, compute_etag(body))
+        # Skipped if the prompt was written while it was being read
+        prompt_generations.set_if_current(cache, prompt_id, generation, cached)
+    
+    body, etag = cached
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def _serialize_prompt(db: Session, prompt_id: int) -> bytes:
     prompt = db.query(PromptModel).filter(PromptModel.id == prompt_id).first()
     if prompt is None:
         raise HTTPException(status_code=404, detail="Prompt not found")
-    return prompt
+    return Prompt.model_validate(prompt).model_dump_json().encode()
 
 
 @router.put("/{prompt_id}", response_model=Prompt)
-def update_prompt(prompt_id: int, prompt: PromptUpdate, db: Session = Depends(get_db)):
+async def update_prompt(prompt_id: int, prompt: PromptUpdate, db: SessionRunner = Depends(get_db_runner)):
+    updated = await db.run(_update_prompt, prompt_id, prompt)
+    _invalidate_prompts([prompt_id])
+    return updated
+
+
+def _update_prompt(db: Session, prompt_id: int, prompt: PromptUpdate) -> Prompt:
     db_prompt = db.query(PromptModel).filter(PromptModel.id == prompt_id).first()
     if db_prompt is None:
         raise HTTPException(status_code=404, detail="Prompt not found")
@@ -146,59 +713,28 @@ def update_prompt(prompt_id: int, prompt: PromptUpdate, db: Session = Depends(ge
                 detail="A prompt with this name already exists"
             )
     
-    # Handle version
-    if prompt.version is not None:
-        try:
-            version = int(prompt.version)
-            if version <= 0:
-                version = 1
-        except (ValueError, TypeError):
-            version = db_prompt.version + 1
-    else:
-        version = db_prompt.version + 1
-    
-    # Update prompt fields
-    for field, value in prompt.model_dump(exclude_unset=True).items():
-        if field != "version" and field != "tags":
-            setattr(db_prompt, field, value)
-    
-    # Handle tags
-    if prompt.tags is not None:
-        db_prompt.tags = []
-        for tag_name in prompt.tags:
-            tag = db.query(TagModel).filter(TagModel.name == tag_name).first()
-            if not tag:
-                tag = TagModel(name=tag_name)
-                db.add(tag)
-            db_prompt.tags.append(tag)
-    
-    # Update version
-    db_prompt.version = version
-    
-    # Create new version record
-    version = PromptVersionModel(
-        prompt_id=db_prompt.id,
-        version=version,
-        text=db_prompt.text,
-        description=db_prompt.description,
-        meta=db_prompt.meta
-    )
-    db.add(version)
-    
-    db.commit()
+    if _apply_prompt_update(db, db_prompt, prompt):
+        search_index.index_prompts(db, [db_prompt.id])
+        db.commit()
     db.refresh(db_prompt)
-    return db_prompt
+    return Prompt.model_validate(db_prompt)
 
 
 @router.delete("/{prompt_id}")
-def delete_prompt(prompt_id: int, db: Session = Depends(get_db)):
+async def delete_prompt(prompt_id: int, db: SessionRunner = Depends(get_db_runner)):
+    await db.run(_delete_prompt, prompt_id)
+    _invalidate_prompts([prompt_id])
+    return {"message": "Prompt deleted successfully"}
+
+
+def _delete_prompt(db: Session, prompt_id: int) -> None:
     prompt = db.query(PromptModel).filter(PromptModel.id == prompt_id).first()
     if prompt is None:
         raise HTTPException(status_code=404, detail="Prompt not found")
     
+    search_index.remove_prompts(db, [prompt.id])
     db.delete(prompt)
     db.commit()
-    return {"message": "Prompt deleted successfully"}
 
 @router.post("/seed", status_code=status.HTTP_201_CREATED)
 def seed_database():
@@ -206,6 +742,9 @@ def seed_database():
     Seed the database with initial prompt data.
     This endpoint is used to populate the database with sample prompts.
     """
+    # Imported here so `requests` is only loaded when seeding
+    from app.scripts.seed_prompts_api import seed_prompts_api
+
     try:
         seed_prompts_api()
         return {"message": "Database seeded successfully"}
@@ -216,10 +755,14 @@ def seed_database():
         )
 
 @router.get("/{prompt_id}/versions/{version_number}", response_model=PromptVersion)
-def read_prompt_version(prompt_id: int, version_number: int, db: Session = Depends(get_db)):
+async def read_prompt_version(prompt_id: int, version_number: int, db: SessionRunner = Depends(get_db_runner)):
     """
     Fetch a specific version of a prompt.
     """
+    return await db.run(_read_prompt_version, prompt_id, version_number)
+
+
+def _read_prompt_version(db: Session, prompt_id: int, version_number: int) -> PromptVersion:
     # First check if prompt exists
     prompt = db.query(PromptModel).filter(PromptModel.id == prompt_id).first()
     if prompt is None:
@@ -237,16 +780,155 @@ def read_prompt_version(prompt_id: int, version_number: int, db: Session = Depen
             detail=f"Version {version_number} not found for prompt {prompt_id}"
         )
     
-    return version
+    return PromptVersion.model_validate(version)
+
+
+@router.get(
+    "/{prompt_id}/versions",
+    response_model=List[PromptVersionSummary],
+    response_model_exclude_unset=True,
+    responses=NEXT_CURSOR_RESPONSES
+)
+async def read_prompt_versions(
+    prompt_id: int,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="`X-Next-Cursor` header of the previous page"),
+    summary: bool = Query(False, description="Leave out version texts"),
+    db: SessionRunner = Depends(get_db_runner)
+):
+    """
+    List the versions of a prompt, oldest first.
+
+    Pass the `X-Next-Cursor` response header back as `cursor` to fetch the
+    next page. With `summary=true` version texts are neither loaded nor
+    returned.
+    """
+    position = decode_cursor(cursor)
+    after_id = _cursor_position(position, "id") if position is not None else None
+    versions = await db.run(_list_prompt_versions, prompt_id, limit, after_id, summary)
+    if len(versions) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": versions[-1].id})
+    return versions
+
+
+def _list_prompt_versions(
+    db: Session,
+    prompt_id: int,
+    limit: int,
+    after_id: Optional[int],
+    summary: bool
+) -> List[PromptVersionSummary]:
+    if db.query(PromptModel.id).filter(PromptModel.id == prompt_id).first() is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    
+    query = db.query(PromptVersionModel).filter(PromptVersionModel.prompt_id == prompt_id)
+    if summary:
+        query = query.options(
+            load_only(*(getattr(PromptVersionModel, field) for field in VERSION_SUMMARY_FIELDS)),
+            lazyload(PromptVersionModel.blob)
+        )
+    if after_id is not None:
+        query = query.filter(PromptVersionModel.id > after_id)
+    versions = query.order_by(PromptVersionModel.id).limit(limit).all()
+    
+    if summary:
+        return [
+            PromptVersionSummary(**{field: getattr(version, field) for field in VERSION_SUMMARY_FIELDS})
+            for version in versions
+        ]
+    return [PromptVersionSummary.model_validate(version, from_attributes=True) for version in versions]
+
+
+@router.get("/{prompt_id}/diff", response_model=PromptDiff, response_model_exclude_none=True)
+async def diff_prompt_versions(
+    prompt_id: int,
+    from_version: int = Query(..., alias="from"),
+    to_version: int = Query(..., alias="to"),
+    mode: Literal["unified", "word"] = Query(
+        "unified", description="`unified` for a line diff, `word` for word-level segments"
+    ),
+    db: SessionRunner = Depends(get_db_runner)
+):
+    """
+    Diff two versions of a prompt.
+
+    Versions never change, so diffs are cached and only computed once per
+    pair of versions and mode.
+    """
+    return await db.run(_diff_prompt_versions, prompt_id, from_version, to_version, mode)
+
+
+def _diff_prompt_versions(
+    db: Session,
+    prompt_id: int,
+    from_version: int,
+    to_version: int,
+    mode: str
+) -> PromptDiff:
+    if db.query(PromptModel.id).filter(PromptModel.id == prompt_id).first() is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    
+    version_ids: Dict[int, int] = {}
+    for version_id, number in db.query(PromptVersionModel.id, PromptVersionModel.version).filter(
+        PromptVersionModel.prompt_id == prompt_id,
+        PromptVersionModel.version.in_({from_version, to_version})
+    ).order_by(PromptVersionModel.id):
+        version_ids.setdefault(number, version_id)
+    for number in (from_version, to_version):
+        if number not in version_ids:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Version {number} not found for prompt {prompt_id}"
+            )
+    
+    key = (version_ids[from_version], version_ids[to_version], mode)
+    diff = diff_cache.get(key)
+    if diff is None:
+        old = db.get(PromptVersionModel, version_ids[from_version]).text
+        new = db.get(PromptVersionModel, version_ids[to_version]).text
+        if mode == "word":
+            computed = {"segments": word_diff(old, new)}
+        else:
+            computed = {"unified": unified_diff(old, new, f"v{from_version}", f"v{to_version}")}
+        diff = PromptDiff(
+            prompt_id=prompt_id, from_version=from_version, to_version=to_version, mode=mode, **computed
+        )
+        diff_cache.set(key, diff)
+    return diff
+
+
+async def _prepare_playground(request: PlaygroundRequest, db: SessionRunner):
+    """
+    Look up the prompt to run and render it with the request's variables.
+    """
+    prompt_name, prompt_version, prompt_text = await db.run(playground.load_prompt, request)
+    
+    # Render every prompt, with or without variables, so both cases agree
+    try:
+        prompt_text = render_prompt(
+            request.prompt_id, prompt_version, prompt_text, request.variables or {}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error processing variables: {str(e)}"
+        )
+    return prompt_name, prompt_version, prompt_text
+
 
 @router.post("/playground", response_model=PlaygroundResponse)
 async def prompt_playground(
     request: PlaygroundRequest,
-    db: Session = Depends(get_db)
+    db: SessionRunner = Depends(get_db_runner)
 ):
     """
     Compare responses from different LLM models for a given prompt.
     
+    The prompt is rendered as a Jinja template with `variables`. A
+    `{{ placeholder }}` without a value is left in verbatim, or is a 400
+    when TEMPLATE_STRICT_UNDEFINED is set.
+    
     Args:
         request: PlaygroundRequest containing prompt_id, models, variables, and optional version
         db: Database session
@@ -254,86 +936,83 @@ async def prompt_playground(
     Returns:
         PlaygroundResponse containing responses from each model
     """
-    # Get the prompt
-    prompt = db.query(PromptModel).filter(PromptModel.id == request.prompt_id).first()
-    if prompt is None:
-        raise HTTPException(status_code=404, detail="Prompt not found")
+    prompt_name, prompt_version, prompt_text = await _prepare_playground(request, db)
     
-    # Get the prompt version if specified, otherwise use latest
-    prompt_version = prompt.version
-    if request.version is not None:
-        version = db.query(PromptVersionModel).filter(
-            PromptVersionModel.prompt_id == request.prompt_id,
-            PromptVersionModel.version == request.version
-        ).first()
-        if version is None:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Version {request.version} not found for prompt {request.prompt_id}"
-            )
-        prompt_text = version.text
-        prompt_version = version.version
-    else:
-        prompt_text = prompt.text
-    
-    # Prepare the prompt text with variables if provided
-    if request.variables:
-        try:
-            # Simple variable substitution
-            for key, value in request.variables.items():
-                prompt_text = prompt_text.replace(f"{{{{ {key} }}}}", str(value))
-        except Exception as e:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Error processing variables: {str(e)}"
-            )
-    
-    # Get responses from each model
-    responses = {}
-    async with httpx.AsyncClient() as client:
-        for model in request.models:
-            try:
-                response = await client.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                        "HTTP-Referer": settings.PROJECT_URL,  # Optional: for rankings
-                        "X-Title": settings.PROJECT_NAME,  # Optional: for rankings
-                    },
-                    json={
-                        "model": model,
-                        "messages": [
-                            {"role": "system", "content": "You are a helpful AI assistant."},
-                            {"role": "user", "content": prompt_text}
-                        ]
-                    }
-                )
-                response.raise_for_status()
-                result = response.json()
-                
-                responses[model] = {
-                    "response": result["choices"][0]["message"]["content"],
-                    "model": model,
-                    "prompt_used": prompt_text,
-                    "metadata": {
-                        "prompt_id": request.prompt_id,
-                        "prompt_version": prompt_version,
-                        "variables_used": request.variables,
-                        "usage": result.get("usage", {}),
-                        "model_info": result.get("model", {})
-                    }
-                }
-            except Exception as e:
-                responses[model] = {
-                    "error": str(e),
-                    "model": model,
-                    "prompt_used": prompt_text
-                }
+    # Query all models concurrently, bounded by PLAYGROUND_MAX_CONCURRENCY
+    semaphore = asyncio.Semaphore(settings.PLAYGROUND_MAX_CONCURRENCY)
+    client = openrouter.get_client()
+    results = await asyncio.gather(*(
+        playground.run_model(
+            client, semaphore, model, prompt_text, request, prompt_version
+        )
+        for model in request.models
+    ))
+    responses = dict(zip(request.models, results))
     
     return PlaygroundResponse(
         prompt_id=request.prompt_id,
-        prompt_name=prompt.name,
+        prompt_name=prompt_name,
         prompt_version=prompt_version,
         variables_used=request.variables,
         responses=responses
-    ) 
\ No newline at end of file
+    )
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/playground/stream")
+async def prompt_playground_stream(
+    request: PlaygroundRequest,
+    db: SessionRunner = Depends(get_db_runner)
+):
+    """
+    Stream responses from several models as Server-Sent Events.
+    
+    Tokens from all models are interleaved as they arrive:
+    
+    - `start`: prompt id, name, version and the models being queried
+    - `chunk`: `{"model", "content"}` for each piece of generated text
+    - `done`: `{"model", "response", "usage", "timing"}` once a model finishes
+    - `error`: `{"model", "error"}` if a model fails or times out
+    - `end`: after every model has finished
+    """
+    prompt_name, prompt_version, prompt_text = await _prepare_playground(request, db)
+    
+    async def events():
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(settings.PLAYGROUND_MAX_CONCURRENCY)
+        client = openrouter.get_client()
+        tasks = [
+            asyncio.create_task(
+                playground.stream_model(client, semaphore, queue, model, prompt_text, request)
+            )
+            for model in request.models
+        ]
+        try:
+            yield _sse("start", {
+                "prompt_id": request.prompt_id,
+                "prompt_name": prompt_name,
+                "prompt_version": prompt_version,
+                "variables_used": request.variables,
+                "models": request.models
+            })
+            remaining = len(tasks)
+            while remaining:
+                event, data = await queue.get()
+                if event != "chunk":
+                    remaining -= 1
+                yield _sse(event, data)
+            yield _sse("end", {"prompt_id": request.prompt_id})
+        finally:
+            # The client may disconnect mid-stream; stop the upstream calls
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,44 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.core.cache import TAG_COUNTS_KEY, get_tag_cache, tag_generations
+from app.db.models import Tag as TagModel, prompt_tags
+from app.db.session import SessionRunner, get_db_runner
+from app.schemas.prompt import TagCount
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[TagCount])
+async def read_tags(
+    min_count: int = Query(1, description="Leave out tags on fewer prompts; 0 includes unused tags"),
+    limit: Optional[int] = Query(None, ge=1, description="Return at most this many tags"),
+    db: SessionRunner = Depends(get_db_runner)
+):
+    """
+    List tags with the number of prompts carrying each, most used first.
+
+    The counts are computed once and cached until the next prompt write
+    (or TAG_CACHE_TTL), so facet listings don't rescan `prompt_tags`.
+    """
+    cache = get_tag_cache()
+    counts = cache.get(TAG_COUNTS_KEY)
+    if counts is None:
+        generation = tag_generations.get(TAG_COUNTS_KEY)
+        counts = await db.run(_count_tags)
+        # Skipped if a prompt was written while the tags were being counted
+        tag_generations.set_if_current(cache, TAG_COUNTS_KEY, generation, counts)
+    counts = [count for count in counts if count.prompt_count >= min_count]
+    return counts[:limit] if limit is not None else counts
+
+
+def _count_tags(db: Session) -> List[TagCount]:
+    prompt_count = func.count(prompt_tags.c.prompt_id)
+    rows = db.execute(
+        select(TagModel.id, TagModel.name, prompt_count.label("prompt_count"))
+        .outerjoin(prompt_tags, prompt_tags.c.tag_id == TagModel.id)
+        .group_by(TagModel.id, TagModel.name)
+        .order_by(prompt_count.desc(), TagModel.name)
+    )
+    return [TagCount.model_validate(row, from_attributes=True) for row in rows]
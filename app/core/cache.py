@@ -0,0 +1,210 @@
+"""
+Pluggable caches for serialized API responses.
+
+The prompt cache backend is chosen with PROMPT_CACHE_BACKEND: `memory` (an
+in-process LRU with TTL, the default), `none` to disable caching, or a
+`module:factory` path for anything else (e.g. a Redis-backed cache). A
+factory is called with `maxsize` and `ttl` keyword arguments and must
+return a `CacheBackend`.
+"""
+import importlib
+import threading
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.core.config import settings
+
+
+class CacheBackend(ABC):
+    """
+    Minimal interface every cache backend implements.
+    """
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: Hashable) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class NullCache(CacheBackend):
+    """
+    Backend that never stores anything.
+    """
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        pass
+
+    def delete(self, key: Hashable) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class LRUCache(CacheBackend):
+    """
+    Thread-safe in-process LRU whose entries also expire after `ttl` seconds.
+    A `ttl` of 0 or less keeps entries until they are evicted.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Generations:
+    """
+    Per-key write counters that keep read-through caches from storing stale
+    values.
+
+    A reader notes the generation of its key before loading the value, and
+    stores the value with `set_if_current`. A writer calls `bump` after
+    committing, so a value loaded before that write is never cached.
+    Counters are per process; invalidation across processes still relies on
+    the backend's `delete` and TTL.
+    """
+
+    def __init__(self):
+        self._counts: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> int:
+        with self._lock:
+            return self._counts.get(key, 0)
+
+    def bump(self, key: Hashable) -> None:
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def set_if_current(self, cache: CacheBackend, key: Hashable, generation: int, value: Any) -> bool:
+        """
+        Store `value` unless `key` was bumped since `generation` was read.
+        """
+        with self._lock:
+            if self._counts.get(key, 0) != generation:
+                return False
+            cache.set(key, value)
+            return True
+
+
+def create_cache_backend(backend: str, maxsize: int, ttl: float) -> CacheBackend:
+    """
+    Build a cache backend from its configured name or `module:factory` path.
+    """
+    if backend == "memory":
+        return LRUCache(maxsize=maxsize, ttl=ttl)
+    if backend == "none":
+        return NullCache()
+    module_name, _, factory_name = backend.partition(":")
+    if not factory_name:
+        raise ValueError(f"Unknown cache backend: {backend}")
+    factory = getattr(importlib.import_module(module_name), factory_name)
+    return factory(maxsize=maxsize, ttl=ttl)
+
+
+_prompt_cache: Optional[CacheBackend] = None
+# Bumped by every write to a prompt, see `Generations`
+prompt_generations = Generations()
+
+
+def get_prompt_cache() -> CacheBackend:
+    """
+    Cache of serialized `Prompt` responses keyed by prompt id.
+    """
+    global _prompt_cache
+    if _prompt_cache is None:
+        _prompt_cache = create_cache_backend(
+            settings.PROMPT_CACHE_BACKEND,
+            maxsize=settings.PROMPT_CACHE_SIZE,
+            ttl=settings.PROMPT_CACHE_TTL
+        )
+    return _prompt_cache
+
+
+def set_prompt_cache(backend: Optional[CacheBackend]) -> None:
+    """
+    Swap the prompt cache backend; None falls back to the configured one.
+    """
+    global _prompt_cache
+    _prompt_cache = backend
+
+
+_tag_cache: Optional[CacheBackend] = None
+# Key of the tag counts, prefixed since a shared backend (e.g. Redis) may
+# hold the prompt cache's entries alongside
+TAG_COUNTS_KEY = "tags:counts"
+# Bumped by every prompt write, see `Generations`
+tag_generations = Generations()
+
+
+def get_tag_cache() -> CacheBackend:
+    """
+    Cache of the tag counts served by `GET /tags`, on the same backend as
+    the prompt cache. Only ever touch TAG_COUNTS_KEY in it; `clear()`
+    could empty a backend the prompt cache shares.
+    """
+    global _tag_cache
+    if _tag_cache is None:
+        _tag_cache = create_cache_backend(
+            settings.PROMPT_CACHE_BACKEND,
+            maxsize=1,
+            ttl=settings.TAG_CACHE_TTL
+        )
+    return _tag_cache
+
+
+def set_tag_cache(backend: Optional[CacheBackend]) -> None:
+    """
+    Swap the tag cache backend; None falls back to the configured one.
+    """
+    global _tag_cache
+    _tag_cache = backend
@@ -0,0 +1,123 @@
+"""
+Persistent cache of playground completions.
+
+Completions are stored in a local SQLite file (COMPLETION_CACHE_PATH),
+separate from the main database, keyed by a hash of the model, rendered
+prompt, system message and sampling parameters. Entries expire after
+COMPLETION_CACHE_TTL seconds and the least recently used ones are evicted
+beyond COMPLETION_CACHE_SIZE entries. The cache is off unless
+COMPLETION_CACHE_ENABLED is set.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+
+def completion_key(
+    model: str,
+    prompt: str,
+    system_message: str,
+    parameters: Optional[Dict[str, Any]]
+) -> str:
+    payload = json.dumps(
+        [model, prompt, system_message, parameters or {}],
+        sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class CompletionCache:
+    """
+    SQLite-backed LRU of completion responses with a TTL.
+    """
+
+    def __init__(self, path: str, maxsize: int = 10000, ttl: float = 86400):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS completion_cache ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_completion_cache_accessed_at ON completion_cache(accessed_at)"
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created_at FROM completion_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if self.ttl > 0 and created_at + self.ttl <= now:
+                self._connection.execute("DELETE FROM completion_cache WHERE key = ?", (key,))
+                return None
+            self._connection.execute(
+                "UPDATE completion_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(response)
+
+    def set(self, key: str, model: str, response: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO completion_cache (key, model, response, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, json.dumps(response), now, now)
+            )
+            if self.ttl > 0:
+                self._connection.execute(
+                    "DELETE FROM completion_cache WHERE created_at <= ?", (now - self.ttl,)
+                )
+            self._connection.execute(
+                "DELETE FROM completion_cache WHERE key IN ("
+                "SELECT key FROM completion_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM completion_cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT count(*) FROM completion_cache").fetchone()[0]
+
+
+_completion_cache: Optional[CompletionCache] = None
+
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """
+    The configured completion cache, or None when it is disabled.
+    """
+    global _completion_cache
+    if not settings.COMPLETION_CACHE_ENABLED:
+        return None
+    if _completion_cache is None:
+        _completion_cache = CompletionCache(
+            settings.COMPLETION_CACHE_PATH,
+            maxsize=settings.COMPLETION_CACHE_SIZE,
+            ttl=settings.COMPLETION_CACHE_TTL
+        )
+    return _completion_cache
+
+
+def set_completion_cache(cache: Optional[CompletionCache]) -> None:
+    """
+    Swap the completion cache; None falls back to the configured one.
+    """
+    global _completion_cache
+    _completion_cache = cache
@@ -16,6 +16,39 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./prompt_hub.db"
+    DB_INIT_ON_STARTUP: bool = True  # Create missing tables when the app starts
+    DB_CHECK_ON_STARTUP: bool = True  # Run a SELECT 1 when the app starts
+    DB_ASYNC: bool = False  # Serve prompt endpoints through aiosqlite/asyncpg instead of the threadpool
+    BULK_MAX_PROMPTS: int = 10000  # Largest batch accepted by POST /prompts/bulk
+    EXPORT_BATCH_SIZE: int = 500  # Rows fetched per round-trip when streaming an export
+    IMPORT_BATCH_SIZE: int = 500  # Prompts written per transaction when importing
+    
+    # Version storage; "full" keeps every version's text, "delta" stores diffs between keyframes
+    PROMPT_VERSION_STORAGE: str = "full"
+    PROMPT_VERSION_KEYFRAME_INTERVAL: int = 10  # Versions per full snapshot in delta mode
+    PROMPT_VERSION_CACHE_SIZE: int = 2048  # Reconstructed version texts kept in memory
+    DIFF_CACHE_SIZE: int = 512  # Computed version diffs kept in memory
+    DIFF_WORD_LIMIT: int = 2000  # Words in a word diff before it matches lines first
+    
+    # Connection pool (file and server databases)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a pooled connection is replaced
+    DB_POOL_PRE_PING: bool = True
+    
+    # SQLite pragmas, applied to every new connection
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT: int = 5000  # Milliseconds to wait on a locked database
+    SQLITE_CACHE_SIZE: int = -64000  # Negative values are KiB, so 64 MB
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MB
+    
+    # Prompt cache (GET /prompts/{id}); backend is memory, none or module:factory
+    PROMPT_CACHE_BACKEND: str = "memory"
+    PROMPT_CACHE_SIZE: int = 1024
+    PROMPT_CACHE_TTL: int = 300  # Seconds; bounds staleness if an invalidation is missed
+    TAG_CACHE_TTL: int = 300  # Seconds the tag counts of GET /tags are cached; writes invalidate them
     
     # CORS
     BACKEND_CORS_ORIGINS: list = ["*"]
@@ -24,9 +57,41 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     DEBUG: bool = False
+    METRICS_ENABLED: bool = True  # Serve Prometheus metrics at /metrics
+    DB_QUERY_TRACKING: bool = True  # Count SQL statements per request and flag probable N+1 queries
+    DB_SLOW_QUERY_MS: float = 200  # Log statements slower than this; 0 disables
+    DB_N_PLUS_ONE_THRESHOLD: int = 10  # Warn when one statement shape runs this often in a request; 0 disables
     
     # OpenRouter settings
     OPENROUTER_API_KEY: Optional[str] = None
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"  # Point at a local stub for load tests
+    MODELS_CACHE_TTL: int = 300  # Seconds before the model catalog is refreshed in the background
+    # Limits and retries for upstream model calls (see app/core/governor.py)
+    UPSTREAM_MAX_CONCURRENCY: int = 32  # Calls in flight across all models
+    UPSTREAM_MODEL_CONCURRENCY: int = 8  # Calls in flight per model
+    UPSTREAM_RATE_LIMIT: float = 0  # Calls started per second across all models; 0 disables
+    UPSTREAM_MODEL_RATE_LIMIT: float = 0  # Calls started per second per model; 0 disables
+    UPSTREAM_RATE_BURST: int = 10  # Calls that may start at once before rate limits apply
+    UPSTREAM_MODEL_STATE_SIZE: int = 1024  # Models whose per-model limiter state is kept; idle ones are evicted beyond this
+    UPSTREAM_MAX_RETRIES: int = 3  # Retries of 429/5xx responses and failed connections
+    UPSTREAM_RETRY_BASE_DELAY: float = 0.5  # Seconds; doubled on every retry
+    UPSTREAM_RETRY_MAX_DELAY: float = 30.0  # Longest wait, including Retry-After, before giving up
+    
+    # Playground settings
+    PLAYGROUND_MAX_CONCURRENCY: int = 5  # Models queried in parallel per request
+    PLAYGROUND_MODEL_TIMEOUT: float = 60.0  # Seconds allowed per model call
+    TEMPLATE_CACHE_SIZE: int = 512  # Compiled prompt templates kept in memory
+    TEMPLATE_STRICT_UNDEFINED: bool = False  # Reject renders that use missing variables instead of leaving {{ placeholders }} in
+    PLAYGROUND_JOB_CONCURRENCY: int = 8  # Model calls in flight across all batch jobs
+    PLAYGROUND_JOB_MAX_ITEMS: int = 20000  # Largest variable sets x models matrix per job
+    PLAYGROUND_JOBS_RESUME: bool = True  # Restart unfinished jobs when the app starts
+    PLAYGROUND_JOB_STALE_AFTER: int = 60  # Seconds without a heartbeat before another process may take a job over
+    
+    # Completion cache for playground calls (opt-in)
+    COMPLETION_CACHE_ENABLED: bool = False
+    COMPLETION_CACHE_PATH: str = "./completion_cache.db"
+    COMPLETION_CACHE_SIZE: int = 10000  # Entries kept; least recently used are evicted
+    COMPLETION_CACHE_TTL: int = 86400  # Seconds
     
     class Config:
         case_sensitive = True
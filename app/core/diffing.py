@@ -0,0 +1,85 @@
+"""
+Text diffs between prompt versions.
+
+Versions never change once written, so computed diffs are cached by the
+pair of version row ids and the diff mode.
+"""
+import difflib
+import re
+from typing import Dict, List
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+# Words, runs of whitespace and single punctuation characters
+_WORD_PATTERN = re.compile(r"\w+|\s+|[^\w\s]", re.UNICODE)
+
+diff_cache = LRUCache(maxsize=settings.DIFF_CACHE_SIZE, ttl=0)
+
+
+def _lines(text: str) -> List[str]:
+    lines = text.splitlines(keepends=True)
+    # Keep the last line separate from the hunk lines that follow it
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    return lines
+
+
+def unified_diff(old: str, new: str, old_label: str, new_label: str, context: int = 3) -> str:
+    """
+    Line-level diff in unified format.
+    """
+    return "".join(
+        difflib.unified_diff(_lines(old or ""), _lines(new or ""), old_label, new_label, n=context)
+    )
+
+
+def word_diff(old: str, new: str) -> List[Dict[str, str]]:
+    """
+    Word-level diff as a list of `{"op": equal|insert|delete, "text": ...}`
+    segments that spell out both texts when read in order.
+
+    Word matching is quadratic in the worst case, so texts with more than
+    DIFF_WORD_LIMIT words between them are matched line by line first, and
+    only changed blocks within that limit are diffed word by word. Larger
+    changed blocks come out as whole deleted and inserted lines.
+    """
+    segments: List[Dict[str, str]] = []
+
+    def emit(op: str, words: List[str]) -> None:
+        if not words:
+            return
+        if segments and segments[-1]["op"] == op:
+            segments[-1]["text"] += "".join(words)
+        else:
+            segments.append({"op": op, "text": "".join(words)})
+
+    def diff_words(old_words: List[str], new_words: List[str]) -> None:
+        matcher = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                emit("equal", old_words[i1:i2])
+            else:
+                emit("delete", old_words[i1:i2])
+                emit("insert", new_words[j1:j2])
+
+    old_words = _WORD_PATTERN.findall(old or "")
+    new_words = _WORD_PATTERN.findall(new or "")
+    if len(old_words) + len(new_words) <= settings.DIFF_WORD_LIMIT:
+        diff_words(old_words, new_words)
+        return segments
+
+    old_lines = (old or "").splitlines(keepends=True)
+    new_lines = (new or "").splitlines(keepends=True)
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines).get_opcodes():
+        if tag == "equal":
+            emit("equal", old_lines[i1:i2])
+            continue
+        old_words = _WORD_PATTERN.findall("".join(old_lines[i1:i2]))
+        new_words = _WORD_PATTERN.findall("".join(new_lines[j1:j2]))
+        if len(old_words) + len(new_words) <= settings.DIFF_WORD_LIMIT:
+            diff_words(old_words, new_words)
+        else:
+            emit("delete", old_lines[i1:i2])
+            emit("insert", new_lines[j1:j2])
+    return segments
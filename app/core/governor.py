@@ -0,0 +1,240 @@
+"""
+Rate control for calls to the upstream model API.
+
+Every OpenRouter request goes through `governor`, which
+
+- caps the calls in flight, across all models (UPSTREAM_MAX_CONCURRENCY)
+  and per model (UPSTREAM_MODEL_CONCURRENCY);
+- paces new calls with token buckets, globally (UPSTREAM_RATE_LIMIT) and
+  per model (UPSTREAM_MODEL_RATE_LIMIT), both in requests per second with
+  bursts of up to UPSTREAM_RATE_BURST;
+- retries 429 and 5xx responses and failed connections up to
+  UPSTREAM_MAX_RETRIES times, waiting as long as `Retry-After` asks or else
+  backing off exponentially with jitter. A 429 also holds back the other
+  calls to the same model until its `Retry-After` has passed.
+
+A concurrency slot is only held while a request is in flight (and, for a
+stream, until it has been read), never while waiting to retry.
+
+Model names come from requests, so per-model limiter state is kept in an
+LRU of UPSTREAM_MODEL_STATE_SIZE models. Only idle models are evicted:
+none of their calls waiting or in flight, no 429 cooldown pending and a
+full token bucket, so eviction never loosens a limit in effect.
+"""
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import observe_upstream_retry
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def retry_after(response: httpx.Response) -> Optional[float]:
+    """
+    Seconds to wait according to the response's `Retry-After` header, given
+    either as a number of seconds or as an HTTP date.
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter for the given (0-based) retry.
+    """
+    ceiling = min(settings.UPSTREAM_RETRY_BASE_DELAY * 2 ** attempt, settings.UPSTREAM_RETRY_MAX_DELAY)
+    return random.uniform(0, ceiling)
+
+
+class TokenBucket:
+    """
+    Paces callers to `rate` acquisitions per second with bursts of `burst`.
+
+    Each caller takes a token immediately, letting the balance go negative,
+    and then sleeps until its token would have been refilled. That keeps
+    callers in arrival order without a lock.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.burst) - 1
+        self._updated = now
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+    def is_full(self) -> bool:
+        """
+        Whether the bucket has refilled to its burst, so that a new bucket
+        would behave the same.
+        """
+        if self.rate <= 0:
+            return True
+        return self._tokens + (time.monotonic() - self._updated) * self.rate >= self.burst
+
+
+class _ModelLimits:
+    """
+    Limiter state of one model.
+    """
+
+    def __init__(self):
+        self.slots = asyncio.Semaphore(settings.UPSTREAM_MODEL_CONCURRENCY)
+        self.bucket = TokenBucket(settings.UPSTREAM_MODEL_RATE_LIMIT, settings.UPSTREAM_RATE_BURST)
+        # Monotonic time before which no new call to the model may start
+        self.cooldown_until = 0.0
+        # Calls waiting for their turn, in flight or waiting to retry
+        self.users = 0
+
+    def is_idle(self) -> bool:
+        return self.users == 0 and self.cooldown_until <= time.monotonic() and self.bucket.is_full()
+
+
+class UpstreamGovernor:
+    """
+    Concurrency limits, rate limits and retries shared by all upstream calls.
+
+    Semaphores belong to the event loop they were created on, so all state
+    is rebuilt when the governor is used from a new loop.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Drop all limiter state so changed settings take effect.
+        """
+        self._global_slots = asyncio.Semaphore(settings.UPSTREAM_MAX_CONCURRENCY)
+        self._global_bucket = TokenBucket(settings.UPSTREAM_RATE_LIMIT, settings.UPSTREAM_RATE_BURST)
+        self._models: "OrderedDict[str, _ModelLimits]" = OrderedDict()
+
+    def _check_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self.reset()
+
+    def _model_limits(self, model: str) -> _ModelLimits:
+        limits = self._models.get(model)
+        if limits is not None:
+            self._models.move_to_end(model)
+            return limits
+        limits = self._models[model] = _ModelLimits()
+        # Evict idle models, least recently used first; busy ones stay even
+        # if that leaves the LRU over its size for a while
+        excess = len(self._models) - settings.UPSTREAM_MODEL_STATE_SIZE
+        if excess > 0:
+            idle = [name for name, state in self._models.items() if state.is_idle()]
+            for name in idle[:excess]:
+                del self._models[name]
+        return limits
+
+    async def _wait_for_turn(self, limits: _ModelLimits) -> None:
+        while True:
+            wait = limits.cooldown_until - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        await limits.bucket.acquire()
+        await self._global_bucket.acquire()
+
+    @asynccontextmanager
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        model: str,
+        request: httpx.Request,
+        stream: bool = False
+    ) -> AsyncIterator[httpx.Response]:
+        """
+        Send `request` for `model`, retrying as configured, and yield the
+        final response, which may still be an error.
+
+        With `stream=True` the body is not read up front and the
+        concurrency slot is held until the block exits.
+
+        Raises:
+            httpx.TransportError: if the request could not be sent
+        """
+        self._check_loop()
+        limits = self._model_limits(model)
+        limits.users += 1
+        try:
+            attempt = 0
+            while True:
+                await self._wait_for_turn(limits)
+                async with self._global_slots, limits.slots:
+                    try:
+                        response = await client.send(request, stream=stream)
+                    except (httpx.ConnectError, httpx.ConnectTimeout):
+                        if attempt >= settings.UPSTREAM_MAX_RETRIES:
+                            raise
+                        delay = backoff_delay(attempt)
+                        reason = "connect_error"
+                    else:
+                        delay = self._retry_delay(limits, response, attempt)
+                        if delay is None:
+                            try:
+                                yield response
+                            finally:
+                                await response.aclose()
+                            return
+                        await response.aclose()
+                        reason = str(response.status_code)
+                logger.info(
+                    "Upstream call to %s failed (attempt %d), retrying in %.2fs", model, attempt + 1, delay
+                )
+                observe_upstream_retry(model, reason)
+                await asyncio.sleep(delay)
+                attempt += 1
+        finally:
+            limits.users -= 1
+
+    def _retry_delay(self, limits: _ModelLimits, response: httpx.Response, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying `response`, or None to return it.
+        """
+        if response.status_code not in RETRY_STATUSES or attempt >= settings.UPSTREAM_MAX_RETRIES:
+            return None
+        delay = retry_after(response)
+        if delay is None:
+            return backoff_delay(attempt)
+        if delay > settings.UPSTREAM_RETRY_MAX_DELAY:
+            # Longer than we are willing to wait; report the error instead
+            return None
+        if response.status_code == 429:
+            limits.cooldown_until = time.monotonic() + delay
+        return delay
+
+
+governor = UpstreamGovernor()
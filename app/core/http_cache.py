@@ -0,0 +1,19 @@
+import hashlib
+from typing import Optional
+
+
+def compute_etag(body: bytes) -> str:
+    """
+    Strong ETag for a serialized response body.
+    """
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match request header against the current ETag.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
@@ -0,0 +1,171 @@
+"""
+Prometheus metrics for the API, its database use and upstream model calls.
+
+`MetricsMiddleware` records latency, in-flight requests, and (with
+`QueryTrackingMiddleware` installed around it) queries and database time
+for every request, labelled with the route template (e.g.
+`/api/v1/prompts/{prompt_id}`) rather than the raw path. The
+`observe_upstream_*` helpers are called around OpenRouter requests.
+Everything is served in the Prometheus text format at `/metrics`.
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db.instrumentation import current_query_stats
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests served",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response",
+    ["method", "route"]
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being served",
+    ["method"]
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Database time per request",
+    ["route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+UPSTREAM_SECONDS = Histogram(
+    "upstream_request_duration_seconds",
+    "Latency of upstream model calls, including retries",
+    ["model", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+)
+UPSTREAM_FIRST_TOKEN_SECONDS = Histogram(
+    "upstream_first_token_seconds",
+    "Time to the first streamed token of upstream model calls",
+    ["model"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+UPSTREAM_TOKENS = Counter(
+    "upstream_tokens_total",
+    "Tokens used by upstream model calls",
+    ["model", "kind"]
+)
+UPSTREAM_ERRORS = Counter(
+    "upstream_errors_total",
+    "Failed upstream model calls",
+    ["model", "reason"]
+)
+UPSTREAM_RETRIES = Counter(
+    "upstream_retries_total",
+    "Upstream model calls retried, by the status that caused the retry",
+    ["model", "status"]
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_template(scope: Scope) -> str:
+    """
+    The template of the route that matched the request, e.g.
+    `/api/v1/prompts/{prompt_id}`, or UNMATCHED_ROUTE if none did.
+    """
+    # FastAPI 0.137+ includes routers lazily: `scope["route"]` is then the
+    # router's own route, whose path lacks the include prefixes, and the
+    # full template is on the route context FastAPI keeps in the scope
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    template = getattr(context, "path_format", None) or getattr(scope.get("route"), "path_format", None)
+    if template is None:
+        return UNMATCHED_ROUTE
+    # Mounted sub-applications add their prefix in front
+    return scope.get("root_path", "") + template
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request metrics.
+
+    Written as plain ASGI rather than `BaseHTTPMiddleware` so that
+    streamed responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.labels(method).inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_PROGRESS.labels(method).dec()
+            route = route_template(scope)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            HTTP_REQUEST_SECONDS.labels(method, route).observe(elapsed)
+            queries = current_query_stats()
+            if queries is not None:
+                REQUEST_DB_QUERIES.labels(route).observe(queries.queries)
+                REQUEST_DB_SECONDS.labels(route).observe(queries.seconds)
+
+
+def error_reason(exc: BaseException) -> str:
+    """
+    Low-cardinality label for a failed upstream call.
+    """
+    if isinstance(exc, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(exc, httpx.HTTPStatusError):
+        return f"http_{exc.response.status_code}"
+    return type(exc).__name__
+
+
+def observe_upstream_call(
+    model: str,
+    seconds: float,
+    usage: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+    first_token_seconds: Optional[float] = None
+) -> None:
+    """
+    Record one finished upstream call. `error` is a reason from
+    `error_reason`; token usage is only counted on success.
+    """
+    UPSTREAM_SECONDS.labels(model, "error" if error else "ok").observe(seconds)
+    if error:
+        UPSTREAM_ERRORS.labels(model, error).inc()
+        return
+    if first_token_seconds is not None:
+        UPSTREAM_FIRST_TOKEN_SECONDS.labels(model).observe(first_token_seconds)
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if (usage or {}).get(kind):
+            UPSTREAM_TOKENS.labels(model, kind.split("_")[0]).inc(usage[kind])
+
+
+def observe_upstream_retry(model: str, status: str) -> None:
+    UPSTREAM_RETRIES.labels(model, status).inc()
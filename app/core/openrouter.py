@@ -0,0 +1,222 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.governor import governor
+from app.core.http_cache import compute_etag
+
+logger = logging.getLogger(__name__)
+
+# Shared client and the event loop it belongs to
+_client: Optional[Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    HTTP client for upstream calls, shared so connections are kept alive
+    and reused across requests. A new one is made for each event loop.
+    """
+    global _client
+    loop = asyncio.get_running_loop()
+    if _client is None or _client[0] is not loop:
+        _client = (loop, httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.UPSTREAM_MAX_CONCURRENCY,
+                max_keepalive_connections=settings.UPSTREAM_MAX_CONCURRENCY
+            ),
+            # Model calls are bounded by PLAYGROUND_MODEL_TIMEOUT instead
+            timeout=httpx.Timeout(None, connect=10.0)
+        ))
+    return _client[1]
+
+
+def set_client(client: Optional[httpx.AsyncClient]) -> None:
+    """
+    Use `client` for upstream calls on the running loop; None resets to
+    the default client.
+    """
+    global _client
+    _client = (asyncio.get_running_loop(), client) if client is not None else None
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        loop, client = _client
+        _client = None
+        if loop is asyncio.get_running_loop():
+            await client.aclose()
+
+
+def _raise_for_status(response: httpx.Response, model: str) -> None:
+    if response.status_code == 429:
+        wait = response.headers.get("Retry-After")
+        raise httpx.HTTPStatusError(
+            f"Rate limited by OpenRouter for model '{model}'" + (f" (retry after {wait}s)" if wait else ""),
+            request=response.request,
+            response=response
+        )
+    response.raise_for_status()
+
+
+def openrouter_headers() -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
+        "HTTP-Referer": settings.PROJECT_URL,  # Optional: for rankings
+        "X-Title": settings.PROJECT_NAME,  # Optional: for rankings
+    }
+
+
+async def chat_completion(
+    client: httpx.AsyncClient,
+    model: str,
+    messages: List[Dict[str, str]],
+    parameters: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Request a single chat completion from OpenRouter.
+
+    `parameters` holds extra sampling options (temperature, max_tokens, ...).
+    The call is rate limited and retried by the upstream governor.
+
+    Raises:
+        httpx.HTTPError: if the request fails or returns an error status
+    """
+    request = client.build_request(
+        "POST",
+        f"{settings.OPENROUTER_BASE_URL}/chat/completions",
+        headers=openrouter_headers(),
+        json={**(parameters or {}), "model": model, "messages": messages}
+    )
+    async with governor.request(client, model, request) as response:
+        _raise_for_status(response, model)
+        return response.json()
+
+
+async def stream_chat_completion(
+    client: httpx.AsyncClient,
+    model: str,
+    messages: List[Dict[str, str]],
+    parameters: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Request a streamed chat completion and yield each SSE chunk as a dict.
+
+    The last chunk carries `usage`.
+
+    Raises:
+        httpx.HTTPError: if the request fails or returns an error status
+    """
+    request = client.build_request(
+        "POST",
+        f"{settings.OPENROUTER_BASE_URL}/chat/completions",
+        headers=openrouter_headers(),
+        json={
+            **(parameters or {}),
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        }
+    )
+    async with governor.request(client, model, request, stream=True) as response:
+        _raise_for_status(response, model)
+        async for line in response.aiter_lines():
+            # Blank lines separate events; lines starting with ":" are keep-alive comments
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            yield json.loads(data)
+
+
+async def fetch_models() -> Dict[str, Any]:
+    """
+    Fetch the OpenRouter model catalog, keeping only the fields the UI needs.
+    """
+    response = await get_client().get(
+        f"{settings.OPENROUTER_BASE_URL}/models",
+        headers=openrouter_headers(),
+        timeout=30.0
+    )
+    response.raise_for_status()
+    data = response.json()
+    
+    # Filter the data array to only include id, name, and pricing
+    if "data" in data:
+        data["data"] = [
+            {
+                "id": model["id"],
+                "name": model["name"],
+                "pricing": model["pricing"],
+                "description": model["description"],
+                "architecture": model["architecture"],
+                "context_length": model["context_length"],
+            }
+            for model in data["data"]
+        ]
+    return data
+
+
+class ModelCatalogCache:
+    """
+    In-process cache of the serialized model catalog.
+
+    Only the first request waits on OpenRouter. Once an entry exists it is
+    always served immediately; when it is older than MODELS_CACHE_TTL a
+    single background task refreshes it (stale-while-revalidate).
+    """
+
+    def __init__(self):
+        self._entry: Optional[Tuple[bytes, str, float]] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def get(self) -> Tuple[bytes, str]:
+        """
+        Return the cached catalog body and its ETag.
+
+        Raises:
+            Exception: if nothing is cached yet and the upstream fetch fails
+        """
+        if self._entry is None:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if self._entry is None:
+                    await self._refresh()
+        elif self._is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._refresh_in_background())
+        body, etag, _ = self._entry
+        return body, etag
+
+    def clear(self) -> None:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        self._entry = None
+        self._lock = None
+        self._refresh_task = None
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._entry[2] >= settings.MODELS_CACHE_TTL
+
+    async def _refresh(self) -> None:
+        data = await fetch_models()
+        body = json.dumps(data, separators=(",", ":")).encode()
+        self._entry = (body, compute_etag(body), time.monotonic())
+
+    async def _refresh_in_background(self) -> None:
+        try:
+            await self._refresh()
+        except Exception:
+            # Keep serving the stale catalog; the next request retries
+            logger.exception("Failed to refresh the OpenRouter model catalog")
+
+
+model_catalog = ModelCatalogCache()
@@ -0,0 +1,50 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# OpenAPI description of the header, for the `responses` of paginated routes
+NEXT_CURSOR_RESPONSES: Dict[int, Dict[str, Any]] = {
+    200: {
+        "headers": {
+            NEXT_CURSOR_HEADER: {
+                "description": "Opaque cursor of the next page, to pass back as `cursor`; absent on the last page",
+                "schema": {"type": "string"},
+            }
+        }
+    }
+}
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """
+    Encode a keyset position as an opaque, URL-safe cursor string.
+    """
+    raw = json.dumps(position, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        position = None
+    if not isinstance(position, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return position
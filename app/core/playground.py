@@ -0,0 +1,198 @@
+"""
+Running prompts against upstream models, shared by the playground endpoints
+and batch playground jobs.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.core import openrouter
+from app.core.completion_cache import completion_key, get_completion_cache
+from app.core.config import settings
+from app.core.metrics import error_reason, observe_upstream_call
+from app.db.models import Prompt as PromptModel, PromptVersion as PromptVersionModel
+from app.schemas.prompt import PlaygroundRequest, SamplingParameters
+
+
+def sampling_parameters(parameters: Optional[SamplingParameters]) -> Optional[Dict[str, Any]]:
+    """
+    The sampling options that were set, as sent upstream.
+    """
+    return parameters.model_dump(exclude_none=True) if parameters is not None else None
+
+
+def load_prompt(db: Session, request: PlaygroundRequest):
+    """
+    Look up the name, version number and text the playground should run.
+    """
+    # Get the prompt
+    prompt = db.query(PromptModel).filter(PromptModel.id == request.prompt_id).first()
+    if prompt is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    
+    # Get the prompt version if specified, otherwise use latest
+    prompt_version = prompt.version
+    if request.version is not None:
+        version = db.query(PromptVersionModel).filter(
+            PromptVersionModel.prompt_id == request.prompt_id,
+            PromptVersionModel.version == request.version
+        ).first()
+        if version is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Version {request.version} not found for prompt {request.prompt_id}"
+            )
+        prompt_text = version.text
+        prompt_version = version.version
+    else:
+        prompt_text = prompt.text
+    
+    return prompt.name, prompt_version, prompt_text
+
+
+def _completion_content(result: Dict[str, Any]) -> str:
+    """
+    The text of a chat completion.
+
+    Raises:
+        ValueError: if the completion has no message content
+    """
+    try:
+        content = result["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        content = None
+    if not isinstance(content, str):
+        raise ValueError("Model returned a completion without message content")
+    return content
+
+
+async def run_model(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    model: str,
+    prompt_text: str,
+    request: PlaygroundRequest,
+    prompt_version: int
+) -> Dict[str, Any]:
+    """
+    Run the prompt against a single model, capturing any failure as an error entry.
+
+    Successful completions are stored in, and served from, the completion
+    cache when it is enabled and the request allows it.
+    """
+    cache = get_completion_cache() if request.use_cache else None
+    parameters = sampling_parameters(request.parameters)
+    key = completion_key(model, prompt_text, request.system_message, parameters)
+    try:
+        result = await run_in_threadpool(cache.get, key) if cache is not None else None
+        cache_hit = result is not None
+        if result is None:
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await asyncio.wait_for(
+                        openrouter.chat_completion(
+                            client,
+                            model,
+                            [
+                                {"role": "system", "content": request.system_message},
+                                {"role": "user", "content": prompt_text}
+                            ],
+                            parameters
+                        ),
+                        timeout=settings.PLAYGROUND_MODEL_TIMEOUT
+                    )
+                except Exception as e:
+                    observe_upstream_call(model, time.perf_counter() - started, error=error_reason(e))
+                    raise
+            observe_upstream_call(model, time.perf_counter() - started, result.get("usage"))
+            content = _completion_content(result)
+            if cache is not None:
+                await run_in_threadpool(cache.set, key, model, result)
+        else:
+            content = _completion_content(result)
+        
+        return {
+            "response": content,
+            "model": model,
+            "prompt_used": prompt_text,
+            "metadata": {
+                "prompt_id": request.prompt_id,
+                "prompt_version": prompt_version,
+                "variables_used": request.variables,
+                "usage": result.get("usage", {}),
+                "model_info": result.get("model", {}),
+                "cache_hit": cache_hit
+            }
+        }
+    except asyncio.TimeoutError:
+        error = f"Model did not respond within {settings.PLAYGROUND_MODEL_TIMEOUT} seconds"
+    except Exception as e:
+        error = str(e)
+    return {
+        "error": error,
+        "model": model,
+        "prompt_used": prompt_text
+    }
+
+
+async def stream_model(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    queue: asyncio.Queue,
+    model: str,
+    prompt_text: str,
+    request: PlaygroundRequest
+) -> None:
+    """
+    Stream one model's completion onto `queue` as `chunk` events, followed
+    by a `done` event with usage and timing, or an `error` event.
+    """
+    parts: List[str] = []
+    usage: Dict[str, Any] = {}
+    timing: Dict[str, Optional[float]] = {"first_token_seconds": None, "total_seconds": None}
+    
+    async def consume(started: float):
+        nonlocal usage
+        async for chunk in openrouter.stream_chat_completion(
+            client,
+            model,
+            [
+                {"role": "system", "content": request.system_message},
+                {"role": "user", "content": prompt_text}
+            ],
+            sampling_parameters(request.parameters)
+        ):
+            if chunk.get("usage"):
+                usage = chunk["usage"]
+            for choice in chunk.get("choices", []):
+                content = (choice.get("delta") or {}).get("content")
+                if not content:
+                    continue
+                if timing["first_token_seconds"] is None:
+                    timing["first_token_seconds"] = time.perf_counter() - started
+                parts.append(content)
+                await queue.put(("chunk", {"model": model, "content": content}))
+    
+    started = None
+    try:
+        async with semaphore:
+            started = time.perf_counter()
+            await asyncio.wait_for(consume(started), timeout=settings.PLAYGROUND_MODEL_TIMEOUT)
+            timing["total_seconds"] = time.perf_counter() - started
+        observe_upstream_call(model, timing["total_seconds"], usage, first_token_seconds=timing["first_token_seconds"])
+        event = ("done", {"model": model, "response": "".join(parts), "usage": usage, "timing": timing})
+    except Exception as e:
+        if started is not None:
+            observe_upstream_call(model, time.perf_counter() - started, error=error_reason(e))
+        if isinstance(e, asyncio.TimeoutError):
+            error = f"Model did not respond within {settings.PLAYGROUND_MODEL_TIMEOUT} seconds"
+        else:
+            error = str(e)
+        event = ("error", {"model": model, "error": error})
+    await queue.put(event)
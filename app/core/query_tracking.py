@@ -0,0 +1,55 @@
+"""
+Per-request SQL statistics.
+
+`QueryTrackingMiddleware` collects the statements each request runs (see
+`app.db.instrumentation`), logs a warning when one statement shape runs at
+least DB_N_PLUS_ONE_THRESHOLD times, the usual sign of a lazy load inside
+a loop, and in DEBUG mode reports the totals in `X-DB-Queries` and
+`X-DB-Time` (milliseconds) response headers.
+"""
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.instrumentation import track_queries
+
+logger = logging.getLogger(__name__)
+
+DB_QUERIES_HEADER = "X-DB-Queries"
+DB_TIME_HEADER = "X-DB-Time"
+
+
+class QueryTrackingMiddleware:
+    """
+    ASGI middleware collecting SQL statistics per request.
+
+    Headers are added when the response starts, so statements a streamed
+    response runs afterwards are only reflected in the N+1 check.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        label = f"{scope['method']} {scope['path']}"
+        with track_queries(label) as queries:
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start" and settings.DEBUG:
+                    headers = MutableHeaders(scope=message)
+                    headers[DB_QUERIES_HEADER] = str(queries.queries)
+                    headers[DB_TIME_HEADER] = f"{queries.seconds * 1000:.2f}"
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                threshold = settings.DB_N_PLUS_ONE_THRESHOLD
+                if threshold > 0:
+                    for shape, count in queries.repeated_statements(threshold).items():
+                        logger.warning("Probable N+1 in %s: %d executions of %s", label, count, shape)
@@ -0,0 +1,151 @@
+"""
+Sandboxed Jinja rendering for prompt templates.
+
+Compiled templates are kept in an LRU keyed by `(prompt_id, version)` so
+repeated renders of the same prompt version skip lexing and parsing.
+
+A `{{ placeholder }}` with no value is left in the output verbatim, as it
+was before prompts were rendered with Jinja. With TEMPLATE_STRICT_UNDEFINED
+enabled it is an error instead, naming every variable the render needed but
+did not get; templates mark optional variables with `is defined` or the
+`default` filter.
+"""
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from jinja2 import ChainableUndefined, Template, TemplateError
+from jinja2.sandbox import SandboxedEnvironment
+
+from app.core.config import settings
+
+# Names of the undefined variables the current strict render has used
+_missing: ContextVar[Optional[List[str]]] = ContextVar("missing_template_variables", default=None)
+
+
+class _PassThroughUndefined(ChainableUndefined):
+    """
+    Renders a missing variable as its placeholder.
+    """
+
+    def __getattr__(self, name: str) -> "_PassThroughUndefined":
+        if name[:2] == "__":
+            raise AttributeError(name)
+        return type(self)(name=f"{self._undefined_name}.{name}")
+
+    __getitem__ = __getattr__
+
+    def __str__(self) -> str:
+        return f"{{{{ {self._undefined_name} }}}}" if self._undefined_name else ""
+
+
+class _RecordingUndefined(ChainableUndefined):
+    """
+    Records the name of a missing variable wherever its value is used, so
+    that one render finds all of them. Checks like `is defined`, `default`
+    and `{% if %}` don't count as uses.
+    """
+
+    def _fail_with_undefined_error(self, *args: Any, **kwargs: Any) -> "_RecordingUndefined":
+        missing = _missing.get()
+        if missing is not None and self._undefined_name not in missing:
+            missing.append(self._undefined_name)
+        return self
+
+    def __str__(self) -> str:
+        self._fail_with_undefined_error()
+        return ""
+
+    def __iter__(self):
+        self._fail_with_undefined_error()
+        return iter(())
+
+    def __len__(self) -> int:
+        self._fail_with_undefined_error()
+        return 0
+
+
+_environments = {
+    strict: SandboxedEnvironment(
+        autoescape=False,
+        keep_trailing_newline=True,
+        undefined=_RecordingUndefined if strict else _PassThroughUndefined
+    )
+    for strict in (False, True)
+}
+
+
+class MissingVariablesError(TemplateError):
+    """
+    A strict render used variables the call did not provide.
+    """
+
+    def __init__(self, names: List[str]):
+        self.names = names
+        super().__init__(f"Missing variables: {', '.join(names)}")
+
+
+class TemplateCache:
+    """
+    Thread-safe LRU of compiled templates.
+
+    The template source is stored with each entry so a version number that
+    is reused for different text recompiles instead of rendering stale text.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[str, Template]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, source: str, strict: bool = False) -> Template:
+        key = (key, strict)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == source:
+                self._entries.move_to_end(key)
+                return entry[1]
+        
+        template = _environments[strict].from_string(source)
+        with self._lock:
+            self._entries[key] = (source, template)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return template
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+template_cache = TemplateCache(settings.TEMPLATE_CACHE_SIZE)
+
+
+def render_prompt(prompt_id: int, version: int, source: str, variables: Dict[str, Any]) -> str:
+    """
+    Render a prompt version with the given variables.
+
+    Raises:
+        MissingVariablesError: with TEMPLATE_STRICT_UNDEFINED, if the render
+            used variables not in `variables`
+        jinja2.TemplateError: on syntax or sandbox errors
+    """
+    strict = settings.TEMPLATE_STRICT_UNDEFINED
+    template = template_cache.get((prompt_id, version), source, strict)
+    if not strict:
+        return template.render(**variables)
+    
+    missing: List[str] = []
+    token = _missing.set(missing)
+    try:
+        rendered = template.render(**variables)
+    finally:
+        _missing.reset(token)
+    if missing:
+        raise MissingVariablesError(sorted(missing))
+    return rendered
@@ -0,0 +1,48 @@
+"""
+Line-based text deltas for prompt version storage.
+
+A delta rebuilds a text from a base text. It is a JSON-serializable list
+whose items are either `[start, end]`, meaning "copy lines start:end of the
+base", or a string to insert verbatim. Lines keep their line endings, so
+applying a delta reproduces the text exactly.
+"""
+from difflib import SequenceMatcher
+from typing import List, Union
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+Delta = List[Union[List[int], str]]
+
+# Reconstructed version texts keyed by version row id; versions never change
+text_cache = LRUCache(maxsize=settings.PROMPT_VERSION_CACHE_SIZE, ttl=0)
+
+
+def _lines(text: str) -> List[str]:
+    return text.splitlines(keepends=True)
+
+
+def make_delta(base: str, text: str) -> Delta:
+    """
+    Build the delta turning `base` into `text`.
+    """
+    base_lines, lines = _lines(base), _lines(text)
+    delta: Delta = []
+    matcher = SequenceMatcher(None, base_lines, lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([i1, i2])
+        elif j2 > j1:
+            delta.append("".join(lines[j1:j2]))
+    return delta
+
+
+def apply_delta(base: str, delta: Delta) -> str:
+    """
+    Rebuild a text from `base` and a delta produced by `make_delta`.
+    """
+    base_lines = _lines(base)
+    return "".join(
+        item if isinstance(item, str) else "".join(base_lines[item[0]:item[1]])
+        for item in delta
+    )
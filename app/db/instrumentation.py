@@ -0,0 +1,170 @@
+"""
+Query timing for application engines.
+
+`instrument_queries` hooks an engine's cursor events to time every
+statement. Timings feed the `db_query_duration_seconds` histogram and,
+while a request is being served, the `QueryStats` of that request (see
+`track_queries`), from which the middleware in `app.core.query_tracking`
+reports queries and database time per request and flags statements
+repeated often enough to suggest an N+1 pattern. Statements slower than
+DB_SLOW_QUERY_MS are logged.
+
+Connection pool figures from `app.db.pool` are exported at scrape time by
+`PoolCollector`.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, REGISTRY, SummaryMetricFamily
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.db.pool import pool_stats
+
+logger = logging.getLogger(__name__)
+
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "Time spent executing SQL statements",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+
+# Quoted strings and numbers outside identifiers
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# Named and numbered placeholders of the other DB-API paramstyles
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s|(?<!:):[A-Za-z_]\w*|\$\d+")
+# Expanded IN lists of any length
+_PLACEHOLDER_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    `statement` with whitespace collapsed and every literal, placeholder and
+    IN list replaced by `?`, so that executions differing only in their
+    parameters compare equal.
+    """
+    shape = " ".join(statement.split())
+    shape = _PLACEHOLDERS.sub("?", shape)
+    shape = _LITERALS.sub("?", shape)
+    return _PLACEHOLDER_LISTS.sub("(?)", shape)
+
+
+class QueryStats:
+    """
+    Statements executed and database time spent while serving one request.
+
+    Sync handlers run on threadpool workers, so updates are locked.
+    """
+
+    def __init__(self, label: str = ""):
+        self._lock = threading.Lock()
+        self.label = label
+        self.queries = 0
+        self.seconds = 0.0
+        self._statements: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.queries += 1
+            self.seconds += seconds
+            self._statements[statement] += 1
+
+    def repeated_statements(self, threshold: int) -> Dict[str, int]:
+        """
+        Statement shapes executed at least `threshold` times, most frequent
+        first.
+        """
+        with self._lock:
+            statements = list(self._statements.items())
+        shapes: Counter = Counter()
+        for statement, count in statements:
+            shapes[statement_shape(statement)] += count
+        return {shape: count for shape, count in shapes.most_common() if count >= threshold}
+
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _query_stats.get()
+
+
+@contextmanager
+def track_queries(label: str = "") -> Iterator[QueryStats]:
+    """
+    Collect the statements run in this context (and in threadpool calls
+    made from it) into a fresh `QueryStats`.
+    """
+    stats = QueryStats(label)
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def instrument_queries(engine, name: str) -> None:
+    """
+    Time every statement `engine` executes, labelled with `name`.
+    """
+    histogram = DB_QUERY_SECONDS.labels(name)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_started"].pop()
+        histogram.observe(seconds)
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.record(statement, seconds)
+        if settings.DB_SLOW_QUERY_MS > 0 and seconds * 1000 >= settings.DB_SLOW_QUERY_MS:
+            logger.warning(
+                "Slow query (%.1f ms)%s: %s",
+                seconds * 1000,
+                f" in {stats.label}" if stats is not None and stats.label else "",
+                statement_shape(statement)
+            )
+
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+class PoolCollector:
+    """
+    Exports the checkout statistics of every instrumented pool.
+    """
+
+    def collect(self):
+        checkouts = CounterMetricFamily("db_pool_checkouts", "Connections checked out of the pool", labels=["engine"])
+        timeouts = CounterMetricFamily("db_pool_timeouts", "Checkouts that timed out waiting for a connection", labels=["engine"])
+        wait = SummaryMetricFamily("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", labels=["engine"])
+        wait_max = GaugeMetricFamily("db_pool_checkout_wait_max_seconds", "Longest wait for a pooled connection", labels=["engine"])
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections currently checked out", labels=["engine"])
+        for name, (engine, stats) in list(pool_stats.items()):
+            snapshot = stats.snapshot(engine.pool)
+            checkouts.add_metric([name], snapshot["checkouts"])
+            timeouts.add_metric([name], snapshot["timeouts"])
+            wait.add_metric([name], count_value=snapshot["checkouts"], sum_value=snapshot["wait_seconds_total"])
+            wait_max.add_metric([name], snapshot["wait_seconds_max"])
+            if "checkedout" in snapshot:
+                checked_out.add_metric([name], snapshot["checkedout"])
+        yield from (checkouts, timeouts, wait, wait_max, checked_out)
+
+
+REGISTRY.register(PoolCollector())
@@ -0,0 +1,152 @@
+"""
+Filters and expression indexes on paths inside `prompts.meta`.
+
+A path is a dotted list of keys (`category`, `owner.team`). SQLite reads it
+with `json_extract(meta, '$.owner.team')` and PostgreSQL with
+`meta #>> '{owner,team}'`. Paths are validated and written into the SQL as
+literals rather than bound, because a query only uses an expression index
+when it repeats the indexed expression exactly.
+
+Declared paths are stored in `meta_indexes`, each with a B-tree index on its
+expression. The indexes are recreated by `create_all` if they are missing,
+e.g. after a restore.
+"""
+import hashlib
+import re
+from typing import List, Optional
+
+from sqlalchemy import event, inspect, literal_column, or_
+from sqlalchemy.orm import Session
+
+from app.db.base_class import Base
+from app.db.models import MetaIndex
+
+# Each key of a path; anything else could break out of the SQL literal
+_KEY_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+MAX_PATH_DEPTH = 8
+
+
+def parse_path(path: str) -> List[str]:
+    """
+    Split a dotted metadata path into its keys.
+
+    Raises:
+        ValueError: if the path is empty, too deep or has an invalid key
+    """
+    keys = path.split(".")
+    if len(keys) > MAX_PATH_DEPTH or not all(_KEY_PATTERN.match(key) for key in keys):
+        raise ValueError(
+            f"Invalid metadata path '{path}': use up to {MAX_PATH_DEPTH} dot-separated keys "
+            "of letters, digits and underscores"
+        )
+    return keys
+
+
+def index_name(keys: List[str]) -> str:
+    """
+    Index name for a path: a readable prefix plus a hash of the full path,
+    so distinct paths never share a name and it fits PostgreSQL's
+    63-character limit.
+    """
+    path = ".".join(keys)
+    digest = hashlib.sha256(path.encode()).hexdigest()[:10]
+    return f"ix_prompts_meta_{'_'.join(keys)[:30]}_{digest}"
+
+
+def _number(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+_BOOLEANS = {"true": 1, "false": 0}
+
+
+class _SQLiteBackend:
+    def expression(self, keys: List[str], column: str = "meta") -> str:
+        return f"json_extract({column}, '$.{'.'.join(keys)}')"
+
+    def candidates(self, value: str) -> list:
+        # json_extract returns numbers as numbers, and true/false as 1/0
+        if value in _BOOLEANS:
+            return [value, _BOOLEANS[value]]
+        number = _number(value)
+        return [value] if number is None else [value, number]
+
+
+class _PostgresBackend:
+    def expression(self, keys: List[str], column: str = "meta") -> str:
+        return f"({column} #>> '{{{','.join(keys)}}}')"
+
+    def candidates(self, value: str) -> list:
+        # #>> returns the text of scalars: numbers as written, true/false as words
+        return [value]
+
+
+_BACKENDS = {"sqlite": _SQLiteBackend(), "postgresql": _PostgresBackend()}
+
+
+def _backend(dialect_name: str):
+    return _BACKENDS.get(dialect_name)
+
+
+def is_supported(db: Session) -> bool:
+    return _backend(db.get_bind().dialect.name) is not None
+
+
+def meta_filter(db: Session, path: str, values: List[str]):
+    """
+    Predicate matching prompts whose `meta` value at `path` equals any of
+    `values`. Values are compared as text, and numbers also as numbers.
+    """
+    backend = _backend(db.get_bind().dialect.name)
+    expression = literal_column(backend.expression(parse_path(path), "prompts.meta"))
+    return or_(*(expression.in_(backend.candidates(value)) for value in values))
+
+
+def _create_sql(backend, keys: List[str]) -> str:
+    return f"CREATE INDEX IF NOT EXISTS {index_name(keys)} ON prompts ({backend.expression(keys)})"
+
+
+def declare_index(db: Session, path: str) -> Optional[MetaIndex]:
+    """
+    Record `path` as an indexed metadata path and create its index.
+
+    Returns None if the path is already declared. The caller commits.
+    """
+    keys = parse_path(path)
+    path = ".".join(keys)
+    if db.query(MetaIndex).filter(MetaIndex.path == path).first() is not None:
+        return None
+    declared = MetaIndex(path=path)
+    db.add(declared)
+    db.connection().exec_driver_sql(_create_sql(_backend(db.get_bind().dialect.name), keys))
+    db.flush()
+    return declared
+
+
+def drop_index(db: Session, path: str) -> bool:
+    """
+    Forget an indexed metadata path and drop its index. Returns False if
+    the path was not declared. The caller commits.
+    """
+    declared = db.query(MetaIndex).filter(MetaIndex.path == path).first()
+    if declared is None:
+        return False
+    db.connection().exec_driver_sql(f"DROP INDEX IF EXISTS {index_name(parse_path(path))}")
+    db.delete(declared)
+    return True
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_declared_indexes(target, connection, **kw):
+    backend = _backend(connection.dialect.name)
+    if backend is None or not inspect(connection).has_table(MetaIndex.__tablename__):
+        return
+    for (path,) in connection.execute(MetaIndex.__table__.select().with_only_columns(MetaIndex.path)):
+        connection.exec_driver_sql(_create_sql(backend, parse_path(path)))
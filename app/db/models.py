@@ -1,14 +1,19 @@
-from sqlalchemy import Column, Integer, String, JSON, ForeignKey, DateTime, Table
+from sqlalchemy import Boolean, Column, Index, Integer, String, JSON, ForeignKey, DateTime, Table, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
+from app.db import upgrade  # noqa: F401  (adds new columns to existing tables)
+from app.db.delta import apply_delta, text_cache
 
 # Association table for prompt tags
 prompt_tags = Table(
     'prompt_tags',
     Base.metadata,
     Column('prompt_id', Integer, ForeignKey('prompts.id')),
-    Column('tag_id', Integer, ForeignKey('tags.id'))
+    Column('tag_id', Integer, ForeignKey('tags.id')),
+    # Tag filters and tag counts scan by tag; loading a prompt's tags scans by prompt
+    Index('idx_prompt_tags_tag_id', 'tag_id', 'prompt_id'),
+    Index('idx_prompt_tags_prompt_id', 'prompt_id')
 )
 
 
@@ -39,16 +44,103 @@ class Tag(Base):
     prompts = relationship("Prompt", secondary=prompt_tags, back_populates="tags")
 
 
+class PromptBlob(Base):
+    """Version text stored once and shared by every version with the same body."""
+    __tablename__ = "prompt_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    hash = Column(String(64), unique=True, index=True)
+    text = Column(String)
+
+
 class PromptVersion(Base):
     __tablename__ = "prompt_versions"
 
     id = Column(Integer, primary_key=True, index=True)
     prompt_id = Column(Integer, ForeignKey("prompts.id"))
     version = Column(Integer)
-    text = Column(String)
+    # Inline text of older rows; newer rows keep their text in a blob or,
+    # in delta storage, as a delta (see app/db/versioning.py)
+    stored_text = Column("text", String)
+    blob_id = Column(Integer, ForeignKey("prompt_blobs.id"), nullable=True)
+    base_version_id = Column(Integer, ForeignKey("prompt_versions.id"), nullable=True)
+    delta = Column(JSON(none_as_null=True), nullable=True)
+    # sha256 of text, description and meta
+    content_hash = Column(String(64), index=True, nullable=True)
     description = Column(String)
     meta = Column(JSON)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    prompt = relationship("Prompt", back_populates="versions") 
\ No newline at end of file
+    prompt = relationship("Prompt", back_populates="versions")
+    blob = relationship("PromptBlob", lazy="joined")
+    base_version = relationship("PromptVersion", remote_side=[id])
+
+    @property
+    def text(self):
+        if self.delta is None:
+            return self.blob.text if self.blob is not None else self.stored_text
+        text = text_cache.get(self.id) if self.id is not None else None
+        if text is None:
+            text = apply_delta(self.base_version.text, self.delta)
+            if self.id is not None:
+                text_cache.set(self.id, text)
+        return text
+
+    @text.setter
+    def text(self, value):
+        self.stored_text = value
+        self.blob = None
+        self.base_version_id = None
+        self.delta = None
+
+
+class PlaygroundJob(Base):
+    __tablename__ = "playground_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    prompt_id = Column(Integer, ForeignKey("prompts.id"))
+    version = Column(Integer)
+    models = Column(JSON)
+    variable_sets = Column(JSON)
+    system_message = Column(String)
+    parameters = Column(JSON)
+    use_cache = Column(Boolean, default=True)
+    # pending, running, completed, failed or cancelled
+    status = Column(String, index=True, default="pending")
+    error = Column(String)
+    # Process running the job, and when it last reported in
+    owner = Column(String)
+    heartbeat_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+    # Relationships
+    results = relationship("PlaygroundJobResult", back_populates="job")
+
+
+class PlaygroundJobResult(Base):
+    __tablename__ = "playground_job_results"
+    __table_args__ = (UniqueConstraint("job_id", "row_index", "model"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("playground_jobs.id"), index=True)
+    row_index = Column(Integer)
+    model = Column(String)
+    response = Column(String)
+    error = Column(String)
+    usage = Column(JSON)
+    cache_hit = Column(Boolean, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    job = relationship("PlaygroundJob", back_populates="results")
+
+
+class MetaIndex(Base):
+    """A `meta` path with an expression index (see app/db/meta_index.py)."""
+    __tablename__ = "meta_indexes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String, unique=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
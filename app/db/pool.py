@@ -0,0 +1,111 @@
+"""
+Connection pools that record checkout statistics.
+
+`TimedQueuePool` and `TimedAsyncQueuePool` behave like SQLAlchemy's
+QueuePool / AsyncAdaptedQueuePool but time how long each checkout waits for
+a connection (including opening a new one) and count pool timeouts. Engines
+using them are registered in `pool_stats` under a name so the figures can
+be reported.
+"""
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStats:
+    """
+    Thread-safe counters for one connection pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def record_checkout(self) -> None:
+        with self._lock:
+            self.checkouts += 1
+
+    def record_checkin(self) -> None:
+        with self._lock:
+            self.checkins += 1
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_avg": self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+            }
+        for name in ("size", "checkedout", "checkedin", "overflow"):
+            if hasattr(pool, name):
+                data[name] = getattr(pool, name)()
+        data["status"] = pool.status()
+        return data
+
+
+class _TimedPoolMixin:
+    stats: PoolStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep counting into the same stats
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# Engine name -> (engine, stats)
+pool_stats: Dict[str, tuple] = {}
+
+
+def instrument_pool(engine, name: str) -> None:
+    """
+    Start collecting checkout statistics for `engine` under `name`.
+
+    Waits are only measured for the timed pool classes above; checkouts and
+    checkins are counted for any pool.
+    """
+    stats = PoolStats()
+    engine.pool.stats = stats
+    event.listen(engine, "checkout", lambda *args: stats.record_checkout())
+    event.listen(engine, "checkin", lambda *args: stats.record_checkin())
+    pool_stats[name] = (engine, stats)
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: stats.snapshot(engine.pool) for name, (engine, stats) in pool_stats.items()}
@@ -0,0 +1,216 @@
+"""
+Full-text index over prompt name, text, description and tags.
+
+SQLite databases use an FTS5 virtual table (`prompts_fts`, keyed by prompt
+id). PostgreSQL databases use a `prompt_search` table holding a weighted
+tsvector with a GIN index. The index is created alongside the ORM tables
+and is kept in sync explicitly by the write endpoints through
+`index_prompts` and `remove_prompts`.
+"""
+import html
+import re
+from typing import Iterable, Optional
+
+from sqlalchemy import Float, Integer, String, bindparam, event, inspect, text
+from sqlalchemy.orm import Session
+
+from app.db.base_class import Base
+
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+# The database marks matches with these private-use characters, so that
+# the prompt text around them can be HTML-escaped before they become tags
+_MATCH_START = "\ue000"
+_MATCH_END = "\ue001"
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class _SQLiteBackend:
+    table = "prompts_fts"
+
+    def create(self, connection) -> None:
+        if inspect(connection).has_table(self.table):
+            return
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE {self.table} USING fts5("
+            "name, text, description, tags, tokenize='unicode61 remove_diacritics 2')"
+        )
+        connection.exec_driver_sql(f"INSERT INTO {self.table}(rowid, name, text, description, tags) {self._source_sql()}")
+
+    def drop(self, connection) -> None:
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {self.table}")
+
+    def _source_sql(self, where: str = "") -> str:
+        return (
+            "SELECT p.id, coalesce(p.name, ''), coalesce(p.text, ''), coalesce(p.description, ''), "
+            "coalesce((SELECT group_concat(t.name, ' ') FROM prompt_tags pt "
+            "JOIN tags t ON t.id = pt.tag_id WHERE pt.prompt_id = p.id), '') "
+            f"FROM prompts p {where}"
+        )
+
+    def index(self, db: Session, prompt_ids) -> None:
+        self.remove(db, prompt_ids)
+        db.execute(
+            text(
+                f"INSERT INTO {self.table}(rowid, name, text, description, tags) "
+                + self._source_sql("WHERE p.id IN :ids")
+            ).bindparams(bindparam("ids", expanding=True)),
+            {"ids": prompt_ids}
+        )
+
+    def remove(self, db: Session, prompt_ids) -> None:
+        db.execute(
+            text(f"DELETE FROM {self.table} WHERE rowid IN :ids").bindparams(
+                bindparam("ids", expanding=True)
+            ),
+            {"ids": prompt_ids}
+        )
+
+    def match(self, terms):
+        # Quote every token so user input can't inject FTS5 query syntax;
+        # the last token is matched as a prefix for search-as-you-type.
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        # bm25 weights follow the column order: name, text, description, tags
+        return text(
+            f"SELECT rowid AS prompt_id, -bm25({self.table}, 10.0, 1.0, 2.0, 5.0) AS score, "
+            f"snippet({self.table}, -1, '{_MATCH_START}', '{_MATCH_END}', '…', 16) AS snippet "
+            f"FROM {self.table} WHERE {self.table} MATCH :match"
+        ).bindparams(match=match)
+
+
+class _PostgresBackend:
+    table = "prompt_search"
+
+    def create(self, connection) -> None:
+        if inspect(connection).has_table(self.table):
+            return
+        connection.exec_driver_sql(
+            f"CREATE TABLE {self.table} ("
+            "prompt_id INTEGER PRIMARY KEY REFERENCES prompts(id) ON DELETE CASCADE, "
+            "document tsvector NOT NULL)"
+        )
+        connection.exec_driver_sql(
+            f"CREATE INDEX ix_{self.table}_document ON {self.table} USING GIN (document)"
+        )
+        connection.exec_driver_sql(f"INSERT INTO {self.table}(prompt_id, document) {self._source_sql()}")
+
+    def drop(self, connection) -> None:
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {self.table}")
+
+    def _source_sql(self, where: str = "") -> str:
+        return (
+            "SELECT p.id, "
+            "setweight(to_tsvector('english', coalesce(p.name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce((SELECT string_agg(t.name, ' ') "
+            "FROM prompt_tags pt JOIN tags t ON t.id = pt.tag_id WHERE pt.prompt_id = p.id), '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(p.description, '')), 'C') || "
+            "setweight(to_tsvector('english', coalesce(p.text, '')), 'D') "
+            f"FROM prompts p {where}"
+        )
+
+    def index(self, db: Session, prompt_ids) -> None:
+        self.remove(db, prompt_ids)
+        db.execute(
+            text(
+                f"INSERT INTO {self.table}(prompt_id, document) "
+                + self._source_sql("WHERE p.id IN :ids")
+            ).bindparams(bindparam("ids", expanding=True)),
+            {"ids": prompt_ids}
+        )
+
+    def remove(self, db: Session, prompt_ids) -> None:
+        db.execute(
+            text(f"DELETE FROM {self.table} WHERE prompt_id IN :ids").bindparams(
+                bindparam("ids", expanding=True)
+            ),
+            {"ids": prompt_ids}
+        )
+
+    def match(self, terms):
+        options = f"StartSel={_MATCH_START}, StopSel={_MATCH_END}, MaxWords=16, MinWords=6"
+        return text(
+            f"SELECT s.prompt_id AS prompt_id, ts_rank_cd(s.document, q.query) AS score, "
+            "ts_headline('english', coalesce(p.description, '') || ' ' || coalesce(p.text, ''), "
+            f"q.query, '{options}') AS snippet "
+            f"FROM {self.table} s JOIN prompts p ON p.id = s.prompt_id, "
+            "plainto_tsquery('english', :match) AS q(query) "
+            "WHERE s.document @@ q.query"
+        ).bindparams(match=" ".join(terms))
+
+
+_BACKENDS = {"sqlite": _SQLiteBackend(), "postgresql": _PostgresBackend()}
+
+
+def _backend(dialect_name: str):
+    return _BACKENDS.get(dialect_name)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_index(target, connection, **kw):
+    backend = _backend(connection.dialect.name)
+    if backend is not None:
+        backend.create(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_index(target, connection, **kw):
+    backend = _backend(connection.dialect.name)
+    if backend is not None:
+        backend.drop(connection)
+
+
+def is_supported(db: Session) -> bool:
+    return _backend(db.get_bind().dialect.name) is not None
+
+
+def index_prompts(db: Session, prompt_ids: Iterable[int]) -> None:
+    """
+    (Re)index the given prompts from their current rows and tags.
+
+    Pending ORM changes are flushed first so the index sees them; call this
+    inside the same transaction as the write.
+    """
+    backend = _backend(db.get_bind().dialect.name)
+    prompt_ids = list(prompt_ids)
+    if backend is None or not prompt_ids:
+        return
+    db.flush()
+    backend.index(db, prompt_ids)
+
+
+def remove_prompts(db: Session, prompt_ids: Iterable[int]) -> None:
+    """
+    Drop the given prompts from the index.
+    """
+    backend = _backend(db.get_bind().dialect.name)
+    prompt_ids = list(prompt_ids)
+    if backend is None or not prompt_ids:
+        return
+    backend.remove(db, prompt_ids)
+
+
+def match_subquery(db: Session, query: str):
+    """
+    Build a subquery of `(prompt_id, score, snippet)` rows matching `query`.
+
+    Higher scores are more relevant. Returns None when the query has no
+    searchable terms.
+    """
+    terms = _TOKEN_PATTERN.findall(query)
+    if not terms:
+        return None
+    backend = _backend(db.get_bind().dialect.name)
+    return backend.match(terms).columns(
+        prompt_id=Integer, score=Float, snippet=String
+    ).subquery("search_hits")
+
+
+def render_snippet(snippet: Optional[str]) -> Optional[str]:
+    """
+    HTML-escape a snippet from `match_subquery` and wrap its matches in
+    SNIPPET_START/SNIPPET_END, so it can be inserted into a page as is.
+    """
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(_MATCH_START, SNIPPET_START).replace(_MATCH_END, SNIPPET_END)
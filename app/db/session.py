@@ -1,17 +1,84 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from typing import Any, Callable, Dict, TypeVar
+from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, make_url, text
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
+from app.db.instrumentation import instrument_queries
+from app.db.pool import TimedAsyncQueuePool, TimedQueuePool, instrument_pool
 
-if settings.DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        settings.DATABASE_URL, connect_args={"check_same_thread": False}
+T = TypeVar("T")
+
+
+def engine_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Build create_engine keyword arguments for `url` from Settings.
+
+    In-memory SQLite keeps SQLAlchemy's default pool, since every pooled
+    connection would otherwise see its own empty database.
+    """
+    url = make_url(url)
+    options: Dict[str, Any] = {}
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:") or url.query.get("mode") == "memory":
+            return options
+    options.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
     )
-else:
-    engine = create_engine(settings.DATABASE_URL)
+    return options
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    `connect` event hook setting the configured SQLite pragmas.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    finally:
+        cursor.close()
+
+
+def configure_engine(engine, name: str) -> None:
+    """
+    Attach the SQLite pragma hook (for SQLite engines), pool statistics and
+    query timing.
+    """
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    instrument_pool(engine, name)
+    instrument_queries(engine, name)
+
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+configure_engine(engine, "sync")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def async_database_url(url: str) -> str:
+    """
+    Map a sync DATABASE_URL onto its async driver (aiosqlite / asyncpg).
+    """
+    scheme, separator, rest = url.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite{separator}{rest}"
+    if dialect in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{separator}{rest}"
+    raise ValueError(f"No async driver configured for {dialect} databases")
+
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -20,15 +87,86 @@ def get_db():
     finally:
         db.close()
 
+
+class SessionRunner:
+    """
+    Runs sync database work for a request on a threadpool worker.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Call `fn(session, *args, **kwargs)` and return its result.
+        """
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+    def sync_bind(self):
+        """
+        Engine for sync work that outlives the request, e.g. background
+        tasks that open their own sessions on threadpool workers.
+        """
+        return self.session.get_bind()
+
+
+class AsyncSessionRunner:
+    """
+    Runs the same sync database work on an AsyncSession, on the event loop.
+
+    The function gets a regular `Session` whose IO goes through the async
+    driver, so no threadpool worker is held while waiting on the database.
+    Anything the function returns must already be loaded: lazy loads after
+    `run` returns are not possible.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await self.session.run_sync(fn, *args, **kwargs)
+
+    def sync_bind(self):
+        # The async engine's driver can't be used from threads
+        return engine
+
+
+if settings.DB_ASYNC:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    try:
+        async_engine = create_async_engine(
+            async_database_url(settings.DATABASE_URL),
+            **engine_options(settings.DATABASE_URL, is_async=True)
+        )
+    except ImportError as e:
+        # The async drivers are an optional extra
+        raise ImportError(
+            f"DB_ASYNC needs the async database drivers ({e.name} is not installed); "
+            "install them with `pip install -r requirements-async.txt`"
+        ) from e
+    configure_engine(async_engine.sync_engine, "async")
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    async def get_db_runner(db: AsyncSession = Depends(get_async_db)) -> AsyncSessionRunner:
+        return AsyncSessionRunner(db)
+else:
+    async def get_db_runner(db: Session = Depends(get_db)) -> SessionRunner:
+        return SessionRunner(db)
+
+
 def test_db_connection():
+    db = SessionLocal()
     try:
-        db = SessionLocal()
         db.execute(text('SELECT 1'))
         print("Database connection successful!")
     except Exception as e:
         print(f"Database connection failed: {e}")
     finally:
         db.close()
-
-# Call the test function
-test_db_connection() 
\ No newline at end of file
@@ -29,23 +29,49 @@ CREATE TABLE IF NOT EXISTS prompt_tags (
 );
 
 -- Create Prompt Versions table
+CREATE TABLE IF NOT EXISTS prompt_blobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT UNIQUE,  -- sha256 of text
+    text TEXT
+);
+
 CREATE TABLE IF NOT EXISTS prompt_versions (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     prompt_id INTEGER,
     version INTEGER,
-    text TEXT,
+    text TEXT,  -- Inline text of rows written before blobs were introduced
+    blob_id INTEGER,  -- Shared text body
+    base_version_id INTEGER,  -- Keyframe version the delta applies to
+    delta TEXT,  -- JSON line delta against the keyframe text
     description TEXT,
     meta TEXT,  -- Store JSON as TEXT in SQLite
+    content_hash TEXT,  -- sha256 of text, description and meta
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (prompt_id) REFERENCES prompts(id) ON DELETE CASCADE
+    FOREIGN KEY (prompt_id) REFERENCES prompts(id) ON DELETE CASCADE,
+    FOREIGN KEY (blob_id) REFERENCES prompt_blobs(id),
+    FOREIGN KEY (base_version_id) REFERENCES prompt_versions(id)
+);
+
+-- Metadata paths with an expression index on prompts.meta (see app/db/meta_index.py)
+CREATE TABLE IF NOT EXISTS meta_indexes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT UNIQUE,  -- Dotted path, e.g. owner.team
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create full-text index over prompts (rowid = prompts.id, kept in sync by the API)
+CREATE VIRTUAL TABLE IF NOT EXISTS prompts_fts USING fts5(
+    name, text, description, tags,
+    tokenize='unicode61 remove_diacritics 2'
 );
 
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_prompts_name ON prompts(name);
 CREATE INDEX IF NOT EXISTS idx_tags_name ON tags(name);
 CREATE INDEX IF NOT EXISTS idx_prompt_versions_prompt_id ON prompt_versions(prompt_id);
+CREATE INDEX IF NOT EXISTS idx_prompt_versions_content_hash ON prompt_versions(content_hash);
 CREATE INDEX IF NOT EXISTS idx_prompt_tags_prompt_id ON prompt_tags(prompt_id);
-CREATE INDEX IF NOT EXISTS idx_prompt_tags_tag_id ON prompt_tags(tag_id);
+CREATE INDEX IF NOT EXISTS idx_prompt_tags_tag_id ON prompt_tags(tag_id, prompt_id);
 
 -- Create trigger for updated_at timestamp
 CREATE TRIGGER IF NOT EXISTS update_prompt_timestamp 
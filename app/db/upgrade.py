@@ -0,0 +1,43 @@
+"""
+In-place upgrade of tables created by earlier releases.
+
+`Base.metadata.create_all` creates missing tables but never alters existing
+ones. Columns added to a model later must be nullable; after the tables are
+created, any such column missing from the database is added with
+ALTER TABLE so existing databases keep working. Indexes added to a model
+later are created the same way, unless the table already has an index,
+unique constraint or primary key on the same columns under another name
+(as databases built from sqlite_schema.sql do).
+"""
+from sqlalchemy import event, inspect
+
+from app.db.base_class import Base
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _add_missing_columns(target, connection, **kw):
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for table in target.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            connection.exec_driver_sql(
+                f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN "
+                f"{preparer.format_column(column)} {column.type.compile(connection.dialect)}"
+            )
+        indexes = inspector.get_indexes(table.name)
+        existing_indexes = {index["name"] for index in indexes}
+        indexed_columns = {tuple(index["column_names"]) for index in indexes}
+        indexed_columns.update(
+            tuple(constraint["column_names"])
+            for constraint in inspector.get_unique_constraints(table.name)
+        )
+        indexed_columns.add(tuple(inspector.get_pk_constraint(table.name)["constrained_columns"]))
+        for index in table.indexes:
+            columns = tuple(column.name for column in index.columns)
+            if index.name not in existing_indexes and columns not in indexed_columns:
+                index.create(connection)
@@ -0,0 +1,209 @@
+"""
+Writing prompt versions.
+
+With PROMPT_VERSION_STORAGE=full every version row stores its text. With
+PROMPT_VERSION_STORAGE=delta a version is stored as a delta (see
+`app.db.delta`) against the prompt's latest keyframe, a version row that
+holds its full text. A new keyframe is written once
+PROMPT_VERSION_KEYFRAME_INTERVAL versions have been stored since the last
+one, so rebuilding any version reads at most one other row.
+`PromptVersion.text` reconstructs delta rows transparently.
+
+Full texts are kept in `prompt_blobs`, keyed by their sha256, so identical
+bodies (across versions or prompts) are stored once. Blobs are inserted
+with ON CONFLICT DO NOTHING and then read back, so two transactions
+writing the same new text both end up with the one row. Each version also
+records a `content_hash` of its text, description and meta, which lets
+updates that change none of them skip writing a version at all.
+"""
+import hashlib
+import json
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.delta import Delta, make_delta
+from app.db.models import PromptBlob, PromptVersion
+
+
+def content_hash(
+    text: Optional[str],
+    description: Optional[str],
+    meta: Optional[Dict[str, Any]]
+) -> str:
+    """
+    Hash of everything a version stores, independent of dict key order.
+    """
+    payload = json.dumps([text, description, meta], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING
+_CONFLICT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _insert_blobs(db: Session, rows: List[Dict[str, str]]) -> None:
+    """
+    Insert blob rows, skipping any whose hash another transaction stored
+    first.
+    """
+    dialect_insert = _CONFLICT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        db.execute(dialect_insert(PromptBlob).on_conflict_do_nothing(index_elements=["hash"]), rows)
+        return
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(insert(PromptBlob), [row])
+        except IntegrityError:
+            pass
+
+
+def _store_blobs(db: Session, texts) -> Dict[str, int]:
+    """
+    Look up blobs for `texts` in one query, inserting any that don't exist.
+
+    Returns blob ids keyed by text hash.
+    """
+    texts = {_text_hash(text): text for text in texts if text is not None}
+    if not texts:
+        return {}
+    ids = dict(db.execute(select(PromptBlob.hash, PromptBlob.id).where(PromptBlob.hash.in_(texts))).all())
+    missing = texts.keys() - ids.keys()
+    if missing:
+        _insert_blobs(db, [{"hash": key, "text": texts[key]} for key in sorted(missing)])
+        ids.update(db.execute(select(PromptBlob.hash, PromptBlob.id).where(PromptBlob.hash.in_(missing))).all())
+    return ids
+
+
+def _delta_storage() -> bool:
+    return settings.PROMPT_VERSION_STORAGE == "delta"
+
+
+def _encode(keyframe_text: Optional[str], text: Optional[str]) -> Optional[Delta]:
+    if keyframe_text is None or text is None:
+        return None
+    delta = make_delta(keyframe_text, text)
+    # A delta about as large as the text saves nothing; store the text instead
+    if len(json.dumps(delta)) >= len(text):
+        return None
+    return delta
+
+
+def add_version(
+    db: Session,
+    prompt_id: int,
+    version: int,
+    text: Optional[str],
+    description: Optional[str],
+    meta: Optional[Dict[str, Any]]
+) -> PromptVersion:
+    """
+    Add a new version row for `prompt_id` to the session.
+    """
+    row = PromptVersion(
+        prompt_id=prompt_id,
+        version=version,
+        description=description,
+        meta=meta,
+        content_hash=content_hash(text, description, meta)
+    )
+    if _delta_storage():
+        keyframe = db.query(PromptVersion).filter(
+            PromptVersion.prompt_id == prompt_id,
+            PromptVersion.base_version_id.is_(None)
+        ).order_by(PromptVersion.id.desc()).first()
+        if keyframe is not None:
+            since_keyframe = db.query(func.count(PromptVersion.id)).filter(
+                PromptVersion.prompt_id == prompt_id,
+                PromptVersion.id > keyframe.id
+            ).scalar()
+            if since_keyframe + 1 < settings.PROMPT_VERSION_KEYFRAME_INTERVAL:
+                row.delta = _encode(keyframe.text, text)
+                if row.delta is not None:
+                    row.base_version = keyframe
+    if row.delta is None and text is not None:
+        blobs = db.query(PromptBlob).filter(PromptBlob.hash == _text_hash(text))
+        blob = blobs.first()
+        if blob is None:
+            _insert_blobs(db, [{"hash": _text_hash(text), "text": text}])
+            blob = blobs.one()
+        row.blob = blob
+    db.add(row)
+    return row
+
+
+def add_histories(db: Session, histories: Sequence[Tuple[int, List[Dict[str, Any]]]]) -> None:
+    """
+    Insert complete version histories for new prompts with multi-row INSERTs.
+
+    `histories` pairs a prompt id with its versions, oldest first, each a
+    dict of `version`, `text`, `description` and `meta`.
+    """
+    # In delta storage every interval-th version is a keyframe and the ones
+    # after it are deltas against it. Rows are inserted in history order, so
+    # keyframe ids are only known afterwards and are filled in on the delta
+    # rows by (prompt id, version number); deltas are only used where those
+    # pairs are unique within the history.
+    delta_storage = _delta_storage()
+    rows = []
+    texts = []
+    links = []
+    for prompt_id, versions in histories:
+        counts = Counter(version["version"] for version in versions)
+        keyframe = None
+        for position, version in enumerate(versions):
+            values = {
+                "prompt_id": prompt_id,
+                "version": version["version"],
+                "stored_text": None,
+                "blob_id": None,
+                "base_version_id": None,
+                "delta": None,
+                "description": version["description"],
+                "meta": version["meta"],
+                "content_hash": content_hash(version["text"], version["description"], version["meta"])
+            }
+            if delta_storage and position % max(settings.PROMPT_VERSION_KEYFRAME_INTERVAL, 1) == 0:
+                keyframe = version
+            elif delta_storage and counts[keyframe["version"]] == 1 and counts[version["version"]] == 1:
+                values["delta"] = _encode(keyframe["text"], version["text"])
+                if values["delta"] is not None:
+                    links.append({
+                        "p_prompt_id": prompt_id,
+                        "p_version": version["version"],
+                        "p_keyframe": keyframe["version"]
+                    })
+            rows.append(values)
+            texts.append(version["text"])
+    if not rows:
+        return
+    
+    blob_ids = _store_blobs(db, (text for values, text in zip(rows, texts) if values["delta"] is None))
+    for values, text in zip(rows, texts):
+        if values["delta"] is None and text is not None:
+            values["blob_id"] = blob_ids[_text_hash(text)]
+    db.execute(insert(PromptVersion), rows)
+    
+    if links:
+        table = PromptVersion.__table__
+        keyframes = table.alias("keyframes")
+        keyframe_id = select(keyframes.c.id).where(
+            keyframes.c.prompt_id == bindparam("p_prompt_id"),
+            keyframes.c.version == bindparam("p_keyframe")
+        ).scalar_subquery()
+        db.execute(
+            update(table)
+            .where(table.c.prompt_id == bindparam("p_prompt_id"), table.c.version == bindparam("p_version"))
+            .values(base_version_id=keyframe_id),
+            links
+        )
@@ -1,18 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.core import openrouter
 from app.core.config import settings
-from app.api.endpoints import prompts
+from app.core.metrics import MetricsMiddleware
+from app.core.query_tracking import DB_QUERIES_HEADER, DB_TIME_HEADER, QueryTrackingMiddleware
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.api.endpoints import admin, metrics, playground_jobs, prompts, tags
 from app.db.base_class import Base
-from app.db.session import engine
-import uvicorn
+from app.db.session import engine, test_db_connection
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare the database on startup rather than at import time."""
+    if settings.DB_INIT_ON_STARTUP:
+        # Create database tables
+        Base.metadata.create_all(bind=engine)
+    if settings.DB_CHECK_ON_STARTUP:
+        test_db_connection()
+    if settings.PLAYGROUND_JOBS_RESUME:
+        await playground_jobs.resume_jobs(engine)
+    yield
+    await playground_jobs.stop_jobs()
+    await openrouter.close_client()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Set up CORS middleware
@@ -22,14 +40,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", DB_QUERIES_HEADER, DB_TIME_HEADER],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+if settings.DB_QUERY_TRACKING:
+    # Added last so it wraps the metrics middleware, which reads its counts
+    app.add_middleware(QueryTrackingMiddleware)
+
 # Include routers
 app.include_router(
     prompts.router,
     prefix=f"{settings.API_V1_STR}/prompts",
     tags=["prompts"]
 )
+app.include_router(
+    tags.router,
+    prefix=f"{settings.API_V1_STR}/tags",
+    tags=["tags"]
+)
+app.include_router(
+    playground_jobs.router,
+    prefix=f"{settings.API_V1_STR}/playground/jobs",
+    tags=["playground"]
+)
+app.include_router(
+    admin.router,
+    prefix=f"{settings.API_V1_STR}/admin",
+    tags=["admin"]
+)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
 
 @app.get("/")
 def read_root():
@@ -42,6 +84,8 @@ def read_root():
 
 def main():
     """Run the FastAPI application using uvicorn."""
+    import uvicorn
+
     uvicorn.run(
         "app.main:app",
         host=settings.HOST,
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict
+from typing import List, Literal, Optional, Dict, Any, Union
 from datetime import datetime
 
 
@@ -18,6 +18,10 @@ class Tag(TagBase):
         from_attributes = True
 
 
+class TagCount(Tag):
+    prompt_count: int
+
+
 class PromptVersionBase(BaseModel):
     version: int
     text: str
@@ -37,6 +41,38 @@ class PromptVersion(PromptVersionBase):
         from_attributes = True
 
 
+class PromptVersionSummary(BaseModel):
+    """
+    Version history entry; `text` is left out in summary mode.
+    """
+    id: int
+    prompt_id: int
+    version: int
+    text: Optional[str] = None
+    description: Optional[str] = None
+    meta: Optional[Dict[str, Any]] = None
+    content_hash: Optional[str] = None
+    created_at: datetime
+
+
+class DiffSegment(BaseModel):
+    op: Literal["equal", "insert", "delete"]
+    text: str
+
+
+class PromptDiff(BaseModel):
+    """
+    Diff between two versions of a prompt. `unified` is set for
+    mode=unified, `segments` for mode=word.
+    """
+    prompt_id: int
+    from_version: int
+    to_version: int
+    mode: Literal["unified", "word"]
+    unified: Optional[str] = None
+    segments: Optional[List[DiffSegment]] = None
+
+
 class PromptBase(BaseModel):
     name: str
     text: str
@@ -69,11 +105,91 @@ class Prompt(PromptBase):
         from_attributes = True
 
 
+class PromptSummary(BaseModel):
+    """
+    List projection of a prompt. Only the requested fields and relationships
+    are populated; unset ones are left out of the response.
+    """
+    id: int
+    name: Optional[str] = None
+    text: Optional[str] = None
+    description: Optional[str] = None
+    version: Optional[int] = None
+    meta: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    tags: Optional[List[Tag]] = None
+    versions: Optional[List[PromptVersion]] = None
+    # Only set for full-text searches
+    score: Optional[float] = None
+    snippet: Optional[str] = None
+
+
+class BulkPromptResult(BaseModel):
+    index: int
+    name: str
+    status: Literal["created", "updated", "error"]
+    id: Optional[int] = None
+    version: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class PromptVersionExport(BaseModel):
+    version: int
+    text: str
+    description: Optional[str] = None
+    meta: Optional[Dict[str, Any]] = None
+
+
+class PromptExport(PromptCreate):
+    """
+    One line of an NDJSON catalog export/import. Tags are plain names and
+    `versions` is only present when history was exported.
+    """
+    versions: Optional[List[PromptVersionExport]] = None
+
+
+class ImportLineError(BaseModel):
+    line: int
+    name: Optional[str] = None
+    detail: str
+
+
+class ImportSummary(BaseModel):
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ImportLineError] = []
+
+
+class SamplingParameters(BaseModel):
+    """
+    Sampling options passed to every model. Anything else is rejected, so
+    a request can't override the model, messages or streaming.
+    """
+    model_config = ConfigDict(extra="forbid")
+
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+    top_k: Optional[int] = None
+    min_p: Optional[float] = None
+    max_tokens: Optional[int] = None
+    stop: Optional[Union[str, List[str]]] = None
+    seed: Optional[int] = None
+    frequency_penalty: Optional[float] = None
+    presence_penalty: Optional[float] = None
+    repetition_penalty: Optional[float] = None
+
+
 class PlaygroundRequest(BaseModel):
     prompt_id: int
     version: Optional[int] = None
     models: List[str] = ["openai/gpt-4", "anthropic/claude-3-opus"]
     variables: Optional[Dict[str, Any]] = None
+    system_message: str = "You are a helpful AI assistant."
+    parameters: Optional[SamplingParameters] = None
+    # Serve repeated calls from the completion cache, when it is enabled
+    use_cache: bool = True
 
 
 class PlaygroundResponse(BaseModel):
@@ -81,4 +197,51 @@ class PlaygroundResponse(BaseModel):
     prompt_name: str
     prompt_version: int
     variables_used: Optional[Dict[str, Any]]
-    responses: Dict[str, Any] 
\ No newline at end of file
+    responses: Dict[str, Any] 
+
+
+class PlaygroundJobCreate(BaseModel):
+    """
+    Run a prompt for every variable set against every model.
+    """
+    prompt_id: int
+    version: Optional[int] = None
+    models: List[str]
+    variable_sets: List[Dict[str, Any]]
+    system_message: str = "You are a helpful AI assistant."
+    parameters: Optional[SamplingParameters] = None
+    use_cache: bool = True
+
+
+class PlaygroundJobStatus(BaseModel):
+    id: int
+    prompt_id: int
+    version: int
+    models: List[str]
+    status: Literal["pending", "running", "completed", "failed", "cancelled"]
+    error: Optional[str] = None
+    total: int
+    completed: int
+    failed: int
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class PlaygroundJobResult(BaseModel):
+    row_index: int
+    model: str
+    variables: Optional[Dict[str, Any]] = None
+    response: Optional[str] = None
+    error: Optional[str] = None
+    usage: Optional[Dict[str, Any]] = None
+    cache_hit: bool = False
+
+
+class MetaIndexCreate(BaseModel):
+    # Dotted path inside prompt meta, e.g. "category" or "owner.team"
+    path: str
+
+
+class MetaIndex(MetaIndexCreate):
+    index_name: str
+    created_at: Optional[datetime] = None
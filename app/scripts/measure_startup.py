@@ -0,0 +1,65 @@
+"""
+Measure how long a fresh interpreter takes to import the application.
+
+Each run imports `app.main` in a new subprocess, so nothing is shared with
+earlier runs, and reports the median wall time along with any modules that
+should only be loaded on demand.
+
+Usage:
+    python -m app.scripts.measure_startup [--runs N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that must not be pulled in just by importing the app
+LAZY_MODULES = ("requests", "app.scripts.seed_prompts_api", "uvicorn")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def measure_import(env=None) -> dict:
+    """
+    Import `app.main` once in a subprocess.
+
+    Returns:
+        {"seconds": import time, "loaded": lazy modules that were imported}
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE % (LAZY_MODULES,)],
+        capture_output=True, text=True, check=True,
+        env={**os.environ, **(env or {})}
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_startup(runs: int = 5, env=None) -> dict:
+    samples = [measure_import(env) for _ in range(runs)]
+    seconds = [sample["seconds"] for sample in samples]
+    return {
+        "runs": runs,
+        "median_seconds": statistics.median(seconds),
+        "min_seconds": min(seconds),
+        "max_seconds": max(seconds),
+        "loaded": sorted({name for sample in samples for name in sample["loaded"]}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(measure_startup(args.runs), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ API_URL = "http://localhost:8000/api/v1/prompts"
 
 # Function to fetch prompts from the API
 def fetch_prompts():
-    response = requests.get(API_URL)
+    response = requests.get(API_URL, params={"include": "tags"})
     if response.status_code == 200:
         return response.json()
     else:
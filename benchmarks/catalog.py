@@ -0,0 +1,208 @@
+"""
+Deterministic synthetic prompt catalogs for the benchmarks.
+
+`generate_catalog` writes a SQLite database with the application schema
+and `size` prompts. The same size and seed always produce the same rows.
+The distributions roughly follow a real prompt library:
+
+- tag popularity is Zipf-like, so a few tags are on many prompts and most
+  tags are on a few; prompts have 0-6 tags, usually 2-3;
+- most prompts have one version, and a long tail has dozens; each version
+  edits a line of the previous one or appends one;
+- texts run from a few lines to a few dozen, and some use Jinja variables;
+- `meta` carries a category, an author and a language.
+
+Version rows are written with `app.db.versioning`, so they follow the
+configured PROMPT_VERSION_STORAGE. The full-text index is filled in from
+the generated rows directly; `app.db.search.index_prompts` looks tags up
+per prompt, which is fine for single writes but slow for a bulk load.
+"""
+import bisect
+import datetime
+import itertools
+import random
+from typing import List, Sequence
+
+from sqlalchemy import create_engine, event, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.db import search, versioning  # noqa: F401  (search creates the full-text table)
+from app.db.base_class import Base
+from app.db.models import Prompt, PromptVersion, Tag, prompt_tags
+from app.db.session import apply_sqlite_pragmas
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+BATCH_SIZE = 2_000
+
+WORDS = (
+    "answer", "assistant", "brief", "careful", "cite", "classify", "clear", "code", "concise",
+    "context", "customer", "data", "describe", "detail", "document", "draft", "email", "evaluate",
+    "example", "explain", "extract", "fact", "feedback", "format", "friendly", "generate", "guide",
+    "helpful", "identify", "input", "instruction", "json", "key", "language", "list", "markdown",
+    "message", "model", "note", "output", "outline", "plan", "point", "polite", "question", "reason",
+    "report", "request", "respond", "review", "rewrite", "role", "rule", "safe", "section", "sentence",
+    "source", "step", "structure", "style", "summary", "support", "table", "task", "technical",
+    "template", "text", "tone", "topic", "translate", "user", "verify", "warm", "write",
+)
+CATEGORIES = (
+    "support", "marketing", "engineering", "summarization", "classification", "extraction",
+    "translation", "coding", "education", "legal", "sales", "research",
+)
+LANGUAGES = ("en", "en", "en", "en", "es", "de", "fr", "ja")
+VARIABLES = ("name", "role", "topic", "language", "tone", "product", "question", "context")
+
+# Weights for the number of tags on a prompt (0-6)
+TAG_COUNT_WEIGHTS = (5, 20, 30, 25, 12, 5, 3)
+# (versions, weight): mostly one, with a long tail
+VERSION_COUNT_WEIGHTS = ((1, 55), (2, 20), (3, 10), (4, 5), (5, 3), (8, 3), (12, 2), (20, 1), (40, 0.7), (60, 0.3))
+
+# Full-text table of app.db.search on SQLite
+FTS_TABLE = "prompts_fts"
+
+CREATED_AT = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def tag_names(size: int) -> List[str]:
+    """
+    Tag vocabulary for a catalog of `size` prompts, most popular first.
+    """
+    count = max(50, min(2_000, int(size ** 0.5) * 2))
+    names = list(dict.fromkeys([*CATEGORIES, *WORDS]))
+    return [names[i] if i < len(names) else f"{names[i % len(names)]}-{i // len(names)}" for i in range(count)]
+
+
+def _cumulative(weights: Sequence[float]) -> List[float]:
+    return list(itertools.accumulate(weights))
+
+
+class _CatalogRandom:
+    """
+    Draws catalog content from one seeded generator. Sentences come from a
+    fixed pool so large catalogs don't pay for word-by-word generation.
+    """
+
+    def __init__(self, seed: int, tags: List[str]):
+        self.rng = random.Random(seed)
+        self.tags = tags
+        self.tag_weights = _cumulative([1 / rank ** 1.1 for rank in range(1, len(tags) + 1)])
+        self.tag_count_weights = _cumulative(TAG_COUNT_WEIGHTS)
+        self.version_counts = [count for count, _ in VERSION_COUNT_WEIGHTS]
+        self.version_weights = _cumulative([weight for _, weight in VERSION_COUNT_WEIGHTS])
+        self.sentences = [self._sentence() for _ in range(5_000)]
+
+    def _sentence(self) -> str:
+        words = [self.rng.choice(WORDS) for _ in range(self.rng.randint(6, 16))]
+        if self.rng.random() < 0.15:
+            words.insert(self.rng.randrange(len(words)), "{{ " + self.rng.choice(VARIABLES) + " }}")
+        return " ".join(words).capitalize() + "."
+
+    def sentence(self) -> str:
+        return self.sentences[self.rng.randrange(len(self.sentences))]
+
+    def text(self) -> str:
+        # Mostly 4-12 lines, occasionally a few dozen
+        lines = self.rng.randint(4, 12) if self.rng.random() < 0.9 else self.rng.randint(20, 60)
+        return "\n".join(self.sentence() for _ in range(lines))
+
+    def revise(self, text: str) -> str:
+        lines = text.split("\n")
+        if self.rng.random() < 0.3:
+            lines.append(self.sentence())
+        else:
+            lines[self.rng.randrange(len(lines))] = self.sentence()
+        return "\n".join(lines)
+
+    def tag_indexes(self) -> List[int]:
+        count = bisect.bisect(self.tag_count_weights, self.rng.random() * self.tag_count_weights[-1])
+        picks = self.rng.choices(range(len(self.tags)), cum_weights=self.tag_weights, k=count)
+        return sorted(set(picks))
+
+    def version_count(self) -> int:
+        return self.rng.choices(self.version_counts, cum_weights=self.version_weights)[0]
+
+
+def generate_catalog(path: str, size: int, seed: int = 0) -> None:
+    """
+    Write a catalog of `size` prompts to a new SQLite database at `path`.
+    """
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    tags = tag_names(size)
+    draw = _CatalogRandom(seed, tags)
+    try:
+        with Session(engine) as db:
+            db.execute(insert(Tag), [{"id": i + 1, "name": name} for i, name in enumerate(tags)])
+            for start in range(0, size, BATCH_SIZE):
+                _insert_batch(db, draw, range(start + 1, min(start + BATCH_SIZE, size) + 1))
+                db.commit()
+    finally:
+        engine.dispose()
+
+
+def _insert_batch(db: Session, draw: _CatalogRandom, ids: range) -> None:
+    prompts = []
+    links = []
+    histories = []
+    documents = []
+    for prompt_id in ids:
+        texts = [draw.text()]
+        for _ in range(draw.version_count() - 1):
+            texts.append(draw.revise(texts[-1]))
+        description = draw.sentence()
+        meta = {
+            "category": draw.rng.choice(CATEGORIES),
+            "author": f"user-{draw.rng.randrange(500)}",
+            "language": draw.rng.choice(LANGUAGES),
+        }
+        prompts.append({
+            "id": prompt_id,
+            "name": f"{draw.rng.choice(CATEGORIES)}-{draw.rng.choice(WORDS)}-{prompt_id}",
+            "text": texts[-1],
+            "description": description,
+            "version": len(texts),
+            "meta": meta,
+            "created_at": CREATED_AT + datetime.timedelta(minutes=prompt_id),
+        })
+        tag_indexes = draw.tag_indexes()
+        links.extend({"prompt_id": prompt_id, "tag_id": index + 1} for index in tag_indexes)
+        documents.append({
+            "id": prompt_id,
+            "name": prompts[-1]["name"],
+            "text": texts[-1],
+            "description": description,
+            "tags": " ".join(draw.tags[index] for index in tag_indexes),
+        })
+        histories.append((prompt_id, [
+            {"version": number, "text": text, "description": description, "meta": meta}
+            for number, text in enumerate(texts, start=1)
+        ]))
+    db.execute(insert(Prompt), prompts)
+    if links:
+        db.execute(insert(prompt_tags), links)
+    versioning.add_histories(db, histories)
+    db.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE}(rowid, name, text, description, tags) "
+            "VALUES (:id, :name, :text, :description, :tags)"
+        ),
+        documents
+    )
+
+
+def catalog_counts(path: str) -> dict:
+    """
+    Row counts of a generated catalog.
+    """
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        with Session(engine) as db:
+            return {
+                "prompts": db.scalar(select(func.count()).select_from(Prompt)),
+                "versions": db.scalar(select(func.count()).select_from(PromptVersion)),
+                "tags": db.scalar(select(func.count()).select_from(Tag)),
+                "tag_links": db.scalar(select(func.count()).select_from(prompt_tags)),
+            }
+    finally:
+        engine.dispose()
@@ -0,0 +1,165 @@
+"""
+Local stand-in for the OpenRouter API, for load testing the playground.
+
+Serves `POST /chat/completions` (plain and streamed) and `GET /models`.
+Each model follows a profile: a log-normal latency (`median` seconds and
+`sigma`), a completion length in tokens, and the fraction of calls that
+fail with a 500 (`error_rate`) or a 429 with `Retry-After`
+(`rate_limit_rate`). Streamed responses spread the latency over their
+chunks and report usage in the last one. Models without a profile use the
+`default` one.
+
+Point the application at it with OPENROUTER_BASE_URL, e.g.:
+
+    python -m benchmarks.openrouter_stub --port 9000
+    OPENROUTER_BASE_URL=http://127.0.0.1:9000 uvicorn app.main:app
+
+Usage:
+    python -m benchmarks.openrouter_stub [--host H] [--port N] [--profiles profiles.json]
+        [--time-scale F] [--seed N]
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_PROFILES: Dict[str, Dict[str, float]] = {
+    "default": {"median": 0.8, "sigma": 0.4, "tokens": 120},
+    "stub/fast": {"median": 0.25, "sigma": 0.3, "tokens": 60},
+    "stub/medium": {"median": 1.0, "sigma": 0.4, "tokens": 150},
+    "stub/slow": {"median": 3.0, "sigma": 0.5, "tokens": 400},
+    "stub/flaky": {"median": 0.8, "sigma": 0.6, "tokens": 120, "error_rate": 0.1, "rate_limit_rate": 0.1},
+}
+
+# Chunks a streamed completion is split into, at most
+STREAM_CHUNKS = 20
+
+
+def create_app(
+    profiles: Optional[Dict[str, Dict[str, float]]] = None,
+    time_scale: float = 1.0,
+    seed: Optional[int] = None
+) -> FastAPI:
+    """
+    Build the stub app. `time_scale` multiplies every simulated delay.
+    """
+    profiles = {**DEFAULT_PROFILES, **(profiles or {})}
+    rng = random.Random(seed)
+    stub = FastAPI(title="OpenRouter stub")
+    stub.state.calls = 0
+
+    def profile(model: str) -> Dict[str, float]:
+        return profiles.get(model, profiles["default"])
+
+    def latency(model: str) -> float:
+        settings = profile(model)
+        return settings["median"] * math.exp(rng.gauss(0, settings.get("sigma", 0))) * time_scale
+
+    def usage(messages, completion_tokens: int) -> Dict[str, int]:
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def failure(model: str) -> Optional[JSONResponse]:
+        settings = profile(model)
+        roll = rng.random()
+        if roll < settings.get("rate_limit_rate", 0):
+            return JSONResponse(
+                {"error": {"code": 429, "message": "Rate limit exceeded"}},
+                status_code=429,
+                headers={"Retry-After": "1"}
+            )
+        if roll < settings.get("rate_limit_rate", 0) + settings.get("error_rate", 0):
+            return JSONResponse({"error": {"code": 500, "message": "Upstream error"}}, status_code=500)
+        return None
+
+    @stub.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "default")
+        messages = body.get("messages", [])
+        stub.state.calls += 1
+        error = failure(model)
+        if error is not None:
+            await asyncio.sleep(latency(model) / 10)
+            return error
+
+        tokens = max(1, int(profile(model).get("tokens", 100) * rng.uniform(0.5, 1.5)))
+        words = [f"token{i}" for i in range(tokens)]
+        total = latency(model)
+        completion_id = f"gen-stub-{stub.state.calls}"
+
+        if not body.get("stream"):
+            await asyncio.sleep(total)
+            return {
+                "id": completion_id,
+                "model": model,
+                "created": int(time.time()),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": usage(messages, tokens),
+            }
+
+        chunks = min(STREAM_CHUNKS, tokens)
+        size = math.ceil(tokens / chunks)
+
+        async def events():
+            # A third of the latency goes before the first token
+            await asyncio.sleep(total / 3)
+            for start in range(0, tokens, size):
+                content = " ".join(words[start:start + size]) + " "
+                chunk = {"id": completion_id, "model": model, "choices": [{"index": 0, "delta": {"content": content}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(total * 2 / 3 / chunks)
+            final = {"id": completion_id, "model": model, "choices": [], "usage": usage(messages, tokens)}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @stub.get("/models")
+    async def models():
+        return {"data": [
+            {
+                "id": name,
+                "name": name,
+                "pricing": {"prompt": "0", "completion": "0"},
+                "description": f"Stub model with a median latency of {settings['median']}s",
+                "architecture": {"modality": "text->text"},
+                "context_length": 8192,
+            }
+            for name, settings in profiles.items() if name != "default"
+        ]}
+
+    return stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--profiles", help="JSON file of model profiles, merged over the defaults")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply every simulated delay")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    profiles = None
+    if args.profiles:
+        with open(args.profiles) as f:
+            profiles = json.load(f)
+
+    import uvicorn
+
+    uvicorn.run(create_app(profiles, args.time_scale, args.seed), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Load test `POST /prompts/playground` over a grid of concurrency and model
+counts.
+
+Each cell of the grid keeps `concurrency` requests in flight, each asking
+for `models` models at once, until `--requests` have completed, and
+reports the p50/p95/p99 request latency, the throughput and the errors. A
+request counts as an error when the endpoint fails or any model in it
+returned an error entry. The completion cache is bypassed.
+
+Run it against a server whose upstream is the stub (see
+`benchmarks.openrouter_stub`), e.g.:
+
+    python -m benchmarks.openrouter_stub --port 9000 --time-scale 0.1
+    OPENROUTER_BASE_URL=http://127.0.0.1:9000 uvicorn app.main:app
+    python -m benchmarks.playground_load --concurrency 1,8,32 --models 1,2,4
+
+Usage:
+    python -m benchmarks.playground_load [--url URL] [--prompt-id N]
+        [--concurrency 1,8,32] [--models 1,2,4] [--model-names a,b,...]
+        [--requests N] [--output results.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+from app.core.config import settings
+from benchmarks.run import _summarize
+
+DEFAULT_URL = "http://127.0.0.1:8000"
+DEFAULT_MODELS = ("stub/fast", "stub/medium", "stub/slow", "stub/flaky")
+
+API = f"{settings.API_V1_STR}/prompts"
+
+
+async def ensure_prompt(client: httpx.AsyncClient) -> int:
+    """
+    Create a prompt for the load test and return its id.
+    """
+    response = await client.post(f"{API}/", json={
+        "name": f"playground-load-{int(time.time() * 1000)}",
+        "text": "Answer the question about {{ topic }} in a few sentences.",
+        "description": "Created by benchmarks.playground_load",
+    })
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+async def run_cell(
+    client: httpx.AsyncClient,
+    prompt_id: int,
+    concurrency: int,
+    models: Sequence[str],
+    requests: int
+) -> Dict[str, Any]:
+    """
+    Send `requests` playground requests for `models`, `concurrency` at a
+    time, and summarize them.
+    """
+    payload = {
+        "prompt_id": prompt_id,
+        "models": list(models),
+        "variables": {"topic": "load testing"},
+        "use_cache": False,
+    }
+    remaining = itertools.count()
+    samples: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while next(remaining) < requests:
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{API}/playground", json=payload)
+                failed = response.status_code != 200 or any(
+                    "error" in result for result in response.json()["responses"].values()
+                )
+            except httpx.HTTPError:
+                failed = True
+            samples.append((time.perf_counter() - started) * 1000)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    summary = _summarize(samples)
+    return {
+        "concurrency": concurrency,
+        "models": len(models),
+        "requests": len(samples),
+        "errors": errors,
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "p99_ms": summary["p99_ms"],
+        "max_ms": summary["max_ms"],
+        "requests_per_second": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "model_calls_per_second": round(len(samples) * len(models) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+async def run_grid(
+    client: httpx.AsyncClient,
+    concurrencies: Sequence[int],
+    model_counts: Sequence[int],
+    model_names: Sequence[str] = DEFAULT_MODELS,
+    requests: int = 100,
+    prompt_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run one cell per combination of concurrency and model count. Model
+    counts beyond `model_names` cycle through the names again.
+    """
+    if prompt_id is None:
+        prompt_id = await ensure_prompt(client)
+    rows = []
+    for concurrency, count in itertools.product(concurrencies, model_counts):
+        models = list(itertools.islice(itertools.cycle(model_names), count))
+        rows.append(await run_cell(client, prompt_id, concurrency, models, requests))
+    return rows
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    lines = [
+        f"{'conc':>5} {'models':>6} {'reqs':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'p99 ms':>9} {'req/s':>8} {'calls/s':>8}"
+    ]
+    for row in rows:
+        lines.append(
+            f"{row['concurrency']:>5} {row['models']:>6} {row['requests']:>6} {row['errors']:>6} "
+            f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+            f"{row['requests_per_second']:>8.2f} {row['model_calls_per_second']:>8.2f}"
+        )
+    return "\n".join(lines)
+
+
+def _integers(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=DEFAULT_URL, help="Base URL of the application")
+    parser.add_argument("--prompt-id", type=int, help="Prompt to run; one is created if omitted")
+    parser.add_argument("--concurrency", type=_integers, default=[1, 8, 32], help="Comma-separated requests in flight")
+    parser.add_argument("--models", type=_integers, default=[1, 2, 4], help="Comma-separated models per request")
+    parser.add_argument("--model-names", default=",".join(DEFAULT_MODELS), help="Comma-separated models to draw from")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per cell")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", help="Also write the results JSON here")
+    args = parser.parse_args()
+
+    async def run():
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+            return await run_grid(
+                client,
+                args.concurrency,
+                args.models,
+                [name for name in args.model_names.split(",") if name],
+                args.requests,
+                args.prompt_id
+            )
+
+    rows = asyncio.run(run())
+    print(format_table(rows))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"url": args.url, "results": rows}, f, indent=2)
+            f.write("\n")
+    else:
+        print(json.dumps(rows, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
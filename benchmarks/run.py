@@ -0,0 +1,284 @@
+"""
+Time the main read and write paths against a synthetic SQLite catalog.
+
+The catalog for a size and seed is generated once (see
+`benchmarks.catalog`) and cached under `--data-dir`; every run works on a
+fresh copy of it, so updates never leak into later runs. Requests go
+through the full application stack with an in-process client and the
+prompt and tag caches disabled, so every read reaches the database.
+
+Results are written as JSON. With `--baseline`, the median latency of
+every operation is compared with a stored run, and the exit status is 1 if
+any is slower by more than `--tolerance`. Timings depend on the machine,
+so baselines are recorded locally (on the commit before a change) rather
+than kept in the repository.
+
+Usage:
+    python -m benchmarks.run [--size 1k|100k|1m] [--seed N] [--iterations N]
+        [--output results.json] [--baseline baseline-1k.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import sqlalchemy
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.cache import NullCache, set_prompt_cache, set_tag_cache
+from app.core.config import settings
+from app.db.base_class import Base
+from app.db.session import SessionRunner, configure_engine, engine_options, get_db, get_db_runner
+from benchmarks.catalog import SIZES, WORDS, catalog_counts, generate_catalog, tag_names
+
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), "prompt-hub-benchmarks")
+DEFAULT_TOLERANCE = 0.25
+WARMUP = 3
+
+API = f"{settings.API_V1_STR}/prompts"
+
+
+def catalog_path(data_dir: str, size: int, seed: int) -> str:
+    """
+    Path of the cached catalog for `size` and `seed`, generating it if needed.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"catalog-{size}-{seed}.db")
+    if not os.path.exists(path):
+        partial = f"{path}.partial"
+        if os.path.exists(partial):
+            os.remove(partial)
+        generate_catalog(partial, size, seed)
+        os.replace(partial, path)
+    return path
+
+
+def _operations(size: int) -> Dict[str, Callable[[TestClient, random.Random], Any]]:
+    """
+    The benchmarked requests; each draws its parameters from `rng`.
+    """
+    tags = tag_names(size)
+    popular_tags = tags[:10]
+
+    def random_id(rng: random.Random) -> int:
+        return rng.randint(1, size)
+
+    return {
+        "list": lambda client, rng: client.get(f"{API}/", params={"limit": 50}),
+        "list_deep_offset": lambda client, rng: client.get(
+            f"{API}/", params={"limit": 50, "skip": rng.randint(size // 2, max(size - 50, size // 2))}
+        ),
+        "search_name": lambda client, rng: client.get(
+            f"{API}/", params={"search": rng.choice(WORDS), "limit": 50}
+        ),
+        "search_fulltext": lambda client, rng: client.get(
+            f"{API}/", params={"search": rng.choice(WORDS), "search_mode": "fulltext", "limit": 50}
+        ),
+        "tag_filter_popular": lambda client, rng: client.get(
+            f"{API}/", params={"tag": rng.choice(popular_tags), "limit": 50}
+        ),
+        "tag_filter_rare": lambda client, rng: client.get(
+            f"{API}/", params={"tag": rng.choice(tags[-10:]), "limit": 50}
+        ),
+        "tag_filter_all": lambda client, rng: client.get(
+            f"{API}/", params={"tags": ",".join(rng.sample(popular_tags, 2)), "match": "all", "limit": 50}
+        ),
+        "tag_filter_any": lambda client, rng: client.get(
+            f"{API}/", params={"tags": ",".join(rng.sample(tags[-10:], 3)), "match": "any", "limit": 50}
+        ),
+        "tag_counts": lambda client, rng: client.get(f"{settings.API_V1_STR}/tags/"),
+        "meta_filter": lambda client, rng: client.get(
+            f"{API}/", params={"meta.author": f"user-{rng.randrange(500)}", "limit": 50}
+        ),
+        "get_by_id": lambda client, rng: client.get(f"{API}/{random_id(rng)}"),
+        "version_history": lambda client, rng: client.get(
+            f"{API}/{random_id(rng)}/versions", params={"summary": True}
+        ),
+        "version_read": lambda client, rng: client.get(f"{API}/{random_id(rng)}/versions/1"),
+        "update": lambda client, rng: client.put(
+            f"{API}/{random_id(rng)}",
+            json={"text": " ".join(rng.choice(WORDS) for _ in range(40))}
+        ),
+    }
+
+
+def _summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(percentile(0.95), 3),
+        "p99_ms": round(percentile(0.99), 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3),
+        "ops_per_second": round(1000 * len(ordered) / sum(ordered), 1) if sum(ordered) else 0.0,
+    }
+
+
+def run_benchmarks(
+    size: int,
+    seed: int = 0,
+    iterations: int = 50,
+    data_dir: str = DEFAULT_DATA_DIR,
+    operations: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Benchmark every operation (or those named in `operations`) on a copy of
+    the catalog and return the results document.
+    """
+    from app.main import app
+
+    source = catalog_path(data_dir, size, seed)
+    work_dir = tempfile.mkdtemp(prefix="prompt-hub-bench-")
+    path = os.path.join(work_dir, "catalog.db")
+    shutil.copyfile(source, path)
+
+    url = f"sqlite:///{path}"
+    engine = create_engine(url, **engine_options(url))
+    configure_engine(engine, "benchmark")
+    # Bring catalogs cached by earlier releases up to the current schema
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_db_runner():
+        db = SessionLocal()
+        try:
+            yield SessionRunner(db)
+        finally:
+            db.close()
+
+    startup = (settings.DB_INIT_ON_STARTUP, settings.DB_CHECK_ON_STARTUP, settings.PLAYGROUND_JOBS_RESUME)
+    settings.DB_INIT_ON_STARTUP = settings.DB_CHECK_ON_STARTUP = settings.PLAYGROUND_JOBS_RESUME = False
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_db_runner] = override_get_db_runner
+    set_prompt_cache(NullCache())
+    set_tag_cache(NullCache())
+    results = {}
+    try:
+        with TestClient(app) as client:
+            for name, operation in _operations(size).items():
+                if operations and name not in operations:
+                    continue
+                rng = random.Random(f"{seed}:{name}")
+                samples = []
+                for i in range(WARMUP + iterations):
+                    started = time.perf_counter()
+                    response = operation(client, rng)
+                    elapsed = (time.perf_counter() - started) * 1000
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{name} failed with {response.status_code}: {response.text[:200]}")
+                    if i >= WARMUP:
+                        samples.append(elapsed)
+                results[name] = _summarize(samples)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_db_runner, None)
+        set_prompt_cache(None)
+        set_tag_cache(None)
+        settings.DB_INIT_ON_STARTUP, settings.DB_CHECK_ON_STARTUP, settings.PLAYGROUND_JOBS_RESUME = startup
+        engine.dispose()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "catalog": {
+            "size": size,
+            "seed": seed,
+            "file_mb": round(os.path.getsize(source) / 2 ** 20, 1),
+            **catalog_counts(source),
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "version_storage": settings.PROMPT_VERSION_STORAGE,
+        },
+        "iterations": iterations,
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Compare median latencies with a baseline run.
+
+    Returns one row per operation present in both runs, with `regression`
+    set where the current median is more than `tolerance` slower.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        if name not in baseline.get("results", {}):
+            continue
+        before = baseline["results"][name]["p50_ms"]
+        after = result["p50_ms"]
+        ratio = after / before if before else float("inf")
+        rows.append({
+            "operation": name,
+            "baseline_p50_ms": before,
+            "p50_ms": after,
+            "ratio": round(ratio, 2),
+            "regression": ratio > 1 + tolerance,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", choices=sorted(SIZES, key=SIZES.get), default="1k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--operation", action="append", dest="operations", help="Only run this operation (repeatable)")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Where generated catalogs are cached")
+    parser.add_argument("--output", help="Write the results JSON here instead of stdout")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown of the median, e.g. 0.25")
+    args = parser.parse_args()
+
+    results = run_benchmarks(SIZES[args.size], args.seed, args.iterations, args.data_dir, args.operations)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["catalog"]["size"] != results["catalog"]["size"]:
+            parser.error("The baseline was recorded on a different catalog size")
+        rows = compare(results, baseline, args.tolerance)
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(
+                f"{row['operation']:<20} {row['baseline_p50_ms']:>9.2f} ms -> {row['p50_ms']:>9.2f} ms"
+                f"  x{row['ratio']:.2f}{flag}",
+                file=sys.stderr
+            )
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
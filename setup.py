@@ -6,6 +6,9 @@ with open("README.md", "r", encoding="utf-8") as fh:
 with open("requirements.txt", "r", encoding="utf-8") as fh:
     requirements = fh.read().splitlines()
 
+with open("requirements-async.txt", "r", encoding="utf-8") as fh:
+    async_requirements = [line for line in fh.read().splitlines() if line and not line.startswith("#")]
+
 with open("VERSION", "r", encoding="utf-8") as fh:
     version = fh.read().strip()
 
@@ -18,7 +21,7 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/shubhanshusingh/exemplar-prompt-hub",
-    packages=find_packages(),
+    packages=find_packages(exclude=("benchmarks", "benchmarks.*")),
     license="MIT",
     license_files=("LICENSE"),
     classifiers=[
@@ -35,6 +38,9 @@ setup(
     ],
     python_requires=">=3.8",
     install_requires=requirements,
+    extras_require={
+        "async": async_requirements,
+    },
     entry_points={
         "console_scripts": [
             "prompt-hub=app.main:main",
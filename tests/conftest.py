@@ -1,14 +1,28 @@
+import asyncio
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.main import app
+from app.core import openrouter
 from app.db.base_class import Base
 from app.db.session import get_db
+from app.core.cache import TAG_COUNTS_KEY, get_prompt_cache, get_tag_cache
 from app.core.config import settings
+from app.core.diffing import diff_cache
+from app.db.delta import text_cache
+from app.db.instrumentation import instrument_queries
+from app.db.session import apply_sqlite_pragmas
+
 
+# Tests build their own databases; keep app startup away from DATABASE_URL
+settings.DB_INIT_ON_STARTUP = False
+settings.DB_CHECK_ON_STARTUP = False
+settings.PLAYGROUND_JOBS_RESUME = False
 
 # Create test database
 SQLALCHEMY_DATABASE_URL = "sqlite://"
@@ -18,12 +32,16 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+instrument_queries(engine, "test")
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
 @pytest.fixture(scope="function")
 def db_session():
     Base.metadata.create_all(bind=engine)
+    # Version row ids are reused across per-test databases
+    text_cache.clear()
+    diff_cache.clear()
     db = TestingSessionLocal()
     try:
         yield db
@@ -41,11 +59,66 @@ def client(db_session):
             db_session.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    # Ids are reused across per-test databases, so start with a cold cache
+    get_prompt_cache().clear()
+    get_tag_cache().delete(TAG_COUNTS_KEY)
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def file_engine(tmp_path):
+    """File database with a connection per thread, for tests that write from several threads."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def threaded_client(client, file_engine):
+    """
+    `client` with a session per request on `file_engine`, so concurrent
+    requests and background work don't share one connection.
+    """
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=file_engine)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return client
+
+
+@pytest.fixture
+def record_statements(db_session):
+    """
+    Context manager collecting the SQL statements run on the test database
+    while it is open; `writes_only` leaves out SELECTs.
+    """
+    @contextmanager
+    def record(writes_only=False):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if not writes_only or not statement.lstrip().upper().startswith("SELECT"):
+                statements.append(statement)
+
+        event.listen(db_session.get_bind(), "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db_session.get_bind(), "before_cursor_execute", before_cursor_execute)
+
+    return record
+
+
 @pytest.fixture
 def test_prompt_data():
     return {
@@ -61,4 +134,31 @@ def test_prompt_data():
 @pytest.fixture
 def test_prompt(client, test_prompt_data):
     response = client.post("/api/v1/prompts/", json=test_prompt_data)
-    return response.json() 
\ No newline at end of file
+    return response.json() 
+
+
+@pytest.fixture
+def fake_completion(monkeypatch):
+    """
+    Replace the OpenRouter call with a local stub that answers with the
+    model name and the last message.
+
+    Every call is recorded in `calls` as (model, messages, parameters).
+    Setting a model name delays that model's answers by so many seconds,
+    and `usage` replaces the usage it reports. `broken/model` always fails.
+    """
+    stub = {"calls": [], "delay": 0.01}
+
+    async def chat_completion(client, model, messages, parameters=None):
+        stub["calls"].append((model, messages, parameters))
+        await asyncio.sleep(stub.get(model, stub["delay"]))
+        if model == "broken/model":
+            raise RuntimeError("upstream exploded")
+        return {
+            "choices": [{"message": {"content": f"{model}: {messages[-1]['content']}"}}],
+            "usage": stub.get("usage", {"total_tokens": 3}),
+            "model": model
+        }
+
+    monkeypatch.setattr(openrouter, "chat_completion", chat_completion)
+    return stub
@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.cache import get_prompt_cache
+from app.db.base_class import Base
+from app.db.session import AsyncSessionRunner, async_database_url, get_db_runner
+from app.main import app
+
+
+@pytest.fixture
+def async_client(tmp_path):
+    """Client whose prompt endpoints run on an aiosqlite AsyncSession."""
+    engine = create_async_engine(async_database_url(f"sqlite:///{tmp_path / 'async.db'}"))
+    AsyncTestingSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    async def override_get_db_runner():
+        async with AsyncTestingSessionLocal() as session:
+            yield AsyncSessionRunner(session)
+
+    app.dependency_overrides[get_db_runner] = override_get_db_runner
+    get_prompt_cache().clear()
+    with TestClient(app) as test_client:
+        test_client.portal.call(create_tables)
+        yield test_client
+        test_client.portal.call(engine.dispose)
+    app.dependency_overrides.clear()
+
+def test_async_database_url():
+    """Test mapping sync database URLs onto async drivers."""
+    assert async_database_url("sqlite:///./prompt_hub.db") == "sqlite+aiosqlite:///./prompt_hub.db"
+    assert async_database_url("postgresql://u:p@db/hub") == "postgresql+asyncpg://u:p@db/hub"
+    assert async_database_url("postgresql+psycopg2://u:p@db/hub") == "postgresql+asyncpg://u:p@db/hub"
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u:p@db/hub")
+
+def test_crud_on_async_session(async_client, test_prompt_data):
+    """Test the prompt endpoints end to end on the async driver."""
+    response = async_client.post("/api/v1/prompts/", json=test_prompt_data)
+    assert response.status_code == 200
+    prompt_id = response.json()["id"]
+    
+    response = async_client.put(f"/api/v1/prompts/{prompt_id}", json={"text": "Async update"})
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    
+    data = async_client.get("/api/v1/prompts/?include=tags,versions").json()
+    assert [v["version"] for v in data[0]["versions"]] == [1, 2]
+    assert async_client.get(f"/api/v1/prompts/{prompt_id}/versions/1").json()["text"] == test_prompt_data["text"]
+    
+    data = async_client.get("/api/v1/prompts/?search=async&search_mode=fulltext").json()
+    assert [p["id"] for p in data] == [prompt_id]
+    
+    assert async_client.delete(f"/api/v1/prompts/{prompt_id}").status_code == 200
+    assert async_client.get(f"/api/v1/prompts/{prompt_id}").status_code == 404
@@ -0,0 +1,312 @@
+import asyncio
+import json
+import time
+
+import pytest
+from app.core import openrouter, templating
+from app.core.config import settings
+
+
+def test_playground_queries_models_concurrently(client, test_prompt, fake_completion):
+    """Test that playground latency tracks the slowest model, not the sum."""
+    models = [f"stub/model-{i}" for i in range(4)]
+    fake_completion.update({model: 0.2 for model in models})
+    
+    started = time.perf_counter()
+    response = client.post("/api/v1/prompts/playground", json={
+        "prompt_id": test_prompt["id"],
+        "models": models
+    })
+    elapsed = time.perf_counter() - started
+    
+    assert response.status_code == 200
+    responses = response.json()["responses"]
+    assert list(responses) == models
+    assert all(r["response"] == f"{m}: {test_prompt['text']}" for m, r in responses.items())
+    assert elapsed < 0.6
+
+def test_playground_captures_per_model_errors(client, test_prompt, fake_completion, monkeypatch):
+    """Test that failures and timeouts are reported per model."""
+    monkeypatch.setattr(settings, "PLAYGROUND_MODEL_TIMEOUT", 0.1)
+    fake_completion["slow/model"] = 1
+    
+    response = client.post("/api/v1/prompts/playground", json={
+        "prompt_id": test_prompt["id"],
+        "models": ["stub/model", "broken/model", "slow/model"]
+    })
+    
+    assert response.status_code == 200
+    responses = response.json()["responses"]
+    assert responses["stub/model"]["response"] == f"stub/model: {test_prompt['text']}"
+    assert responses["broken/model"]["error"] == "upstream exploded"
+    assert "did not respond within" in responses["slow/model"]["error"]
+
+def test_playground_records_upstream_metrics(client, test_prompt, fake_completion):
+    """Test that upstream latency, token usage and errors are counted per model."""
+    from prometheus_client import REGISTRY
+
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+    
+    before = (
+        sample("upstream_request_duration_seconds_count", model="stub/metrics", outcome="ok"),
+        sample("upstream_errors_total", model="broken/model", reason="RuntimeError")
+    )
+    fake_completion["usage"] = {"prompt_tokens": 5, "completion_tokens": 7}
+    client.post("/api/v1/prompts/playground", json={
+        "prompt_id": test_prompt["id"],
+        "models": ["stub/metrics", "broken/model"],
+        "use_cache": False
+    })
+    
+    assert sample("upstream_request_duration_seconds_count", model="stub/metrics", outcome="ok") == before[0] + 1
+    assert sample("upstream_errors_total", model="broken/model", reason="RuntimeError") == before[1] + 1
+    assert sample("upstream_tokens_total", model="stub/metrics", kind="completion") >= 7
+
+@pytest.fixture
+def fake_catalog(monkeypatch):
+    """Serve the model catalog from a local stub and count upstream fetches."""
+    state = {"fetches": 0, "models": ["stub/model-a"]}
+
+    async def fetch_models():
+        state["fetches"] += 1
+        return {"data": [{"id": model} for model in state["models"]]}
+
+    monkeypatch.setattr(openrouter, "fetch_models", fetch_models)
+    openrouter.model_catalog.clear()
+    yield state
+    openrouter.model_catalog.clear()
+
+def test_models_are_cached_with_etag(client, fake_catalog):
+    """Test that the catalog is fetched once and revalidated with ETags."""
+    response = client.get("/api/v1/prompts/models")
+    assert response.status_code == 200
+    assert response.json() == {"data": [{"id": "stub/model-a"}]}
+    etag = response.headers["ETag"]
+    
+    response = client.get("/api/v1/prompts/models", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert fake_catalog["fetches"] == 1
+
+def test_models_refresh_in_background_when_stale(client, fake_catalog, monkeypatch):
+    """Test that a stale catalog is served while it is refreshed."""
+    client.get("/api/v1/prompts/models")
+    monkeypatch.setattr(settings, "MODELS_CACHE_TTL", 0)
+    fake_catalog["models"] = ["stub/model-b"]
+    
+    # The stale copy is returned immediately
+    response = client.get("/api/v1/prompts/models")
+    assert response.json() == {"data": [{"id": "stub/model-a"}]}
+    
+    for _ in range(50):
+        response = client.get("/api/v1/prompts/models")
+        if response.json() == {"data": [{"id": "stub/model-b"}]}:
+            break
+        time.sleep(0.01)
+    assert response.json() == {"data": [{"id": "stub/model-b"}]}
+
+def test_playground_renders_jinja_templates(client, fake_completion):
+    """Test that variables are rendered through the cached sandboxed Jinja engine."""
+    templating.template_cache.clear()
+    prompt = client.post("/api/v1/prompts/", json={
+        "name": "greeting",
+        "text": "Hello {{name}}!{% if role %} You are a {{ role | lower }}.{% endif %}"
+    }).json()
+    
+    for _ in range(2):
+        response = client.post("/api/v1/prompts/playground", json={
+            "prompt_id": prompt["id"],
+            "models": ["stub/model"],
+            "variables": {"name": "John", "role": "Developer"}
+        })
+        assert response.status_code == 200
+        assert response.json()["responses"]["stub/model"]["prompt_used"] == "Hello John! You are a developer."
+    assert len(templating.template_cache) == 1
+
+def test_playground_keeps_unknown_placeholders(client, fake_completion):
+    """Test that placeholders without a value are sent verbatim, with or without variables."""
+    prompt = client.post("/api/v1/prompts/", json={
+        "name": "lenient",
+        "text": "{{ greeting }} {{ name }}{% if role is defined %} the {{ role }}{% endif %}"
+    }).json()
+    body = {"prompt_id": prompt["id"], "models": ["stub/model"]}
+    
+    response = client.post("/api/v1/prompts/playground", json={**body, "variables": {"name": "Ada"}})
+    assert response.status_code == 200
+    assert response.json()["responses"]["stub/model"]["prompt_used"] == "{{ greeting }} Ada"
+    
+    response = client.post("/api/v1/prompts/playground", json=body)
+    assert response.status_code == 200
+    assert response.json()["responses"]["stub/model"]["prompt_used"] == "{{ greeting }} {{ name }}"
+
+def test_playground_rejects_missing_variables_when_strict(client, fake_completion, monkeypatch):
+    """Test that strict rendering is a 400 naming only the variables the render needed."""
+    monkeypatch.setattr(settings, "TEMPLATE_STRICT_UNDEFINED", True)
+    prompt = client.post("/api/v1/prompts/", json={
+        "name": "strict",
+        "text": "{{ greeting }} {{ name }}{% if role is defined %} the {{ role }}{% endif %}, from {{ team | default('us') }} {{ place }}"
+    }).json()
+    body = {"prompt_id": prompt["id"], "models": ["stub/model"]}
+    
+    response = client.post("/api/v1/prompts/playground", json={**body, "variables": {"name": "Ada"}})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Error processing variables: Missing variables: greeting, place"
+    
+    response = client.post("/api/v1/prompts/playground", json=body)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Error processing variables: Missing variables: greeting, name, place"
+    
+    response = client.post("/api/v1/prompts/playground", json={**body, "variables": {"greeting": "Hi", "name": "Ada", "place": "HQ"}})
+    assert response.status_code == 200
+    assert response.json()["responses"]["stub/model"]["prompt_used"] == "Hi Ada, from us HQ"
+    assert fake_completion["calls"] and len(fake_completion["calls"]) == 1
+
+def test_playground_rejects_unsafe_templates(client, fake_completion):
+    """Test that templates can't escape the sandbox."""
+    prompt = client.post("/api/v1/prompts/", json={
+        "name": "escape",
+        "text": "{{ name.__class__.__mro__[1].__subclasses__() }}"
+    }).json()
+    
+    response = client.post("/api/v1/prompts/playground", json={
+        "prompt_id": prompt["id"],
+        "models": ["stub/model"],
+        "variables": {"name": "x"}
+    })
+    assert response.status_code == 400
+    assert "Error processing variables" in response.json()["detail"]
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    """Replace the streamed OpenRouter call with a stub emitting a few chunks."""
+    delays = {}
+
+    async def stream_chat_completion(client, model, messages, parameters=None):
+        if model == "broken/model":
+            raise RuntimeError("upstream exploded")
+        for word in ["Hello", " from", f" {model}"]:
+            await asyncio.sleep(delays.get(model, 0))
+            yield {"choices": [{"delta": {"content": word}}]}
+        yield {"choices": [], "usage": {"total_tokens": 5}}
+
+    monkeypatch.setattr(openrouter, "stream_chat_completion", stream_chat_completion)
+    return delays
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_playground_stream_multiplexes_models(client, test_prompt, fake_stream):
+    """Test that chunks from every model share one SSE stream, fastest first."""
+    fake_stream.update({"fast/model": 0.01, "slow/model": 0.15})
+    
+    response = client.post("/api/v1/prompts/playground/stream", json={
+        "prompt_id": test_prompt["id"],
+        "models": ["slow/model", "fast/model", "broken/model"]
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    
+    events = _parse_sse(response.text)
+    assert events[0][0] == "start"
+    assert events[0][1]["models"] == ["slow/model", "fast/model", "broken/model"]
+    assert events[-1][0] == "end"
+    
+    chunks = [data for event, data in events if event == "chunk"]
+    assert chunks[0]["model"] == "fast/model"
+    done = {data["model"]: data for event, data in events if event == "done"}
+    assert done["fast/model"]["response"] == "Hello from fast/model"
+    assert done["slow/model"]["usage"] == {"total_tokens": 5}
+    assert done["slow/model"]["timing"]["first_token_seconds"] >= 0.15
+    assert done["fast/model"]["timing"]["first_token_seconds"] < done["slow/model"]["timing"]["first_token_seconds"]
+    errors = [data for event, data in events if event == "error"]
+    assert errors == [{"model": "broken/model", "error": "upstream exploded"}]
+
+def test_stream_chat_completion_parses_sse():
+    """Test that upstream SSE lines are decoded into chunks up to [DONE]."""
+    import httpx
+
+    body = (
+        ": OPENROUTER PROCESSING\n\n"
+        'data: {"choices": [{"delta": {"content": "Hi"}}]}\n\n'
+        'data: {"choices": [], "usage": {"total_tokens": 2}}\n\n'
+        "data: [DONE]\n\n"
+    )
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    async def collect():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return [chunk async for chunk in openrouter.stream_chat_completion(client, "stub/model", [])]
+
+    chunks = asyncio.run(collect())
+    assert requests[0]["stream"] is True
+    assert chunks == [
+        {"choices": [{"delta": {"content": "Hi"}}]},
+        {"choices": [], "usage": {"total_tokens": 2}}
+    ]
+
+@pytest.fixture
+def completion_cache(tmp_path, monkeypatch):
+    """Enable the completion cache on a temporary SQLite file."""
+    from app.core import completion_cache
+
+    monkeypatch.setattr(settings, "COMPLETION_CACHE_ENABLED", True)
+    cache = completion_cache.CompletionCache(str(tmp_path / "completions.db"))
+    completion_cache.set_completion_cache(cache)
+    yield cache
+    completion_cache.set_completion_cache(None)
+
+def test_playground_completion_cache(client, test_prompt, fake_completion, completion_cache):
+    """Test that repeated identical calls are served from the completion cache."""
+    body = {
+        "prompt_id": test_prompt["id"],
+        "models": ["stub/model"],
+        "system_message": "Be terse.",
+        "parameters": {"temperature": 0}
+    }
+    first = client.post("/api/v1/prompts/playground", json=body).json()["responses"]["stub/model"]
+    second = client.post("/api/v1/prompts/playground", json=body).json()["responses"]["stub/model"]
+    
+    assert first["metadata"]["cache_hit"] is False
+    assert second["metadata"]["cache_hit"] is True
+    assert second["response"] == first["response"]
+    assert second["metadata"]["usage"] == first["metadata"]["usage"]
+    assert len(fake_completion["calls"]) == 1
+    model, messages, parameters = fake_completion["calls"][0]
+    assert messages[0] == {"role": "system", "content": "Be terse."}
+    assert parameters == {"temperature": 0}
+    
+    # Different sampling parameters, or opting out, go upstream
+    client.post("/api/v1/prompts/playground", json={**body, "parameters": {"temperature": 1}})
+    client.post("/api/v1/prompts/playground", json={**body, "use_cache": False})
+    assert len(fake_completion["calls"]) == 3
+    assert len(completion_cache) == 2
+
+def test_playground_rejects_unknown_parameters(client, test_prompt, fake_completion):
+    """Test that parameters can't override the model, messages or streaming."""
+    for parameters in ({"model": "other/model"}, {"messages": []}, {"stream": True}):
+        body = {"prompt_id": test_prompt["id"], "models": ["stub/model"], "parameters": parameters}
+        assert client.post("/api/v1/prompts/playground", json=body).status_code == 422
+        job = {**body, "variable_sets": [{}]}
+        assert client.post("/api/v1/playground/jobs/", json=job).status_code == 422
+    assert fake_completion["calls"] == []
+
+def test_playground_does_not_cache_empty_completions(client, test_prompt, monkeypatch, completion_cache):
+    """Test that a completion without message content is an error and is not cached."""
+    async def chat_completion(client, model, messages, parameters=None):
+        return {"choices": [], "usage": {"total_tokens": 0}}
+
+    monkeypatch.setattr(openrouter, "chat_completion", chat_completion)
+    body = {"prompt_id": test_prompt["id"], "models": ["stub/model"]}
+    for _ in range(2):
+        result = client.post("/api/v1/prompts/playground", json=body).json()["responses"]["stub/model"]
+        assert "without message content" in result["error"]
+    assert len(completion_cache) == 0
@@ -0,0 +1,191 @@
+import json
+import time
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.api.endpoints import playground_jobs
+from app.core.config import settings
+from app.db.models import PlaygroundJob, PlaygroundJobResult
+
+
+@pytest.fixture
+def client(threaded_client):
+    # Jobs write from worker threads while requests read
+    return threaded_client
+
+@pytest.fixture
+def template_prompt(client):
+    return client.post("/api/v1/prompts/", json={"name": "ratio", "text": "{{ name }} scores {{ 10 // n }}"}).json()
+
+def _wait_for_job(client, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/v1/playground/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+        time.sleep(0.05)
+    pytest.fail("Job did not finish in time")
+
+def test_playground_job_runs_matrix(client, template_prompt, fake_completion):
+    """Test that a job runs every variable set against every model and streams results."""
+    variable_sets = [{"name": f"user-{i}", "n": i} for i in range(5)]
+    response = client.post("/api/v1/playground/jobs/", json={
+        "prompt_id": template_prompt["id"],
+        "models": ["stub/a", "stub/b"],
+        "variable_sets": variable_sets
+    })
+    assert response.status_code == 202
+    assert response.json()["total"] == 10
+    
+    job = _wait_for_job(client, response.json()["id"])
+    assert job["status"] == "completed"
+    assert job["completed"] == 8
+    assert job["failed"] == 2
+    assert len(fake_completion["calls"]) == 8
+    
+    response = client.get(f"/api/v1/playground/jobs/{job['id']}/results")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert len(results) == 10
+    by_key = {(r["row_index"], r["model"]): r for r in results}
+    assert by_key[(2, "stub/b")]["response"] == "stub/b: user-2 scores 5"
+    assert by_key[(2, "stub/b")]["variables"] == variable_sets[2]
+    assert by_key[(0, "stub/a")]["error"].startswith("Error processing variables")
+
+def test_playground_job_resumes_unfinished_items(client, file_engine, template_prompt, fake_completion):
+    """Test that resuming a job only runs the items without a result."""
+    job = PlaygroundJob(
+        prompt_id=template_prompt["id"], version=1, models=["stub/a"],
+        variable_sets=[{"name": "a", "n": 1}, {"name": "b", "n": 2}, {"name": "c", "n": 5}],
+        system_message="You are a helpful AI assistant.", use_cache=False, status="running"
+    )
+    with Session(file_engine) as db:
+        db.add(job)
+        db.flush()
+        db.add(PlaygroundJobResult(job_id=job.id, row_index=1, model="stub/a", response="kept"))
+        db.commit()
+        job_id = job.id
+    
+    client.portal.call(playground_jobs.resume_jobs, file_engine)
+    finished = _wait_for_job(client, job_id)
+    
+    assert finished["completed"] == 3
+    assert sorted(messages[-1]["content"] for _, messages, _ in fake_completion["calls"]) == ["a scores 10", "c scores 2"]
+    results = client.get(f"/api/v1/playground/jobs/{job_id}/results").text.splitlines()
+    assert json.loads(results[0])["response"] == "kept"
+
+def test_playground_job_limits(client, template_prompt, monkeypatch):
+    """Test that unknown jobs, missing prompts and oversized jobs are rejected."""
+    monkeypatch.setattr(settings, "PLAYGROUND_JOB_MAX_ITEMS", 3)
+    body = {"prompt_id": template_prompt["id"], "models": ["stub/a", "stub/b"], "variable_sets": [{}, {}]}
+    assert client.post("/api/v1/playground/jobs/", json=body).status_code == 413
+    assert client.post("/api/v1/playground/jobs/", json={**body, "prompt_id": 999, "variable_sets": [{}]}).status_code == 404
+    assert client.get("/api/v1/playground/jobs/999").status_code == 404
+
+def test_playground_job_fails_when_results_cannot_be_written(client, template_prompt, fake_completion, monkeypatch):
+    """Test that a writer error fails the job and stops further upstream calls."""
+    from sqlalchemy.exc import OperationalError
+
+    def insert_results(session_factory, job_id, results):
+        raise OperationalError("INSERT INTO playground_job_results", {}, Exception("disk I/O error"))
+    
+    monkeypatch.setattr(playground_jobs, "_insert_results", insert_results)
+    monkeypatch.setattr(settings, "PLAYGROUND_JOB_CONCURRENCY", 2)
+    response = client.post("/api/v1/playground/jobs/", json={
+        "prompt_id": template_prompt["id"],
+        "models": ["stub/a"],
+        "variable_sets": [{"name": f"user-{i}", "n": 1} for i in range(50)]
+    })
+    
+    job = _wait_for_job(client, response.json()["id"])
+    assert job["status"] == "failed"
+    assert job["error"].startswith("OperationalError")
+    assert job["finished_at"] is not None
+    assert len(fake_completion["calls"]) < 10
+
+def test_resumed_jobs_are_claimed_once(client, file_engine, template_prompt, fake_completion):
+    """Test that repeated resumes run each job once and skip jobs with a live owner."""
+    import datetime
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    jobs = {
+        owner: PlaygroundJob(
+            prompt_id=template_prompt["id"], version=1, models=["stub/a"],
+            variable_sets=[{"name": owner, "n": 1}], system_message="You are a helpful AI assistant.",
+            use_cache=False, status="running", owner=owner, heartbeat_at=heartbeat
+        )
+        for owner, heartbeat in [("released", None), ("dead", now - datetime.timedelta(hours=1)), ("alive", now)]
+    }
+    jobs["released"].owner = None
+    with Session(file_engine) as db:
+        db.add_all(jobs.values())
+        db.commit()
+        ids = {owner: job.id for owner, job in jobs.items()}
+    
+    # A second worker starting up finds every job already claimed
+    client.portal.call(playground_jobs.resume_jobs, file_engine)
+    client.portal.call(playground_jobs.resume_jobs, file_engine)
+    assert _wait_for_job(client, ids["released"])["status"] == "completed"
+    assert _wait_for_job(client, ids["dead"])["status"] == "completed"
+    
+    assert sorted(messages[-1]["content"] for _, messages, _ in fake_completion["calls"]) == ["dead scores 10", "released scores 10"]
+    assert client.get(f"/api/v1/playground/jobs/{ids['alive']}").json()["status"] == "running"
+
+def test_job_cancelled_by_another_process_stops(client, template_prompt, fake_completion, monkeypatch):
+    """Test that the owner stops a job cancelled by a process that does not run it."""
+    monkeypatch.setattr(settings, "PLAYGROUND_JOB_STALE_AFTER", 0.3)
+    monkeypatch.setattr(settings, "PLAYGROUND_JOB_CONCURRENCY", 1)
+    fake_completion["delay"] = 0.05
+    response = client.post("/api/v1/playground/jobs/", json={
+        "prompt_id": template_prompt["id"],
+        "models": ["stub/a"],
+        "variable_sets": [{"name": f"user-{i}", "n": 1} for i in range(100)]
+    })
+    job_id = response.json()["id"]
+    task = playground_jobs._tasks[job_id]
+    deadline = time.monotonic() + 2
+    while not fake_completion["calls"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    
+    # The cancelling process does not own the job, so it has no task to stop
+    with monkeypatch.context() as m:
+        m.setattr(playground_jobs, "_tasks", {})
+        cancelled = client.delete(f"/api/v1/playground/jobs/{job_id}").json()
+    assert cancelled["status"] == "cancelled"
+    
+    deadline = time.monotonic() + 2
+    while not task.done() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert task.cancelled()
+    calls = len(fake_completion["calls"])
+    time.sleep(0.2)
+    assert len(fake_completion["calls"]) == calls < 100
+    job = client.get(f"/api/v1/playground/jobs/{job_id}").json()
+    assert job["status"] == "cancelled"
+    assert job["finished_at"] == cancelled["finished_at"]
+
+def test_following_results_of_an_orphaned_job_ends(client, file_engine, template_prompt, monkeypatch):
+    """Test that following a job whose owner died ends once nobody takes it over."""
+    import datetime
+
+    monkeypatch.setattr(settings, "PLAYGROUND_JOB_STALE_AFTER", 0.3)
+    monkeypatch.setattr(playground_jobs, "RESULTS_POLL_INTERVAL", 0.05)
+    job = PlaygroundJob(
+        prompt_id=template_prompt["id"], version=1, models=["stub/a"],
+        variable_sets=[{"name": "a", "n": 1}, {"name": "b", "n": 2}],
+        system_message="You are a helpful AI assistant.", use_cache=False, status="running",
+        owner="dead", heartbeat_at=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1)
+    )
+    with Session(file_engine) as db:
+        db.add(job)
+        db.flush()
+        db.add(PlaygroundJobResult(job_id=job.id, row_index=0, model="stub/a", response="kept"))
+        db.commit()
+        job_id = job.id
+    
+    started = time.monotonic()
+    response = client.get(f"/api/v1/playground/jobs/{job_id}/results", params={"follow": True})
+    assert time.monotonic() - started < 3
+    assert [json.loads(line)["response"] for line in response.text.splitlines()] == ["kept"]
+    assert client.get(f"/api/v1/playground/jobs/{job_id}").json()["status"] == "running"
@@ -1,6 +1,9 @@
 import pytest
 from fastapi.testclient import TestClient
+import json
 from app.main import app
+from app.core.cache import get_prompt_cache
+from app.core.config import settings
 from app.db.models import Prompt, Tag, PromptVersion
 
 @pytest.fixture
@@ -149,4 +152,666 @@ def test_delete_prompt(client, test_prompt_data):
     
     # Verify prompt is deleted
     get_response = client.get(f"/api/v1/prompts/{prompt_id}")
-    assert get_response.status_code == 404 
\ No newline at end of file
+    assert get_response.status_code == 404 
+
+
+def test_list_prompts_cursor_pagination(client, test_prompt_data):
+    """Test walking the prompt list with keyset cursors."""
+    for i in range(5):
+        prompt_data = test_prompt_data.copy()
+        prompt_data["name"] = f"test-prompt-{i}"
+        client.post("/api/v1/prompts/", json=prompt_data)
+    
+    seen = []
+    response = client.get("/api/v1/prompts/?limit=2")
+    while True:
+        assert response.status_code == 200
+        seen.extend(prompt["name"] for prompt in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        response = client.get(f"/api/v1/prompts/?limit=2&cursor={cursor}")
+    
+    assert seen == [f"test-prompt-{i}" for i in range(5)]
+    
+    # Prompts inserted mid-scan do not shift the remaining pages
+    response = client.get("/api/v1/prompts/?limit=2")
+    cursor = response.headers["X-Next-Cursor"]
+    prompt_data = test_prompt_data.copy()
+    prompt_data["name"] = "test-prompt-late"
+    client.post("/api/v1/prompts/", json=prompt_data)
+    response = client.get(f"/api/v1/prompts/?limit=2&cursor={cursor}")
+    assert [p["name"] for p in response.json()] == ["test-prompt-2", "test-prompt-3"]
+    
+    # The cursor travels in a documented header, not in the body
+    openapi = client.get("/api/v1/openapi.json").json()
+    for path in ("/api/v1/prompts/", "/api/v1/prompts/{prompt_id}/versions"):
+        assert "X-Next-Cursor" in openapi["paths"][path]["get"]["responses"]["200"]["headers"]
+
+
+def test_list_prompts_invalid_cursor(client):
+    """Test that a malformed cursor is rejected."""
+    response = client.get("/api/v1/prompts/?cursor=not-a-cursor")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_list_prompts_sparse_fields_and_includes(client, record_statements, test_prompt_data):
+    """Test that listings only return and load what was asked for."""
+    for i in range(5):
+        prompt_data = test_prompt_data.copy()
+        prompt_data["name"] = f"test-prompt-{i}"
+        client.post("/api/v1/prompts/", json=prompt_data)
+    
+    # Default listing leaves relationships out
+    data = client.get("/api/v1/prompts/").json()
+    assert "tags" not in data[0] and "versions" not in data[0]
+    assert data[0]["text"] == test_prompt_data["text"]
+    
+    data = client.get("/api/v1/prompts/?fields=name,version").json()
+    assert set(data[0]) == {"id", "name", "version"}
+    
+    with record_statements() as statements:
+        response = client.get("/api/v1/prompts/?include=tags,versions")
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 5
+    assert {tag["name"] for tag in data[0]["tags"]} == set(test_prompt_data["tags"])
+    assert [v["version"] for v in data[0]["versions"]] == [1]
+    # One query for prompts, one per included relationship
+    assert len(statements) == 3
+    
+    response = client.get("/api/v1/prompts/?include=owner")
+    assert response.status_code == 400
+
+
+def test_fulltext_search(client, test_prompt_data):
+    """Test ranked full-text search across text, description and tags."""
+    prompts = [
+        ("summarizer", "Summarize the following article in three bullet points.", "News digests", ["writing"]),
+        ("translator", "Translate the text into French.", "Summarize nothing", ["language"]),
+        ("coder", "Write a Python function.", "Code helper", ["summarize-free"]),
+    ]
+    ids = {}
+    for name, text, description, tags in prompts:
+        response = client.post("/api/v1/prompts/", json={
+            "name": name, "text": text, "description": description, "tags": tags
+        })
+        ids[name] = response.json()["id"]
+    
+    response = client.get("/api/v1/prompts/?search=summarize&search_mode=fulltext")
+    assert response.status_code == 200
+    data = response.json()
+    assert [p["name"] for p in data][:1] == ["summarizer"]
+    assert {p["name"] for p in data} == {"summarizer", "translator", "coder"}
+    assert "<mark>" in data[0]["snippet"]
+    assert data[0]["score"] >= data[-1]["score"]
+    
+    # Tags are searchable too
+    data = client.get("/api/v1/prompts/?search=language&search_mode=fulltext").json()
+    assert [p["name"] for p in data] == ["translator"]
+    
+    # The index follows updates and deletes
+    client.put(f"/api/v1/prompts/{ids['coder']}", json={"text": "Write idiomatic Rust."})
+    data = client.get("/api/v1/prompts/?search=rust&search_mode=fulltext").json()
+    assert [p["name"] for p in data] == ["coder"]
+    assert client.get("/api/v1/prompts/?search=python&search_mode=fulltext").json() == []
+    
+    client.delete(f"/api/v1/prompts/{ids['coder']}")
+    assert client.get("/api/v1/prompts/?search=rust&search_mode=fulltext").json() == []
+    
+    # Snippets are HTML-escaped around the <mark> tags
+    client.post("/api/v1/prompts/", json={"name": "html", "text": "Render <b>bold</b> & <script>escape</script>"})
+    [hit] = client.get("/api/v1/prompts/?search=escape&search_mode=fulltext").json()
+    assert hit["snippet"] == "Render &lt;b&gt;bold&lt;/b&gt; &amp; &lt;script&gt;<mark>escape</mark>&lt;/script&gt;"
+
+
+def test_fulltext_search_pagination(client, test_prompt_data):
+    """Test that full-text results can be paged through with cursors."""
+    for i in range(3):
+        client.post("/api/v1/prompts/", json={"name": f"alpha-{i}", "text": "alpha beta"})
+    
+    names = []
+    response = client.get("/api/v1/prompts/?search=alpha&search_mode=fulltext&limit=2")
+    names.extend(p["name"] for p in response.json())
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(f"/api/v1/prompts/?search=alpha&search_mode=fulltext&limit=2&cursor={cursor}")
+    names.extend(p["name"] for p in response.json())
+    assert sorted(names) == ["alpha-0", "alpha-1", "alpha-2"]
+
+
+def test_bulk_create_prompts(client, record_statements, test_prompt_data):
+    """Test creating many prompts in one request with a fixed number of queries."""
+    client.post("/api/v1/prompts/", json=test_prompt_data)
+    payload = [
+        {"name": f"bulk-{i}", "text": f"Bulk text {i}", "tags": ["bulk", f"group-{i % 3}"]}
+        for i in range(50)
+    ]
+    payload.append(test_prompt_data)
+    payload.append({"name": "bulk-0", "text": "Repeated name"})
+    
+    with record_statements() as statements:
+        response = client.post("/api/v1/prompts/bulk", json=payload)
+    
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["status"] for r in results] == ["created"] * 50 + ["error", "error"]
+    assert results[50]["detail"] == "A prompt with this name already exists"
+    assert results[51]["detail"] == "Duplicate name in request"
+    assert len(statements) < 15
+    
+    prompt = client.get(f"/api/v1/prompts/{results[4]['id']}").json()
+    assert prompt["name"] == "bulk-4"
+    assert {tag["name"] for tag in prompt["tags"]} == {"bulk", "group-1"}
+    assert [v["version"] for v in prompt["versions"]] == [1]
+
+
+def test_bulk_upsert_prompts(client, test_prompt_data):
+    """Test that upsert bumps the version of existing prompts."""
+    created = client.post("/api/v1/prompts/", json=test_prompt_data).json()
+    
+    response = client.post("/api/v1/prompts/bulk?upsert=true", json=[
+        {"name": test_prompt_data["name"], "text": "Upserted text", "tags": ["new-tag"]},
+        {"name": "fresh-prompt", "text": "Fresh text"}
+    ])
+    assert response.status_code == 200
+    updated, fresh = response.json()
+    assert updated == {
+        "index": 0, "name": test_prompt_data["name"], "status": "updated",
+        "id": created["id"], "version": 2, "detail": None
+    }
+    assert fresh["status"] == "created"
+    
+    prompt = client.get(f"/api/v1/prompts/{created['id']}").json()
+    assert prompt["text"] == "Upserted text"
+    assert [tag["name"] for tag in prompt["tags"]] == ["new-tag"]
+    assert [v["version"] for v in prompt["versions"]] == [1, 2]
+
+
+def test_export_import_roundtrip(client, db_session, test_prompt_data, monkeypatch):
+    """Test that an NDJSON export can be imported into an empty catalog."""
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 2)
+    for i in range(5):
+        prompt_data = test_prompt_data.copy()
+        prompt_data["name"] = f"test-prompt-{i}"
+        client.post("/api/v1/prompts/", json=prompt_data)
+    prompt_id = client.get("/api/v1/prompts/?fields=name").json()[0]["id"]
+    client.put(f"/api/v1/prompts/{prompt_id}", json={"text": "Second version"})
+    
+    response = client.get("/api/v1/prompts/export?include_versions=true")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["name"] for line in lines] == [f"test-prompt-{i}" for i in range(5)]
+    assert sorted(lines[0]["tags"]) == sorted(test_prompt_data["tags"])
+    assert [v["text"] for v in lines[0]["versions"]] == [test_prompt_data["text"], "Second version"]
+    
+    for i in range(5):
+        client.delete(f"/api/v1/prompts/{prompt_id + i}")
+    
+    body = response.text + "not json\n" + json.dumps({"name": "test-prompt-0", "text": "dupe"})
+    response = client.post("/api/v1/prompts/import", content=body)
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["created"] == 5
+    assert summary["failed"] == 2
+    assert [error["line"] for error in summary["errors"]] == [6, 7]
+    assert summary["errors"][1]["detail"] == "A prompt with this name already exists"
+    
+    restored = client.get("/api/v1/prompts/?include=tags,versions").json()
+    assert restored[0]["version"] == 2
+    assert [v["text"] for v in restored[0]["versions"]] == [test_prompt_data["text"], "Second version"]
+    assert sorted(tag["name"] for tag in restored[0]["tags"]) == sorted(test_prompt_data["tags"])
+
+
+def test_export_import_keeps_version_without_history(client, test_prompt):
+    """Test that a prompt exported without its history is imported at its current version."""
+    client.put(f"/api/v1/prompts/{test_prompt['id']}", json={"text": "Second version"})
+    client.put(f"/api/v1/prompts/{test_prompt['id']}", json={"text": "Third version"})
+    exported = client.get("/api/v1/prompts/export").text
+    assert json.loads(exported)["version"] == 3
+    assert not json.loads(exported).get("versions")
+    
+    client.delete(f"/api/v1/prompts/{test_prompt['id']}")
+    summary = client.post("/api/v1/prompts/import", content=exported).json()
+    assert summary["created"] == 1
+    
+    restored = client.get("/api/v1/prompts/?include=versions").json()[0]
+    assert restored["version"] == 3
+    assert restored["text"] == "Third version"
+    assert [v["version"] for v in restored["versions"]] == [3]
+
+
+def test_get_prompt_is_cached_with_etag(client, record_statements, test_prompt_data):
+    """Test that cached prompts skip the database and honor If-None-Match."""
+    prompt_id = client.post("/api/v1/prompts/", json=test_prompt_data).json()["id"]
+    response = client.get(f"/api/v1/prompts/{prompt_id}")
+    etag = response.headers["ETag"]
+    
+    with record_statements() as statements:
+        assert client.get(f"/api/v1/prompts/{prompt_id}").json() == response.json()
+        response = client.get(f"/api/v1/prompts/{prompt_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert statements == []
+    
+    # Writes invalidate the cached copy
+    client.put(f"/api/v1/prompts/{prompt_id}", json={"text": "Changed"})
+    response = client.get(f"/api/v1/prompts/{prompt_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["text"] == "Changed"
+    assert response.headers["ETag"] != etag
+    
+    client.delete(f"/api/v1/prompts/{prompt_id}")
+    assert client.get(f"/api/v1/prompts/{prompt_id}").status_code == 404
+
+
+def test_update_during_cache_miss_is_not_cached(client, monkeypatch, test_prompt):
+    """Test that a body read before a concurrent update is not written back into the cache."""
+    from app.api.endpoints import prompts
+    from app.schemas.prompt import PromptUpdate
+
+    serialize = prompts._serialize_prompt
+    
+    def serialize_then_update(db, prompt_id):
+        body = serialize(db, prompt_id)
+        monkeypatch.setattr(prompts, "_serialize_prompt", serialize)
+        # Another request commits an update after this read but before the cache write
+        prompts._update_prompt(db, prompt_id, PromptUpdate(text="Updated meanwhile"))
+        prompts._invalidate_prompts([prompt_id])
+        return body
+    
+    monkeypatch.setattr(prompts, "_serialize_prompt", serialize_then_update)
+    stale = client.get(f"/api/v1/prompts/{test_prompt['id']}")
+    assert stale.json()["text"] == test_prompt["text"]
+    
+    fresh = client.get(f"/api/v1/prompts/{test_prompt['id']}")
+    assert fresh.json()["text"] == "Updated meanwhile"
+    assert fresh.headers["ETag"] != stale.headers["ETag"]
+
+
+def test_pool_stats_endpoint(client):
+    """Test reading connection pool statistics."""
+    response = client.get("/api/v1/admin/db/pool")
+    assert response.status_code == 200
+    stats = response.json()["sync"]
+    for key in ("checkouts", "checkins", "timeouts", "wait_seconds_avg", "status"):
+        assert key in stats
+
+
+def test_metrics_endpoint(client, test_prompt):
+    """Test that requests are reported by route template with their database use."""
+    from prometheus_client import REGISTRY
+
+    labels = {"method": "GET", "route": "/api/v1/prompts/{prompt_id}", "status": "200"}
+    before = REGISTRY.get_sample_value("http_requests_total", labels) or 0
+    queries_before = REGISTRY.get_sample_value("http_request_db_queries_sum", {"route": labels["route"]}) or 0
+    get_prompt_cache().clear()
+    assert client.get(f"/api/v1/prompts/{test_prompt['id']}").status_code == 200
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/api/v1/prompts/{prompt_id}"' in response.text
+    assert "db_pool_checkouts_total" in response.text
+    assert REGISTRY.get_sample_value("http_requests_total", labels) == before + 1
+    assert REGISTRY.get_sample_value("http_request_db_queries_sum", {"route": labels["route"]}) > queries_before
+
+
+def test_metrics_route_labels(client, test_prompt):
+    """Test route labels when path parameters repeat and when no route matches."""
+    from prometheus_client import REGISTRY
+
+    def count(route, status):
+        return REGISTRY.get_sample_value("http_requests_total", {"method": "GET", "route": route, "status": status}) or 0
+
+    versions = "/api/v1/prompts/{prompt_id}/versions/{version_number}"
+    before = count(versions, "200"), count("<unmatched>", "404")
+    prompt_id = test_prompt["id"]
+    client.put(f"/api/v1/prompts/{prompt_id}", json={"text": "Second version"})
+    for number in range(1, prompt_id + 2):
+        client.put(f"/api/v1/prompts/{prompt_id}", json={"text": f"Version {number + 2}"})
+    
+    # The prompt id and the version number are the same value
+    assert client.get(f"/api/v1/prompts/{prompt_id}/versions/{prompt_id}").status_code == 200
+    assert client.get("/no/such/route").status_code == 404
+    assert count(versions, "200") == before[0] + 1
+    assert count("<unmatched>", "404") == before[1] + 1
+
+
+def _long_prompt_text(revision: int) -> str:
+    lines = [f"Rule {i}: answer precisely and cite the relevant section {i}." for i in range(600)]
+    lines[revision * 7 % 600] = f"Rule changed in revision {revision}."
+    return "\n".join(lines) + "\n"
+
+
+def test_delta_version_storage(client, db_session, monkeypatch):
+    """Test that delta storage shrinks version history and reconstructs every version."""
+    import time
+    from app.db.delta import text_cache
+    from app.db.models import PromptVersion as PromptVersionModel
+
+    monkeypatch.setattr(settings, "PROMPT_VERSION_STORAGE", "delta")
+    monkeypatch.setattr(settings, "PROMPT_VERSION_KEYFRAME_INTERVAL", 5)
+    created = client.post("/api/v1/prompts/", json={"name": "long", "text": _long_prompt_text(0)}).json()
+    for revision in range(1, 12):
+        client.put(f"/api/v1/prompts/{created['id']}", json={"text": _long_prompt_text(revision)})
+    
+    rows = db_session.query(PromptVersionModel).order_by(PromptVersionModel.id).all()
+    assert [row.version for row in rows if row.delta is None] == [1, 6, 11]
+    stored = sum(len(row.text) if row.delta is None else len(json.dumps(row.delta)) for row in rows)
+    full = sum(len(_long_prompt_text(revision)) for revision in range(12))
+    assert stored < full / 3
+    
+    text_cache.clear()
+    db_session.expire_all()
+    for revision in range(12):
+        started = time.perf_counter()
+        response = client.get(f"/api/v1/prompts/{created['id']}/versions/{revision + 1}")
+        assert time.perf_counter() - started < 0.5
+        assert response.json()["text"] == _long_prompt_text(revision)
+    assert len(text_cache) == 9
+
+
+def test_delta_storage_import_history(client, db_session, monkeypatch):
+    """Test that imported histories are stored as keyframes and deltas."""
+    from app.db.models import PromptVersion as PromptVersionModel
+
+    monkeypatch.setattr(settings, "PROMPT_VERSION_STORAGE", "delta")
+    monkeypatch.setattr(settings, "PROMPT_VERSION_KEYFRAME_INTERVAL", 3)
+    versions = [{"version": i + 1, "text": _long_prompt_text(i)} for i in range(7)]
+    line = {"name": "imported", "text": versions[-1]["text"], "version": 7, "versions": versions}
+    assert client.post("/api/v1/prompts/import", content=json.dumps(line)).json()["created"] == 1
+    
+    rows = db_session.query(PromptVersionModel).order_by(PromptVersionModel.version).all()
+    assert [row.version for row in rows if row.delta is None] == [1, 4, 7]
+    assert [row.text for row in rows] == [version["text"] for version in versions]
+    
+    exported = json.loads(client.get("/api/v1/prompts/export?include_versions=true").text)
+    assert [v["text"] for v in exported["versions"]] == [version["text"] for version in versions]
+
+
+def test_noop_update_writes_nothing(client, record_statements, test_prompt):
+    """Test that an update repeating the current content keeps the version."""
+    with record_statements(writes_only=True) as statements:
+        response = client.put(f"/api/v1/prompts/{test_prompt['id']}", json={
+            "text": test_prompt["text"],
+            "description": test_prompt["description"],
+            "meta": dict(reversed(list(test_prompt["meta"].items()))),
+            "tags": [tag["name"] for tag in test_prompt["tags"]]
+        })
+    
+    assert response.status_code == 200
+    assert response.json()["version"] == 1
+    assert len(response.json()["versions"]) == 1
+    assert statements == []
+
+
+def test_tag_only_update_keeps_version(client, test_prompt):
+    """Test that editing only tags does not create a version."""
+    response = client.put(f"/api/v1/prompts/{test_prompt['id']}", json={"tags": ["retagged"]})
+    assert response.status_code == 200
+    prompt = response.json()
+    assert [tag["name"] for tag in prompt["tags"]] == ["retagged"]
+    assert prompt["version"] == 1
+    assert [v["version"] for v in prompt["versions"]] == [1]
+
+
+def test_identical_bodies_share_a_blob(client, db_session):
+    """Test that versions with the same text point at one stored blob."""
+    from app.db.models import PromptBlob, PromptVersion as PromptVersionModel
+
+    first = client.post("/api/v1/prompts/", json={"name": "first", "text": "Shared body"}).json()
+    client.post("/api/v1/prompts/bulk", json=[{"name": "second", "text": "Shared body"}])
+    client.put(f"/api/v1/prompts/{first['id']}", json={"text": "Edited body"})
+    client.put(f"/api/v1/prompts/{first['id']}", json={"text": "Shared body"})
+    
+    assert db_session.query(PromptBlob).count() == 2
+    versions = db_session.query(PromptVersionModel).all()
+    assert len(versions) == 4
+    assert len({version.blob_id for version in versions if version.text == "Shared body"}) == 1
+    assert len({version.content_hash for version in versions}) == 2
+    assert client.get(f"/api/v1/prompts/{first['id']}/versions/3").json()["text"] == "Shared body"
+
+
+def test_blob_written_concurrently_is_reused(client, db_session, monkeypatch):
+    """Test that a blob stored by another writer between lookup and insert is reused."""
+    from sqlalchemy import insert
+    from app.db import versioning
+    from app.db.models import PromptBlob
+
+    insert_blobs = versioning._insert_blobs
+
+    def insert_after_other_writer(db, rows):
+        # The other transaction stores the same texts first
+        db.execute(insert(PromptBlob), rows)
+        insert_blobs(db, rows)
+
+    monkeypatch.setattr(versioning, "_insert_blobs", insert_after_other_writer)
+    first = client.post("/api/v1/prompts/", json={"name": "first", "text": "Raced body"})
+    assert first.status_code == 200
+    bulk = client.post("/api/v1/prompts/bulk", json=[{"name": "second", "text": "Other raced body"}])
+    assert bulk.json()[0]["status"] == "created"
+    update = client.put(f"/api/v1/prompts/{first.json()['id']}", json={"text": "Edited raced body"})
+    assert update.status_code == 200
+    
+    assert db_session.query(PromptBlob).count() == 3
+    assert client.get(f"/api/v1/prompts/{first.json()['id']}/versions/2").json()["text"] == "Edited raced body"
+
+
+def test_version_history_pagination(client, test_prompt):
+    """Test paging through version history and the text-free summary mode."""
+    for i in range(4):
+        client.put(f"/api/v1/prompts/{test_prompt['id']}", json={"text": f"Revision {i}"})
+    
+    response = client.get(f"/api/v1/prompts/{test_prompt['id']}/versions?limit=2")
+    assert response.status_code == 200
+    assert [v["version"] for v in response.json()] == [1, 2]
+    assert response.json()[1]["text"] == "Revision 0"
+    
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "summary": "true"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(f"/api/v1/prompts/{test_prompt['id']}/versions", params=params)
+        assert all("text" not in version and version["content_hash"] for version in response.json())
+        seen.extend(version["version"] for version in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == [1, 2, 3, 4, 5]
+    
+    assert client.get("/api/v1/prompts/999/versions").status_code == 404
+
+
+def test_version_diff(client, test_prompt):
+    """Test unified and word-level diffs between versions, served from cache."""
+    from app.core.diffing import diff_cache
+
+    client.put(f"/api/v1/prompts/{test_prompt['id']}", json={"text": "This is a revised test prompt"})
+    url = f"/api/v1/prompts/{test_prompt['id']}/diff"
+    
+    response = client.get(url, params={"from": 1, "to": 2})
+    assert response.status_code == 200
+    diff = response.json()
+    assert diff["mode"] == "unified"
+    assert f"-{test_prompt['text']}" in diff["unified"]
+    assert "+This is a revised test prompt" in diff["unified"]
+    assert "segments" not in diff
+    
+    segments = client.get(url, params={"from": 1, "to": 2, "mode": "word"}).json()["segments"]
+    assert "".join(s["text"] for s in segments if s["op"] != "insert") == test_prompt["text"]
+    assert "".join(s["text"] for s in segments if s["op"] != "delete") == "This is a revised test prompt"
+    assert len(diff_cache) == 2
+    assert client.get(url, params={"from": 1, "to": 2, "mode": "word"}).json()["segments"] == segments
+    assert len(diff_cache) == 2
+    
+    assert client.get(url, params={"from": 1, "to": 9}).status_code == 404
+
+
+def test_large_word_diff_is_bounded(client):
+    """Test that word diffs of large prompts fall back to lines and finish quickly."""
+    import random
+    import time
+
+    rng = random.Random(0)
+    words = [rng.choice(["alpha", "beta", "gamma", "the", "a", "of"]) for _ in range(8000)]
+    old = "\n".join(" ".join(words[i:i + 10]) for i in range(0, len(words), 10))
+    new = "\n".join(" ".join(rng.sample(words[i:i + 10], 10)) for i in range(0, len(words), 10))
+    prompt = client.post("/api/v1/prompts/", json={"name": "large", "text": old}).json()
+    client.put(f"/api/v1/prompts/{prompt['id']}", json={"text": new + "\nextra"})
+    
+    started = time.perf_counter()
+    response = client.get(f"/api/v1/prompts/{prompt['id']}/diff", params={"from": 1, "to": 2, "mode": "word"})
+    assert time.perf_counter() - started < 2
+    segments = response.json()["segments"]
+    assert "".join(s["text"] for s in segments if s["op"] != "insert") == old
+    assert "".join(s["text"] for s in segments if s["op"] != "delete") == new + "\nextra"
+
+
+def test_multi_tag_filter(client):
+    """Test filtering by several tags with match=all and match=any."""
+    for name, tags in [("a", ["red", "blue"]), ("b", ["red"]), ("c", ["blue", "green"]), ("d", [])]:
+        client.post("/api/v1/prompts/", json={"name": name, "text": name, "tags": tags})
+    
+    def names(**params):
+        response = client.get("/api/v1/prompts/", params=params)
+        assert response.status_code == 200
+        return [prompt["name"] for prompt in response.json()]
+    
+    assert names(tags="red,blue") == ["a"]
+    assert names(tags="red,blue", match="any") == ["a", "b", "c"]
+    assert names(tags="blue,green,missing", match="any") == ["a", "c"]
+    assert names(tags="blue,missing") == []
+    assert names(tag="red", tags="blue") == ["a"]
+    assert names(tags="red,red") == ["a", "b"]
+
+
+def test_tag_counts_are_cached_until_a_write(client, record_statements):
+    """Test GET /tags counts and their invalidation on prompt writes."""
+    first = client.post("/api/v1/prompts/", json={"name": "a", "text": "a", "tags": ["red", "blue"]}).json()
+    client.post("/api/v1/prompts/", json={"name": "b", "text": "b", "tags": ["red"]})
+    
+    response = client.get("/api/v1/tags/")
+    assert response.status_code == 200
+    assert [(tag["name"], tag["prompt_count"]) for tag in response.json()] == [("red", 2), ("blue", 1)]
+    with record_statements() as statements:
+        assert client.get("/api/v1/tags/", params={"limit": 1}).json()[0]["name"] == "red"
+    assert statements == []
+    
+    client.put(f"/api/v1/prompts/{first['id']}", json={"tags": ["green"]})
+    counts = {tag["name"]: tag["prompt_count"] for tag in client.get("/api/v1/tags/").json()}
+    assert counts == {"red": 1, "green": 1}
+    counts = {tag["name"]: tag["prompt_count"] for tag in client.get("/api/v1/tags/", params={"min_count": 0}).json()}
+    assert counts == {"red": 1, "green": 1, "blue": 0}
+    
+    client.delete(f"/api/v1/prompts/{first['id']}")
+    assert [tag["name"] for tag in client.get("/api/v1/tags/").json()] == ["red"]
+
+
+def test_write_during_tag_count_is_not_cached(client, monkeypatch):
+    """Test that tag counts read before a concurrent write are not cached, and that limit must be positive."""
+    from app.api.endpoints import prompts, tags
+    from app.schemas.prompt import PromptCreate
+
+    count_tags = tags._count_tags
+    
+    def count_then_write(db):
+        counts = count_tags(db)
+        monkeypatch.setattr(tags, "_count_tags", count_tags)
+        # Another request commits a prompt after this count but before the cache write
+        prompts._create_prompt(db, PromptCreate(name="b", text="b", tags=["red"]))
+        prompts._invalidate_prompts([])
+        return counts
+    
+    client.post("/api/v1/prompts/", json={"name": "a", "text": "a", "tags": ["red"]})
+    monkeypatch.setattr(tags, "_count_tags", count_then_write)
+    assert client.get("/api/v1/tags/").json()[0]["prompt_count"] == 1
+    assert client.get("/api/v1/tags/").json()[0]["prompt_count"] == 2
+    
+    assert client.get("/api/v1/tags/", params={"limit": -1}).status_code == 422
+    assert client.get("/api/v1/tags/", params={"limit": 0}).status_code == 422
+
+
+def test_tag_cache_shares_a_backend_safely(client, monkeypatch):
+    """Test that invalidating tag counts leaves other entries of a shared backend alone."""
+    from app.core import cache as cache_module
+    from app.core.cache import LRUCache, TAG_COUNTS_KEY
+
+    shared = LRUCache(maxsize=10, ttl=60)
+    monkeypatch.setattr(cache_module, "_prompt_cache", shared)
+    monkeypatch.setattr(cache_module, "_tag_cache", shared)
+    first = client.post("/api/v1/prompts/", json={"name": "a", "text": "a", "tags": ["red"]}).json()
+    client.get(f"/api/v1/prompts/{first['id']}")
+    client.get("/api/v1/tags/")
+    assert shared.get(first["id"]) is not None and shared.get(TAG_COUNTS_KEY) is not None
+    
+    client.post("/api/v1/prompts/", json={"name": "b", "text": "b", "tags": ["red"]})
+    assert shared.get(TAG_COUNTS_KEY) is None
+    assert shared.get(first["id"]) is not None
+
+
+def test_meta_filters(client):
+    """Test meta.<path>=<value> filters on strings, numbers, booleans and nested keys."""
+    metas = [
+        {"category": "support", "priority": 2, "owner": {"team": "growth"}},
+        {"category": "support", "priority": 1, "owner": {"team": "core"}},
+        {"category": "sales", "priority": "2"},
+        None,
+    ]
+    for i, meta in enumerate(metas):
+        client.post("/api/v1/prompts/", json={"name": f"meta-{i}", "text": "text", "meta": meta})
+    
+    def names(params):
+        response = client.get("/api/v1/prompts/", params=params)
+        assert response.status_code == 200, response.text
+        return [prompt["name"] for prompt in response.json()]
+    
+    assert names({"meta.category": "support"}) == ["meta-0", "meta-1"]
+    assert names({"meta.category": "support", "meta.priority": "2"}) == ["meta-0"]
+    assert names({"meta.priority": "2"}) == ["meta-0", "meta-2"]
+    assert names({"meta.owner.team": "core"}) == ["meta-1"]
+    assert names([("meta.owner.team", "core"), ("meta.owner.team", "growth")]) == ["meta-0", "meta-1"]
+    assert names({"meta.missing": "x"}) == []
+    
+    client.post("/api/v1/prompts/", json={"name": "meta-flag", "text": "text", "meta": {"reviewed": True}})
+    assert names({"meta.reviewed": "true"}) == ["meta-flag"]
+    assert names({"meta.reviewed": "false"}) == []
+    
+    response = client.get("/api/v1/prompts/", params={"meta.category') OR 1=1 --": "x"})
+    assert response.status_code == 400
+    assert "Invalid metadata path" in response.json()["detail"]
+
+
+def test_meta_indexes(client, db_session):
+    """Test declaring, using and dropping an indexed metadata path."""
+    from sqlalchemy import text
+    from app.db.meta_index import index_name
+
+    name = index_name(["owner", "team"])
+    assert name != index_name(["owner_team"])
+    assert len(index_name(["a" * 40] * 8)) <= 63
+
+    client.post("/api/v1/prompts/", json={"name": "indexed", "text": "text", "meta": {"owner": {"team": "core"}}})
+    
+    response = client.post("/api/v1/admin/meta-indexes", json={"path": "owner.team"})
+    assert response.status_code == 201
+    assert response.json()["index_name"] == name
+    assert client.post("/api/v1/admin/meta-indexes", json={"path": "owner.team"}).status_code == 400
+    assert client.post("/api/v1/admin/meta-indexes", json={"path": "owner..team"}).status_code == 400
+    assert [index["path"] for index in client.get("/api/v1/admin/meta-indexes").json()] == ["owner.team"]
+    
+    plan = db_session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT id FROM prompts WHERE json_extract(prompts.meta, '$.owner.team') IN ('core')"
+    )).fetchall()
+    assert name in " ".join(row[-1] for row in plan)
+    assert [p["name"] for p in client.get("/api/v1/prompts/", params={"meta.owner.team": "core"}).json()] == ["indexed"]
+    
+    assert client.delete("/api/v1/admin/meta-indexes/owner.team").status_code == 200
+    assert client.delete("/api/v1/admin/meta-indexes/owner.team").status_code == 404
+    assert client.get("/api/v1/admin/meta-indexes").json() == []
+    indexes = db_session.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars().all()
+    assert name not in indexes
@@ -0,0 +1,43 @@
+import sqlite3
+
+from benchmarks.catalog import catalog_counts, generate_catalog
+from benchmarks.run import compare, run_benchmarks
+
+
+def _dump(path):
+    connection = sqlite3.connect(path)
+    try:
+        return (
+            connection.execute("SELECT id, name, text, description, version, meta FROM prompts ORDER BY id").fetchall(),
+            connection.execute("SELECT prompt_id, tag_id FROM prompt_tags ORDER BY prompt_id, tag_id").fetchall(),
+            connection.execute("SELECT prompt_id, version, content_hash FROM prompt_versions ORDER BY id").fetchall(),
+        )
+    finally:
+        connection.close()
+
+def test_catalog_generation_is_deterministic(tmp_path):
+    """Test that the same size and seed always produce the same catalog."""
+    first, second, other = (str(tmp_path / name) for name in ("a.db", "b.db", "c.db"))
+    generate_catalog(first, 60, seed=7)
+    generate_catalog(second, 60, seed=7)
+    generate_catalog(other, 60, seed=8)
+    
+    assert _dump(first) == _dump(second)
+    assert _dump(first) != _dump(other)
+    counts = catalog_counts(first)
+    assert counts["prompts"] == 60
+    assert counts["versions"] >= 60
+    assert counts["tag_links"] > 0
+
+def test_run_benchmarks_and_compare(tmp_path):
+    """Test a short benchmark run and the baseline comparison."""
+    results = run_benchmarks(50, iterations=2, data_dir=str(tmp_path), operations=["list", "get_by_id", "update"])
+    
+    assert results["catalog"]["prompts"] == 50
+    assert set(results["results"]) == {"list", "get_by_id", "update"}
+    assert all(result["p50_ms"] > 0 for result in results["results"].values())
+    
+    baseline = {"results": {name: {**result, "p50_ms": result["p50_ms"] / 2} for name, result in results["results"].items()}}
+    rows = compare(results, baseline, tolerance=0.25)
+    assert all(row["regression"] for row in rows)
+    assert not any(row["regression"] for row in compare(results, results))
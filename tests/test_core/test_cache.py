@@ -0,0 +1,64 @@
+import time
+
+import pytest
+from app.core.cache import CacheBackend, LRUCache, NullCache, create_cache_backend
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test that the LRU keeps the most recently used entries."""
+    cache = LRUCache(maxsize=2, ttl=0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_lru_cache_expires_entries():
+    """Test that entries are dropped once their TTL has passed."""
+    cache = LRUCache(maxsize=10, ttl=0.05)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_create_cache_backend():
+    """Test resolving backends by name and by module:factory path."""
+    assert isinstance(create_cache_backend("memory", maxsize=1, ttl=1), LRUCache)
+    assert isinstance(create_cache_backend("none", maxsize=1, ttl=1), NullCache)
+    
+    cache = create_cache_backend("app.core.cache:LRUCache", maxsize=5, ttl=7)
+    assert isinstance(cache, LRUCache)
+    assert (cache.maxsize, cache.ttl) == (5, 7)
+
+def test_cache_backend_requires_every_method():
+    """Test that a backend missing part of the interface can't be created."""
+    class GetOnly(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+def test_completion_cache_lru_and_ttl(tmp_path, monkeypatch):
+    """Test that the completion cache evicts least recently used and expired entries."""
+    from app.core import completion_cache
+    from app.core.completion_cache import CompletionCache, completion_key
+
+    cache = CompletionCache(str(tmp_path / "completions.db"), maxsize=2, ttl=60)
+    cache.set("a", "m", {"value": "a"})
+    cache.set("b", "m", {"value": "b"})
+    assert cache.get("a") == {"value": "a"}
+    cache.set("c", "m", {"value": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"value": "a"}
+    
+    now = completion_cache.time.time()
+    monkeypatch.setattr(completion_cache.time, "time", lambda: now + 61)
+    assert cache.get("a") is None
+    
+    assert completion_key("m", "p", "s", {"b": 1, "a": 2}) == completion_key("m", "p", "s", {"a": 2, "b": 1})
+    assert completion_key("m", "p", "s", None) != completion_key("m", "p", "t", None)
@@ -0,0 +1,141 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from app.core import openrouter
+from app.core.config import settings
+from app.core.governor import TokenBucket, governor, retry_after
+
+
+class StubUpstream:
+    """
+    Fake OpenRouter that answers after `latency` seconds, failing the first
+    `failures` calls per model with a 429, and tracks calls in flight.
+    """
+
+    def __init__(self, latency=0.01, failures=0, retry_after="0"):
+        self.latency = latency
+        self.failures = failures
+        self.retry_after = retry_after
+        self.calls = {}
+        self.in_flight = {}
+        self.max_in_flight = {}
+        self.max_total_in_flight = 0
+
+    async def __call__(self, request):
+        model = httpx.Response(200, content=request.content).json()["model"]
+        self.calls[model] = self.calls.get(model, 0) + 1
+        self.in_flight[model] = self.in_flight.get(model, 0) + 1
+        self.max_in_flight[model] = max(self.max_in_flight.get(model, 0), self.in_flight[model])
+        self.max_total_in_flight = max(self.max_total_in_flight, sum(self.in_flight.values()))
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight[model] -= 1
+        if self.calls[model] <= self.failures:
+            headers = {"Retry-After": self.retry_after} if self.retry_after is not None else {}
+            return httpx.Response(429, headers=headers, json={"error": "rate limited"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": model}}]})
+
+def _complete(upstream, models):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client:
+            return await asyncio.gather(
+                *(openrouter.chat_completion(client, model, []) for model in models),
+                return_exceptions=True
+            )
+    return asyncio.run(run())
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(settings, "UPSTREAM_RETRY_MAX_DELAY", 1.0)
+    yield
+    governor.reset()
+
+def test_retries_honor_retry_after():
+    """Test that 429s are retried after the time the upstream asks for."""
+    upstream = StubUpstream(failures=2, retry_after="0.1")
+    started = time.monotonic()
+    [result] = _complete(upstream, ["stub/a"])
+    
+    assert result["choices"][0]["message"]["content"] == "stub/a"
+    assert upstream.calls["stub/a"] == 3
+    assert time.monotonic() - started >= 0.2
+
+def test_gives_up_after_max_retries(monkeypatch):
+    """Test that a model that keeps answering 429 is reported as rate limited."""
+    monkeypatch.setattr(settings, "UPSTREAM_MAX_RETRIES", 2)
+    upstream = StubUpstream(failures=10, retry_after=None)
+    [error] = _complete(upstream, ["stub/a"])
+    
+    assert isinstance(error, httpx.HTTPStatusError)
+    assert "Rate limited" in str(error)
+    assert upstream.calls["stub/a"] == 3
+
+def test_retry_after_beyond_limit_is_not_waited_for():
+    """Test that a Retry-After longer than UPSTREAM_RETRY_MAX_DELAY fails fast."""
+    upstream = StubUpstream(failures=1, retry_after="120")
+    [error] = _complete(upstream, ["stub/a"])
+    
+    assert isinstance(error, httpx.HTTPStatusError)
+    assert upstream.calls["stub/a"] == 1
+
+def test_per_model_concurrency(monkeypatch):
+    """Test that calls in flight are capped per model and across models."""
+    monkeypatch.setattr(settings, "UPSTREAM_MODEL_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "UPSTREAM_MAX_CONCURRENCY", 3)
+    upstream = StubUpstream(latency=0.02)
+    results = _complete(upstream, ["stub/a"] * 6 + ["stub/b"] * 6)
+    
+    assert not any(isinstance(result, Exception) for result in results)
+    assert upstream.max_in_flight == {"stub/a": 2, "stub/b": 2}
+    assert upstream.max_total_in_flight == 3
+
+def test_idle_model_limits_are_evicted(monkeypatch):
+    """Test that per-model state for arbitrary model names stays bounded, keeping busy models."""
+    monkeypatch.setattr(settings, "UPSTREAM_MODEL_STATE_SIZE", 5)
+    upstream = StubUpstream()
+    
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client:
+            await openrouter.chat_completion(client, "made-up/first", [])
+            busy = governor._model_limits("made-up/busy")
+            busy.users += 1
+            await asyncio.gather(*(openrouter.chat_completion(client, f"made-up/{i}", []) for i in range(50)))
+            await openrouter.chat_completion(client, "made-up/last", [])
+            return busy
+    
+    busy = asyncio.run(run())
+    assert len(governor._models) == 5
+    assert governor._models["made-up/busy"] is busy
+    assert "made-up/last" in governor._models and "made-up/first" not in governor._models
+
+def test_rate_limit_paces_calls(monkeypatch):
+    """Test that the token bucket spreads calls out beyond the burst."""
+    monkeypatch.setattr(settings, "UPSTREAM_RATE_LIMIT", 50)
+    monkeypatch.setattr(settings, "UPSTREAM_RATE_BURST", 1)
+    upstream = StubUpstream(latency=0)
+    started = time.monotonic()
+    _complete(upstream, ["stub/a", "stub/b"] * 3)
+    
+    # One call goes at once and the other five wait 20ms each
+    assert time.monotonic() - started >= 0.09
+
+def test_retry_after_parsing():
+    """Test Retry-After given as seconds and as an HTTP date."""
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "3"})) == 3
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0
+    assert retry_after(httpx.Response(429)) is None
+
+def test_token_bucket_without_rate_never_waits():
+    """Test that a rate of 0 disables the bucket."""
+    bucket = TokenBucket(0, 1)
+    
+    async def acquire_many():
+        await asyncio.gather(*(bucket.acquire() for _ in range(100)))
+    
+    started = time.monotonic()
+    asyncio.run(acquire_many())
+    assert time.monotonic() - started < 0.05
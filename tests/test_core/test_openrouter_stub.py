@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+
+from app.core import openrouter
+from app.core.config import settings
+from app.core.governor import governor
+from app.main import app
+from benchmarks.openrouter_stub import create_app
+from benchmarks.playground_load import format_table, run_grid
+
+STUB_URL = "http://openrouter.stub"
+
+
+def _stub_client(**kwargs):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(seed=1, **kwargs)))
+
+
+def test_stub_serves_completions_and_streams(monkeypatch):
+    """Test the OpenRouter client against the stub upstream, plain and streamed."""
+    monkeypatch.setattr(settings, "OPENROUTER_BASE_URL", STUB_URL)
+    governor.reset()
+    messages = [{"role": "user", "content": "three words here"}]
+
+    async def scenario():
+        async with _stub_client(time_scale=0) as client:
+            result = await openrouter.chat_completion(client, "stub/fast", messages)
+            chunks = [chunk async for chunk in openrouter.stream_chat_completion(client, "stub/fast", messages)]
+            openrouter.set_client(client)
+            try:
+                models = await openrouter.fetch_models()
+            finally:
+                openrouter.set_client(None)
+        return result, chunks, models
+
+    result, chunks, models = asyncio.run(scenario())
+
+    assert result["usage"]["prompt_tokens"] == 3
+    assert result["usage"]["completion_tokens"] == len(result["choices"][0]["message"]["content"].split())
+    text = "".join(chunk["choices"][0]["delta"]["content"] for chunk in chunks if chunk["choices"])
+    assert len(text.split()) == chunks[-1]["usage"]["completion_tokens"]
+    assert "stub/slow" in [model["id"] for model in models["data"]]
+
+def test_stub_error_profiles(monkeypatch):
+    """Test that the stub fails at the configured rates, with Retry-After on 429s."""
+    profiles = {"always/limited": {"median": 0, "rate_limit_rate": 1.0}, "always/broken": {"median": 0, "error_rate": 1.0}}
+
+    async def scenario():
+        async with _stub_client(profiles=profiles, time_scale=0) as client:
+            limited = await client.post(f"{STUB_URL}/chat/completions", json={"model": "always/limited", "messages": []})
+            broken = await client.post(f"{STUB_URL}/chat/completions", json={"model": "always/broken", "messages": []})
+        return limited, broken
+
+    limited, broken = asyncio.run(scenario())
+
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "1"
+    assert broken.status_code == 500
+
+def test_playground_load_grid(threaded_client, monkeypatch):
+    """Test a small load grid against the app with the stub as its upstream."""
+    monkeypatch.setattr(settings, "OPENROUTER_BASE_URL", STUB_URL)
+    monkeypatch.setattr(settings, "UPSTREAM_MAX_RETRIES", 0)
+    governor.reset()
+    profiles = {"always/broken": {"median": 0, "error_rate": 1.0}}
+
+    async def scenario():
+        async with _stub_client(profiles=profiles, time_scale=0.01) as upstream:
+            openrouter.set_client(upstream)
+            try:
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as load:
+                    return await run_grid(load, [1, 3], [1, 2], ["stub/fast", "always/broken"], requests=6)
+            finally:
+                openrouter.set_client(None)
+
+    rows = asyncio.run(scenario())
+
+    assert [(row["concurrency"], row["models"]) for row in rows] == [(1, 1), (1, 2), (3, 1), (3, 2)]
+    assert all(row["requests"] == 6 for row in rows)
+    # Every two-model request includes the failing model
+    assert [row["errors"] for row in rows] == [0, 6, 0, 6]
+    assert all(row["p50_ms"] <= row["p95_ms"] <= row["p99_ms"] for row in rows)
+    assert "p99 ms" in format_table(rows)
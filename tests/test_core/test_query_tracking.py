@@ -0,0 +1,59 @@
+import logging
+
+import pytest
+from app.core.config import settings
+from app.db.instrumentation import statement_shape, track_queries
+from app.db.models import Prompt, Tag
+
+
+def test_statement_shape():
+    """Test that executions differing only in parameters share a shape."""
+    assert statement_shape("SELECT * FROM tags\n  WHERE id IN (?, ?, ?)") == "SELECT * FROM tags WHERE id IN (?)"
+    assert statement_shape("SELECT * FROM tags WHERE id IN (?)") == "SELECT * FROM tags WHERE id IN (?)"
+    assert statement_shape("SELECT anon_1.id FROM t WHERE name = 'x' LIMIT 10") == "SELECT anon_1.id FROM t WHERE name = ? LIMIT ?"
+    assert statement_shape("SELECT x FROM t WHERE a = %(a_1)s AND b = :b AND c = $1") == "SELECT x FROM t WHERE a = ? AND b = ? AND c = ?"
+
+def test_lazy_loads_in_a_loop_are_flagged(db_session):
+    """Test that one lazy load per row shows up as a repeated statement."""
+    for i in range(6):
+        db_session.add(Prompt(name=f"p{i}", text="t", version=1, tags=[Tag(name=f"t{i}")]))
+    db_session.commit()
+    db_session.expire_all()
+    
+    with track_queries() as stats:
+        for prompt in db_session.query(Prompt).all():
+            prompt.tags
+    
+    repeated = stats.repeated_statements(5)
+    assert stats.queries == 7
+    assert list(repeated.values()) == [6]
+    assert "prompt_tags" in next(iter(repeated))
+
+@pytest.fixture
+def debug_mode(monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG", True)
+
+def test_query_headers_and_no_n_plus_one_in_list(client, debug_mode, caplog):
+    """Test the debug headers and that listing with includes stays at a fixed query count."""
+    for i in range(15):
+        client.post("/api/v1/prompts/", json={"name": f"prompt-{i}", "text": "t", "tags": [f"tag-{i}", "shared"]})
+    
+    with caplog.at_level(logging.WARNING, logger="app.core.query_tracking"):
+        response = client.get("/api/v1/prompts/?include=tags,versions&limit=15")
+    
+    assert response.status_code == 200
+    assert len(response.json()) == 15
+    assert 0 < int(response.headers["X-DB-Queries"]) <= 5
+    assert float(response.headers["X-DB-Time"]) >= 0
+    assert "Probable N+1" not in caplog.text
+
+def test_headers_only_in_debug_mode(client):
+    response = client.get("/api/v1/prompts/")
+    assert "X-DB-Queries" not in response.headers
+
+def test_slow_queries_are_logged(client, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "DB_SLOW_QUERY_MS", 1e-9)
+    with caplog.at_level(logging.WARNING, logger="app.db.instrumentation"):
+        client.get("/api/v1/prompts/")
+    assert "Slow query" in caplog.text
+    assert "in GET /api/v1/prompts/" in caplog.text
@@ -61,4 +61,81 @@ def test_database_schema():
         
         db.close()
     except Exception as e:
-        pytest.fail(f"Database schema check failed: {e}") 
\ No newline at end of file
+        pytest.fail(f"Database schema check failed: {e}") 
+
+
+def test_sqlite_engine_profile(tmp_path):
+    """Test that file SQLite engines get the configured pragmas and a timed pool."""
+    from sqlalchemy import create_engine
+    from app.db.pool import TimedQueuePool, get_pool_stats, pool_stats
+    from app.db.session import configure_engine, engine_options
+
+    url = f"sqlite:///{tmp_path / 'profile.db'}"
+    profile_engine = create_engine(url, **engine_options(url))
+    configure_engine(profile_engine, "profile-test")
+    try:
+        assert isinstance(profile_engine.pool, TimedQueuePool)
+        with profile_engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == settings.SQLITE_JOURNAL_MODE.lower()
+            assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == settings.SQLITE_BUSY_TIMEOUT
+            assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == settings.SQLITE_CACHE_SIZE
+        with profile_engine.connect():
+            pass
+
+        stats = get_pool_stats()["profile-test"]
+        assert stats["checkouts"] == 2
+        assert stats["checkins"] == 2
+        assert stats["timeouts"] == 0
+        assert stats["checkedout"] == 0
+        assert stats["wait_seconds_max"] >= 0
+    finally:
+        pool_stats.pop("profile-test", None)
+        profile_engine.dispose()
+
+
+def test_memory_sqlite_keeps_default_pool():
+    """Test that in-memory SQLite URLs are not given a queue pool."""
+    from app.db.session import engine_options
+
+    assert "poolclass" not in engine_options("sqlite://")
+    assert "poolclass" not in engine_options("sqlite:///:memory:")
+    assert engine_options("postgresql://u:p@db/hub")["pool_size"] == settings.DB_POOL_SIZE
+
+
+def test_create_all_adds_missing_indexes(tmp_path):
+    """Test that create_all adds model indexes missing from an existing table."""
+    from sqlalchemy import create_engine, inspect
+    from app.db.base_class import Base
+
+    old_engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    try:
+        with old_engine.begin() as connection:
+            connection.exec_driver_sql("CREATE TABLE prompt_tags (prompt_id INTEGER, tag_id INTEGER)")
+        Base.metadata.create_all(bind=old_engine)
+        indexes = {index["name"]: index["column_names"] for index in inspect(old_engine).get_indexes("prompt_tags")}
+        assert indexes["idx_prompt_tags_tag_id"] == ["tag_id", "prompt_id"]
+        assert indexes["idx_prompt_tags_prompt_id"] == ["prompt_id"]
+    finally:
+        old_engine.dispose()
+
+
+def test_create_all_skips_indexes_the_schema_already_has(tmp_path):
+    """Test that create_all doesn't duplicate indexes of a database built from sqlite_schema.sql."""
+    from pathlib import Path
+    from sqlalchemy import create_engine, inspect
+    from app.db.base_class import Base
+    import app.db
+
+    schema = (Path(app.db.__file__).parent / "sqlite_schema.sql").read_text()
+    schema_engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    try:
+        with schema_engine.begin() as connection:
+            connection.connection.executescript(schema)
+        Base.metadata.create_all(bind=schema_engine)
+        inspector = inspect(schema_engine)
+        for table in ("prompts", "tags", "prompt_versions", "prompt_tags"):
+            columns = [tuple(index["column_names"]) for index in inspector.get_indexes(table)]
+            assert len(columns) == len(set(columns)), table
+        assert "ix_prompts_name" not in {index["name"] for index in inspector.get_indexes("prompts")}
+    finally:
+        schema_engine.dispose()
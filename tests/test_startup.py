@@ -0,0 +1,36 @@
+import os
+
+from app.scripts.measure_startup import measure_import, measure_startup
+
+# Generous ceiling so slow CI machines pass; override with STARTUP_BUDGET_SECONDS
+STARTUP_BUDGET_SECONDS = float(os.environ.get("STARTUP_BUDGET_SECONDS", "5"))
+
+
+def test_import_has_no_side_effects(tmp_path):
+    """Test that importing the app neither touches the database nor loads lazy modules."""
+    database = tmp_path / "startup.db"
+    sample = measure_import({"DATABASE_URL": f"sqlite:///{database}", "OPENAI_API_KEY": "x"})
+    assert sample["loaded"] == []
+    assert not database.exists()
+
+
+def test_startup_time_budget(tmp_path):
+    """Test that a cold import of the app stays within the startup budget."""
+    result = measure_startup(
+        runs=3, env={"DATABASE_URL": f"sqlite:///{tmp_path / 'startup.db'}", "OPENAI_API_KEY": "x"}
+    )
+    assert result["median_seconds"] < STARTUP_BUDGET_SECONDS
+
+
+def test_lifespan_creates_tables(monkeypatch):
+    """Test that schema creation runs when the app starts, if enabled."""
+    from fastapi.testclient import TestClient
+    from app import main
+    from app.core.config import settings
+
+    calls = []
+    monkeypatch.setattr(settings, "DB_INIT_ON_STARTUP", True)
+    monkeypatch.setattr(main.Base.metadata, "create_all", lambda bind: calls.append(bind))
+    with TestClient(main.app):
+        pass
+    assert calls == [main.engine]